@@ -26,6 +26,27 @@ a = Analysis(
         'floating_widget',
         'tray_icon',
         'background_service',
+        'process_source',
+        'app_stack',
+        'event_coalescer',
+        'executable_matcher',
+        'executable_index',
+        'process_tree',
+        'cadence',
+        'config_diff',
+        'daemon_executor',
+        'service_snapshot',
+        'switch_scheduler',
+        'trigger_engine',
+        'profile_resolver',
+        'launch_predictor',
+        'apply_worker',
+        'setting_probes',
+        'transition_plans',
+        'shell_host',
+        'native_backends',
+        'audio_endpoints',
+        'radio_cache',
         'floating_widget_default_item',
         'floating_widget_menu_main',
         'floating_widget_painter',
@@ -0,0 +1,181 @@
+import os
+import time
+import itertools
+
+from profile_resolver import ProfileResolver
+
+def program_key(program):
+    """The identity of a monitored program inside the stack."""
+    return os.path.normcase(program.get('path') or program['name'])
+
+def priority_of(settings):
+    """Sort key for a profile: programs with an explicit priority first, then by priority value."""
+    priority = settings.get('priority', {})
+    return (priority.get('is_unchanged', True), priority.get('tile_value', 9999))
+
+class RunningAppStack:
+    """
+    Indexed min-heap of the running monitored programs, ordered by priority.
+    There is one entry per program, not per PID: each entry keeps the set of
+    live PIDs as its refcount, and is removed once its last instance exits.
+    Adding or removing an instance is O(log n), reading the top entry is O(1).
+    `on_removed` is called with an entry once its last instance exited.
+
+    The stack also keeps the merged profile of all its entries in `resolver`; the
+    mutating methods report a change if the top entry or a merged setting changed.
+    """
+    def __init__(self, on_removed=None):
+        self.on_removed = on_removed
+        self.resolver = ProfileResolver()
+        self._heap = []      # entries ordered as a binary heap on 'sort_key'
+        self._position = {}  # program key -> index in self._heap
+        self._pid_keys = {}  # pid -> program key
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __iter__(self):
+        """Iterates entries in priority order (O(n log n), meant for diagnostics)."""
+        return iter(sorted(self._heap, key=lambda entry: entry['sort_key']))
+
+    def top(self):
+        return self._heap[0] if self._heap else None
+
+    def names(self):
+        return [entry['name'] for entry in self]
+
+    def effective_settings(self):
+        """Every setting from the highest-priority entry that changes it."""
+        return self.resolver.settings
+
+    def refcount(self, key):
+        index = self._position.get(key)
+        return len(self._heap[index]['pids']) if index is not None else 0
+
+    def has_pid(self, pid):
+        return pid in self._pid_keys
+
+    def key_of(self, pid):
+        """The key of the program an instance counts for, or None."""
+        return self._pid_keys.get(pid)
+
+    def pids_of(self, key):
+        index = self._position.get(key)
+        return set(self._heap[index]['pids']) if index is not None else set()
+
+    def clear(self):
+        self._heap.clear()
+        self._position.clear()
+        self._pid_keys.clear()
+        self.resolver.clear()
+
+    def add(self, pid, program):
+        """Registers a running instance of `program`. Returns True if the effective profile changed."""
+        if pid in self._pid_keys:
+            return False
+        previous_top = self.top()
+        key = program_key(program)
+        self._pid_keys[pid] = key
+        index = self._position.get(key)
+        if index is not None:
+            self._heap[index]['pids'].add(pid)
+            return False
+
+        entry = {
+            'key': key,
+            'name': program['name'],
+            'settings': program['settings'],
+            'path': program.get('path'),
+            'pids': {pid},
+            'started_at': time.monotonic(),
+            'sort_key': priority_of(program['settings']) + (next(self._sequence),),
+        }
+        self._heap.append(entry)
+        self._position[key] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+        settings_changed = self.resolver.add(entry)
+        return self.top() is not previous_top or settings_changed
+
+    def remove(self, pid):
+        """Unregisters an exited instance. Returns True if the effective profile changed."""
+        key = self._pid_keys.pop(pid, None)
+        if key is None:
+            return False
+        index = self._position[key]
+        entry = self._heap[index]
+        entry['pids'].discard(pid)
+        if entry['pids']:
+            return False
+        self._remove_at(index)
+        settings_changed = self.resolver.remove(entry)
+        if self.on_removed is not None:
+            self.on_removed(entry)
+        return index == 0 or settings_changed
+
+    def remove_program(self, key):
+        """Drops a program with all of its instances. Returns True if the effective profile changed."""
+        index = self._position.get(key)
+        if index is None:
+            return False
+        entry = self._heap[index]
+        for pid in entry['pids']:
+            self._pid_keys.pop(pid, None)
+        self._remove_at(index)
+        settings_changed = self.resolver.remove(entry)
+        return index == 0 or settings_changed
+
+    def update_program(self, program):
+        """Replaces the profile of a running program in place. Returns True if the effective profile changed."""
+        index = self._position.get(program_key(program))
+        if index is None:
+            return False
+        previous_top = self.top()
+        previous_name = previous_top['name']
+        entry = self._heap[index]
+        settings_changed = self.resolver.remove(entry)
+        entry['name'] = program['name']
+        entry['settings'] = program['settings']
+        entry['sort_key'] = priority_of(program['settings']) + entry['sort_key'][-1:]
+        self._sift_down(index)
+        self._sift_up(self._position[entry['key']])
+        settings_changed |= self.resolver.add(entry)
+        return self.top() is not previous_top or self.top()['name'] != previous_name or settings_changed
+
+    def _remove_at(self, index):
+        entry = self._heap[index]
+        del self._position[entry['key']]
+        last = self._heap.pop()
+        if index < len(self._heap):
+            self._heap[index] = last
+            self._position[last['key']] = index
+            self._sift_down(index)
+            self._sift_up(self._position[last['key']])
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._position[heap[i]['key']] = i
+        self._position[heap[j]['key']] = j
+
+    def _sift_up(self, index):
+        heap = self._heap
+        while index > 0:
+            parent = (index - 1) // 2
+            if heap[index]['sort_key'] >= heap[parent]['sort_key']:
+                break
+            self._swap(index, parent)
+            index = parent
+
+    def _sift_down(self, index):
+        heap = self._heap
+        size = len(heap)
+        while True:
+            smallest = index
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size and heap[child]['sort_key'] < heap[smallest]['sort_key']:
+                    smallest = child
+            if smallest == index:
+                break
+            self._swap(index, smallest)
+            index = smallest
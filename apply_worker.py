@@ -0,0 +1,216 @@
+import time
+import threading
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from daemon_executor import DaemonThreadExecutor
+
+class ApplyJob:
+    """One profile to apply, with the callback run once all of its steps finished; it is told whether they all succeeded."""
+    __slots__ = ('settings', 'profile_name', 'program_path', 'on_done', 'generation')
+
+    def __init__(self, settings, profile_name, program_path, on_done, generation):
+        self.settings = settings
+        self.profile_name = profile_name
+        self.program_path = program_path
+        self.on_done = on_done
+        self.generation = generation
+
+class ApplyWorker:
+    """
+    Applies profiles on its own thread.
+
+    A profile is planned as a small dependency graph of setter steps, taken from the
+    settings manager's plan cache. Steps run on a bounded pool of step threads as soon
+    as the steps they depend on finished, so independent setters run concurrently and
+    a switch takes as long as its longest chain. A step is abandoned after its timeout,
+    counted from when it started running; its dependents then go ahead, as they would
+    after a failed setter.
+
+    Only the latest submitted profile matters: a newer submission replaces a profile
+    that is still waiting, and a profile that is being applied starts no further
+    steps. Its running steps are let finish first, and a step whose setting still has
+    an abandoned setter running waits for it (up to its own timeout), so an older
+    setter never overwrites a newer one. Nothing here is ever waited for by the caller.
+    """
+    DEFAULT_TIMEOUT = 15.0
+    # Concurrent step threads; a step that never returns keeps its thread
+    MAX_STEP_THREADS = 4
+
+    def __init__(self, settings_manager, timeout=DEFAULT_TIMEOUT, timeouts=None):
+        self.settings_manager = settings_manager
+        self.configure(timeout, timeouts)
+        self.idle = threading.Event()
+        self.idle.set()
+        self._condition = threading.Condition()
+        self._job = None
+        self._generation = 0
+        self._stopped = False
+        self._steps = DaemonThreadExecutor(max_workers=self.MAX_STEP_THREADS, thread_name_prefix='apply_step')
+        self._abandoned = {}  # setting -> future of a timed out setter that may still be running
+        self._thread = threading.Thread(target=self._run, name='apply', daemon=True)
+        self._thread.start()
+
+        # --- Counters ---
+        self.applied = 0
+        self.superseded = 0
+        self.steps_skipped = 0
+        self.timeouts = 0
+
+    def configure(self, timeout=DEFAULT_TIMEOUT, timeouts=None):
+        self.timeout = timeout
+        self.timeouts_by_setting = dict(timeouts or {})
+
+    def configure_from_preferences(self, prefs):
+        options = prefs.get('apply', {})
+        self.configure(
+            timeout=options.get('setter_timeout_ms', self.DEFAULT_TIMEOUT * 1000) / 1000.0,
+            timeouts={setting: ms / 1000.0 for setting, ms in options.get('setter_timeouts_ms', {}).items()},
+        )
+
+    def submit(self, settings, profile_name, program_path=None, on_done=None):
+        """Queues a profile, superseding any profile that has not been fully applied yet."""
+        with self._condition:
+            if self._stopped:
+                return
+            self._generation += 1
+            if self._job is not None:
+                self.superseded += 1
+                print(f"[APPLY] '{self._job.profile_name}' superseded by '{profile_name}' before it was applied.")
+            self._job = ApplyJob(settings, profile_name, program_path, on_done, self._generation)
+            self.idle.clear()
+            self._condition.notify()
+
+    def shutdown(self):
+        with self._condition:
+            self._stopped = True
+            self._job = None
+            self._generation += 1
+            self._condition.notify()
+        self._steps.shutdown(wait=False, cancel_futures=True)
+
+    def _is_current(self, job):
+        return job.generation == self._generation
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._job is None and not self._stopped:
+                    self.idle.set()
+                    self._condition.wait()
+                if self._stopped:
+                    self.idle.set()
+                    return
+                job = self._job
+                self._job = None
+            self._apply(job)
+
+    def _timeout_of(self, setting):
+        return self.timeouts_by_setting.get(setting, self.timeout)
+
+    @staticmethod
+    def _run_step(step, started):
+        started.append(time.monotonic())
+        return step.setter(step.state)
+
+    def _deadline(self, setting, started, now):
+        """A step's timeout counts from when it started running; a queued step cannot expire before now + timeout."""
+        return (started[0] if started else now) + self._timeout_of(setting)
+
+    def _apply(self, job):
+        started_at = time.perf_counter()
+        steps = self.settings_manager.plan_settings(job.settings, job.profile_name, job.program_path) if job.settings else []
+        waiting = list(steps)
+        finished = set()
+        running = {}        # future -> (setting, [monotonic time it started running])
+        blocked_since = {}  # setting -> when its step started waiting for an abandoned setter
+        failed = False
+        superseded = False
+        while waiting or running:
+            if not superseded and not self._is_current(job):
+                # Setters that already started are let finish (or time out), so none of them
+                # can overwrite what the newer profile applies
+                superseded = failed = True
+                cancelled = [future for future in running if future.cancel()]
+                for future in cancelled:
+                    del running[future]
+                self.superseded += 1
+                self.steps_skipped += len(waiting) + len(cancelled)
+                print(f"[APPLY] '{job.profile_name}' superseded, skipped {len(waiting) + len(cancelled)} of {len(steps)} steps.")
+                waiting = []
+                continue
+
+            now = time.monotonic()
+            blocked = {}  # setting -> future of the abandoned setter it waits for
+            for step in [step for step in waiting if all(dep in finished for dep in step.after)]:
+                previous = self._abandoned.get(step.setting)
+                if previous is not None and not previous.done():
+                    # A setter abandoned by an earlier profile may still write this setting
+                    since = blocked_since.setdefault(step.setting, now)
+                    if now - since < self._timeout_of(step.setting):
+                        blocked[step.setting] = previous
+                        continue
+                    waiting.remove(step)
+                    finished.add(step.setting)
+                    failed = True
+                    self.timeouts += 1
+                    print(f"[WARNING] Setting '{step.setting}' for '{job.profile_name}' skipped, an earlier setter for it is still running.")
+                    continue
+                self._abandoned.pop(step.setting, None)
+                waiting.remove(step)
+                started = []
+                try:
+                    future = self._steps.submit(self._run_step, step, started)
+                except RuntimeError:
+                    return  # Shutting down
+                running[future] = (step.setting, started)
+            if not running and not blocked:
+                if waiting:
+                    print(f"[ERROR] Steps {[step.setting for step in waiting]} of '{job.profile_name}' wait for settings that are not planned.")
+                    failed = True
+                break
+
+            now = time.monotonic()
+            deadlines = [self._deadline(setting, started, now) for setting, started in running.values()]
+            deadlines += [blocked_since[setting] + self._timeout_of(setting) for setting in blocked]
+            timeout = max(0.0, min(deadlines) - now)
+            done, _ = wait(list(running) + list(blocked.values()), timeout=timeout, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future, (setting, started) in list(running.items()):
+                if future in done:
+                    if future.exception() is not None:
+                        print(f"[ERROR] Setting '{setting}' for '{job.profile_name}' failed: {future.exception()}")
+                        failed = True
+                    elif future.result() is False:
+                        failed = True
+                elif self._deadline(setting, started, now) <= now:
+                    self.timeouts += 1
+                    failed = True
+                    self._abandoned[setting] = future
+                    print(f"[WARNING] Setting '{setting}' for '{job.profile_name}' timed out after {self._timeout_of(setting):.1f}s, abandoning it.")
+                else:
+                    continue
+                del running[future]
+                finished.add(setting)
+
+        if superseded:
+            return
+        self.applied += 1
+        if job.settings and not failed:
+            # Only a profile applied in full can be the starting point of the next transition
+            self.settings_manager.profile_applied(job.settings)
+        if steps:
+            print(f"[APPLY] '{job.profile_name}' applied in {(time.perf_counter() - started_at) * 1000:.0f} ms ({len(steps)} steps). Plans: {self.settings_manager.plans.stats()}")
+        if job.on_done is not None and self._is_current(job):
+            try:
+                job.on_done(not failed)
+            except Exception as e:
+                print(f"[ERROR] Apply completion callback failed: {e}")
+
+    def stats(self):
+        return {
+            'applied': self.applied,
+            'superseded': self.superseded,
+            'steps_skipped': self.steps_skipped,
+            'timeouts': self.timeouts,
+            'plans': self.settings_manager.plans.stats(),
+        }
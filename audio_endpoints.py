@@ -0,0 +1,231 @@
+import threading
+
+from daemon_executor import DaemonThreadExecutor
+
+# Endpoint kinds
+SPEAKERS, MICROPHONE = 'speakers', 'microphone'
+
+class AudioDeviceProvider:
+    """
+    Activates volume handles of the default audio endpoints.
+    Everything except the change callback runs on the apartment thread of AudioEndpointCache.
+    """
+    def initialize(self):
+        pass
+
+    def uninitialize(self):
+        pass
+
+    def activate(self, kind):
+        """A handle with volume(), set_volume(level), muted() and set_muted(muted)."""
+        raise NotImplementedError
+
+    def subscribe(self, callback):
+        """Calls `callback(kind)` when a default endpoint changes; kind None means any endpoint."""
+        pass
+
+class EndpointVolume:
+    """An activated IAudioEndpointVolume, with volume levels in percent."""
+    def __init__(self, interface):
+        self.interface = interface
+
+    def volume(self):
+        return round(self.interface.GetMasterVolumeLevelScalar() * 100)
+
+    def set_volume(self, level):
+        self.interface.SetMasterVolumeLevelScalar(level / 100.0, None)
+
+    def muted(self):
+        return bool(self.interface.GetMute())
+
+    def set_muted(self, muted):
+        self.interface.SetMute(muted, None)
+
+class PycawProvider(AudioDeviceProvider):
+    def __init__(self):
+        self._enumerator = None
+        self._client = None
+
+    def initialize(self):
+        from comtypes import CoInitialize
+        CoInitialize()
+
+    def uninitialize(self):
+        from comtypes import CoUninitialize
+        if self._client is not None:
+            try:
+                self._enumerator.UnregisterEndpointNotificationCallback(self._client)
+            except Exception:
+                pass
+            self._client = None
+        CoUninitialize()
+
+    def activate(self, kind):
+        from ctypes import cast, POINTER
+        from comtypes import CLSCTX_ALL
+        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+
+        device = AudioUtilities.GetSpeakers() if kind == SPEAKERS else AudioUtilities.GetMicrophone()
+        if device is None:
+            raise OSError(f"no default {kind} device")
+        interface = device.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+        return EndpointVolume(cast(interface, POINTER(IAudioEndpointVolume)))
+
+    def subscribe(self, callback):
+        from pycaw.pycaw import AudioUtilities
+        from pycaw.callbacks import MMNotificationClient
+
+        class Client(MMNotificationClient):
+            def on_default_device_changed(self, flow, flow_id, role, role_id, default_device_id):
+                callback({'eRender': SPEAKERS, 'eCapture': MICROPHONE}.get(flow))
+
+            def on_device_state_changed(self, device_id, new_state, new_state_id):
+                callback(None)
+
+        self._enumerator = AudioUtilities.GetDeviceEnumerator()
+        self._client = Client()
+        self._enumerator.RegisterEndpointNotificationCallback(self._client)
+
+class FakeEndpoint:
+    """A volume handle that stops working once its device is gone, like a stale COM interface."""
+    def __init__(self, level=50, is_muted=False):
+        self.level = level
+        self.is_muted = is_muted
+        self.removed = False
+
+    def _check(self):
+        if self.removed:
+            raise OSError("endpoint was removed")
+
+    def volume(self):
+        self._check()
+        return self.level
+
+    def set_volume(self, level):
+        self._check()
+        self.level = level
+
+    def muted(self):
+        self._check()
+        return self.is_muted
+
+    def set_muted(self, muted):
+        self._check()
+        self.is_muted = muted
+
+class FakeAudioProvider(AudioDeviceProvider):
+    """In-memory endpoints, for running the audio setters and the cache without Windows."""
+    def __init__(self, notify=True):
+        self.endpoints = {SPEAKERS: FakeEndpoint(), MICROPHONE: FakeEndpoint()}
+        self.notify = notify
+        self.activations = 0
+        self.threads = set()  # names of the threads endpoints were activated on
+        self._callback = None
+
+    def activate(self, kind):
+        self.activations += 1
+        self.threads.add(threading.current_thread().name)
+        return self.endpoints[kind]
+
+    def subscribe(self, callback):
+        self._callback = callback
+
+    def change_default(self, kind, endpoint=None):
+        """Replaces a default endpoint; the old handle stops working. Notifies unless `notify` is off."""
+        self.endpoints[kind].removed = True
+        self.endpoints[kind] = endpoint or FakeEndpoint()
+        if self.notify and self._callback is not None:
+            self._callback(kind)
+
+class AudioEndpointCache:
+    """
+    Keeps the activated volume handles of the default endpoints.
+
+    All COM work happens on one apartment thread, which is initialized once and owns
+    the handles, instead of initializing COM and enumerating the device on every call.
+    A handle is dropped when its endpoint stops being the default (reported by the
+    provider) and when a call on it fails, in which case the call is retried once on a
+    freshly activated handle.
+    """
+    TIMEOUT = 5.0
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._apartment = DaemonThreadExecutor(max_workers=1, thread_name_prefix='audio')
+        self._lock = threading.Lock()
+        self._started = False
+        self._handles = {}   # kind -> handle, only touched on the apartment thread
+        self._stale = set()  # kinds to drop before the next call, None for all
+
+        # --- Counters ---
+        self.hits = 0
+        self.activations = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def call(self, kind, operation):
+        """Runs `operation(handle)` for an endpoint kind on the apartment thread and returns its result."""
+        with self._lock:
+            if not self._started:
+                self._started = True
+                self._apartment.submit(self._start)
+        return self._apartment.submit(self._call, kind, operation).result(self.TIMEOUT)
+
+    def invalidate(self, kind=None):
+        """Drops the handle of an endpoint kind, or all handles. Safe to call from any thread."""
+        with self._lock:
+            self._stale.add(kind)
+            self.invalidations += 1
+
+    def shutdown(self):
+        with self._lock:
+            started = self._started
+            self._started = True  # Never start after this
+        if started:
+            try:
+                self._apartment.submit(self._stop)
+            except RuntimeError:
+                pass
+        self._apartment.shutdown(wait=False)
+
+    def _start(self):
+        self.provider.initialize()
+        try:
+            self.provider.subscribe(self.invalidate)
+        except Exception as e:
+            print(f"[WARNING] No audio device notifications ({e}), handles are only renewed after errors.")
+
+    def _stop(self):
+        self._handles.clear()
+        self.provider.uninitialize()
+
+    def _call(self, kind, operation):
+        with self._lock:
+            stale, self._stale = self._stale, set()
+        if None in stale:
+            self._handles.clear()
+        for stale_kind in stale:
+            self._handles.pop(stale_kind, None)
+
+        handle = self._handles.get(kind)
+        if handle is not None:
+            try:
+                result = operation(handle)
+                self.hits += 1
+                return result
+            except Exception as e:
+                self.errors += 1
+                print(f"[WARNING] Cached {kind} handle failed ({e}), activating it again.")
+                del self._handles[kind]
+        handle = self.provider.activate(kind)
+        self.activations += 1
+        self._handles[kind] = handle
+        return operation(handle)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'activations': self.activations,
+            'invalidations': self.invalidations,
+            'errors': self.errors,
+        }
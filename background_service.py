@@ -1,116 +1,343 @@
 import os
 import time
+import datetime
+import functools
 import threading
 import asyncio
-import wmi
-import pythoncom
-from queue import Empty
+import concurrent.futures
 
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from json_handler import load_preferences, load_programs, get_preferences_path, get_programs_path, get_asset_path
+from json_handler import load_preferences, load_programs, save_json, get_preferences_path, get_programs_path, get_asset_path
 from settings_tile_functions import SettingsManager
+from process_source import create_process_source, ProcessSourceError
+from app_stack import RunningAppStack, program_key
+from event_coalescer import EventCoalescer
+from executable_matcher import ExecutableMatcher, config_version, directory_roots
+from executable_index import ExecutableIndex
+from process_tree import ProcessTree, start_order
+from cadence import CadenceController
+from config_diff import diff_programs
+from daemon_executor import DaemonThreadExecutor
+from service_snapshot import ServiceSnapshot
+from switch_scheduler import SwitchScheduler
+from trigger_engine import TriggerEngine, is_trigger_only
+from launch_predictor import LaunchPredictor
+from apply_worker import ApplyWorker
+from transition_plans import TransitionPlanner
 
 class AsyncRunner:
-    """Provides a separate thread for running asyncio event loops."""
-    def __init__(self):
-        self.loop = asyncio.new_event_loop()
-        self.thread = threading.Thread(target=self.start_loop, daemon=True)
-        self.thread.start()
+    """
+    Runs coroutines on an asyncio event loop from any thread.
+    Without a loop, it starts its own loop in a separate thread.
+
+    Every coroutine is tracked until it finished: failures are logged with their
+    duration, an operation can be given a timeout after which it is cancelled on the
+    loop, and `cancel_all` cancels whatever is still in flight.
+    """
+    def __init__(self, loop=None):
+        self.thread = None
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.start_loop, daemon=True)
+        self.loop = loop
+        self.lock = threading.Lock()
+        self.in_flight = {}  # concurrent Future -> (name, perf_counter start)
+        if self.thread is not None:
+            self.thread.start()
+
+        # --- Counters ---
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.cancelled = 0
 
     def start_loop(self):
         asyncio.set_event_loop(self.loop)
         self.loop.run_forever()
 
-    def run_coroutine(self, coro):
-        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    def run_coroutine(self, coro, name=None, timeout=None):
+        """Schedules a coroutine and returns its concurrent Future. After `timeout` seconds it is cancelled."""
+        name = name or getattr(coro, '__qualname__', 'coroutine')
+        if timeout is not None:
+            coro = asyncio.wait_for(coro, timeout)
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        with self.lock:
+            self.in_flight[future] = (name, time.perf_counter())
+        future.add_done_callback(self._on_done)
+        return future
+
+    def run(self, coro, name=None, timeout=None):
+        """Runs a coroutine and waits for its result. Raises TimeoutError once it was cancelled for taking too long."""
+        future = self.run_coroutine(coro, name, timeout)
+        try:
+            # The loop cancels it after `timeout`; the extra second only covers a loop that is blocked
+            return future.result(None if timeout is None else timeout + 1.0)
+        except (asyncio.TimeoutError, concurrent.futures.TimeoutError):
+            future.cancel()
+            raise TimeoutError(f"'{name}' did not finish within {timeout:.1f}s")
+
+    def cancel_all(self):
+        with self.lock:
+            futures = list(self.in_flight)
+        for future in futures:
+            future.cancel()
+
+    def _on_done(self, future):
+        with self.lock:
+            name, started_at = self.in_flight.pop(future, ('coroutine', time.perf_counter()))
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+        if future.cancelled():
+            self.cancelled += 1
+            print(f"[ASYNC] '{name}' cancelled after {elapsed_ms:.0f} ms.")
+        elif isinstance(future.exception(), asyncio.TimeoutError):
+            self.timed_out += 1
+            print(f"[WARNING] '{name}' timed out after {elapsed_ms:.0f} ms and was cancelled.")
+        elif future.exception() is not None:
+            self.failed += 1
+            print(f"[ERROR] '{name}' failed after {elapsed_ms:.0f} ms: {future.exception()}")
+        else:
+            self.completed += 1
+
+    def stats(self):
+        with self.lock:
+            in_flight = len(self.in_flight)
+        return {
+            'in_flight': in_flight,
+            'completed': self.completed,
+            'failed': self.failed,
+            'timed_out': self.timed_out,
+            'cancelled': self.cancelled,
+        }
 
 class JsonFileHandler(FileSystemEventHandler):
-    """Responds to changes in the JSON configuration files."""
+    """Forwards changes of the JSON configuration files to the service's event loop."""
     def __init__(self, service):
         self.service = service
 
     def on_modified(self, event):
         if not event.is_directory:
-            time.sleep(0.1) # Wait for write to complete
-            if event.src_path == get_preferences_path():
-                self.service.on_preferences_changed()
-            elif event.src_path == get_programs_path():
-                self.service.on_programs_changed()
+            self._forward(event.src_path)
+
+    def on_moved(self, event):
+        # save_json swaps a renamed temporary file in
+        if not event.is_directory:
+            self._forward(event.dest_path)
+
+    def _forward(self, path):
+        if path == get_preferences_path():
+            self.service.post_config_change('preferences')
+        elif path == get_programs_path():
+            self.service.post_config_change('programs')
 
 class BackgroundService:
     """
     Monitors running processes and applies system settings based on user-defined profiles.
-    This service is event-driven, using WMI for efficient, real-time process monitoring.
+    This service is event-driven: a ProcessSource reports process start/exit deltas
+    (WMI events on Windows, psutil or /proc elsewhere).
+
+    Everything runs as tasks on a single asyncio event loop: process detection, config
+    file changes, the stop command and the WinRT coroutines of the SettingsManager.
+    Blocking work is pushed off the loop: a dedicated detection thread for the process
+    source (WMI waits, polling sources list the process table), and the ApplyWorker
+    for the setters, where a newer profile supersedes an older one and every setter
+    has a timeout. All service state is only touched from the loop, so no lock is needed.
+
+    Programs may also carry time, power and idle conditions. The TriggerEngine task
+    adds and removes them from the stack as their conditions change, so they reach
+    update_settings through the same stack as process rules.
+
+    The LaunchPredictor learns which program is usually launched next. Depending on
+    the 'launch_prediction' mode, a prediction is only measured ('observe'), also
+    speeds up detection until it is settled ('prepare'), or additionally puts the
+    predicted program on the stack ahead of its launch ('prestage').
+
+    Shutdown stops all components in parallel and gives up on anything still blocked
+    after SHUTDOWN_TIMEOUT seconds; every executor uses daemon threads, so abandoned
+    work never keeps the process alive. The state files are saved on a worker of their
+    own, which gets SAVE_TIMEOUT seconds instead, so they are not lost behind a blocked step.
     """
-    def __init__(self, stop_queue=None):
-        self.async_runner = AsyncRunner()
+    SHUTDOWN_TIMEOUT = 0.1
+    SAVE_TIMEOUT = 2.0
+
+    # Stands in for the PID of programs with a 'trigger' rule, which run without a process
+    TRIGGER_INSTANCE = 'trigger'
+    # Stands in for the PID of a program that is predicted to be launched soon
+    PREDICTED_INSTANCE = 'predicted'
+    PREDICTION_MODES = ('off', 'observe', 'prepare', 'prestage')
+
+    def __init__(self, stop_queue=None, process_source=None, trigger_backends=None):
+        self.loop = asyncio.new_event_loop()
+        self.async_runner = AsyncRunner(self.loop)
         self.settings_manager = SettingsManager(self.async_runner)
         self.stop_queue = stop_queue
+        self.process_source = process_source
         
         # --- State Management ---
-        self.running_apps_stack = []
+        self.cadence = CadenceController()
+        self.app_stack = RunningAppStack(on_removed=self.cadence.record_session)
+        self.process_tree = ProcessTree()
+        self.event_coalescer = EventCoalescer()
+        self.triggers = TriggerEngine(trigger_backends)
+        self.launch_predictor = LaunchPredictor()
+        self.prediction_mode = 'observe'
+        self.staged_key = None  # program key put on the stack by a 'prestage' prediction
         self.monitored_programs = []
-        self.monitored_executables = {}
+        self.monitored_keys = set()
+        self.executable_index = ExecutableIndex()
+        self.executable_matcher = ExecutableMatcher([], executable_index=self.executable_index)
         self.service_enabled = True
         self.default_settings_option = 'use'
+        self.default_settings = {}
+        self.config_hash = None
         self.last_applied_profile_name = None
+        self.last_applied_settings = None
+        self.last_applied_key = None  # program key of the applied profile, None for the default profiles
+        self.switch_scheduler = SwitchScheduler()
+        self.switch_timer = None      # asyncio.TimerHandle of a held back switch
+        self.prediction_timer = None  # asyncio.TimerHandle expiring the pending prediction
+        self.hour_timer = None        # asyncio.TimerHandle for time-of-day predictions
+        self.history_save_timer = None  # asyncio.TimerHandle saving the launch history
+        self.snapshot = ServiceSnapshot()
+        self.state_resolved = False  # False until the first scan rebuilt the stack
+        self.rescan_needed = False
         
-        # --- Threading and Events ---
-        self.lock = threading.Lock()
-        self.wmi_thread = None
-        self.stop_event = threading.Event()
-        self.service_paused = threading.Event()
-        self.rescan_needed = threading.Event()
+        # --- Tasks and Executors ---
+        self.tasks = []
+        self.stop_requested = None   # asyncio.Event, created on the loop
+        self.wake_event = None       # asyncio.Event, wakes the detection task early
+        self.trigger_event = None    # asyncio.Event, wakes the trigger task early
+        self.config_changes = None   # asyncio.Queue of 'preferences' / 'programs'
+        self.detection_executor = None
+        # Background work started from the loop: the shell host's start and launch history writes
+        self.io_executor = DaemonThreadExecutor(max_workers=2, thread_name_prefix='io')
+        self.apply_worker = ApplyWorker(self.settings_manager)
         self.observer = None
+        self.stop_requested_at = None
+        self.is_shut_down = False
 
     def run(self):
-        """Starts the background service and waits for a stop command."""
+        """Runs the service on the current thread until a stop command arrives."""
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._main())
+        except (KeyboardInterrupt, SystemExit):
+            self.loop.run_until_complete(self._shutdown())
+        finally:
+            self.loop.close()
+            asyncio.set_event_loop(None)
+
+    def stop(self):
+        """Requests the service to stop. Safe to call from any thread."""
+        self.stop_requested_at = time.perf_counter()
+        if self.stop_requested is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.stop_requested.set)
+
+    async def _main(self):
+        self.stop_requested = asyncio.Event()
+        self.wake_event = asyncio.Event()
+        self.trigger_event = asyncio.Event()
+        self.config_changes = asyncio.Queue()
+        self.triggers.backends.subscribe(self.post_trigger_input)
+
         self._load_initial_state()
         self._setup_watchers()
-        
-        self.wmi_thread = threading.Thread(target=self._wmi_event_loop, daemon=True)
-        self.wmi_thread.start()
+        self._start_stop_listener()
+        self._schedule_hour_timer()
+        # Not awaited: the first setter needing PowerShell waits for the worker if it is not ready
+        self.loop.run_in_executor(self.io_executor, self.settings_manager.start_shell)
+        self.tasks = [
+            asyncio.create_task(self._detect_processes()),
+            asyncio.create_task(self._watch_config()),
+            asyncio.create_task(self._watch_triggers()),
+        ]
 
         print("Background service is running. Waiting for stop signal.")
-        
-        # This loop waits for the 'stop' command from the main process
-        while True:
-            try:
-                # Blocking wait for a command.
-                command = self.stop_queue.get() 
+        await self.stop_requested.wait()
+        await self._shutdown()
+
+    async def _shutdown(self):
+        """Stops all components in parallel, abandoning whatever is still blocked after the timeout."""
+        if self.is_shut_down:
+            return
+        self.is_shut_down = True
+        started_at = self.stop_requested_at or time.perf_counter()
+        print("Stopping background service...")
+
+        self._cancel_switch_timer()
+        self.async_runner.cancel_all()
+        for timer in (self.prediction_timer, self.hour_timer, self.history_save_timer):
+            if timer is not None:
+                timer.cancel()
+        for task in self.tasks:
+            task.cancel()
+        save_executor = DaemonThreadExecutor(max_workers=1, thread_name_prefix='save')
+        saved = self.loop.run_in_executor(save_executor, self._save_state)
+        steps = [asyncio.gather(*self.tasks, return_exceptions=True)]
+        shutdown_executor = DaemonThreadExecutor(max_workers=2, thread_name_prefix='shutdown')
+        if self.observer:
+            steps.append(self.loop.run_in_executor(shutdown_executor, self._stop_observer))
+        steps.append(self.loop.run_in_executor(shutdown_executor, self.apply_worker.idle.wait))
+
+        done, pending = await asyncio.wait(steps, timeout=self.SHUTDOWN_TIMEOUT)
+        if pending:
+            print(f"[WARNING] {len(pending)} shutdown steps still blocked, abandoning them.")
+        shutdown_executor.shutdown(wait=False)
+        try:
+            await asyncio.wait_for(saved, self.SAVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("[WARNING] Saving the service state is still blocked, abandoning it.")
+        save_executor.shutdown(wait=False)
+        self.io_executor.shutdown(wait=False)
+        self.apply_worker.shutdown()
+        self.settings_manager.shell.shutdown()
+        self.settings_manager.audio.shutdown()
+        if self.detection_executor is not None:
+            self.detection_executor.shutdown(wait=False)
+        print(f"Service stopped in {(time.perf_counter() - started_at) * 1000:.0f} ms.")
+
+    def _save_state(self):
+        self.executable_index.save()
+        self.snapshot.save()
+        self.launch_predictor.save()
+
+    def _stop_observer(self):
+        self.observer.stop()
+        self.observer.join()
+
+    def _start_stop_listener(self):
+        """Waits for the 'stop' command from the main process on a daemon thread."""
+        if self.stop_queue is None:
+            return
+
+        def listen():
+            while True:
+                try:
+                    # Blocking wait for a command.
+                    command = self.stop_queue.get()
+                except Exception:
+                    command = 'stop'
                 if command == 'stop':
                     print("Stop signal received, shutting down service.")
                     self.stop()
-                    break # Exit the loop and the process
-            except (KeyboardInterrupt, SystemExit):
-                self.stop()
-                break
-            except Exception:
-                self.stop()
-                break
+                    return
 
-    def stop(self):
-        """Stops the service and cleans up resources."""
-        print("Stopping background service...")
-        self.stop_event.set()
-        if self.observer:
-            self.observer.stop()
-            self.observer.join()
-        if self.wmi_thread:
-            self.wmi_thread.join()
-        # Stop the asyncio loop from its own thread
-        if self.async_runner.loop.is_running():
-            self.async_runner.loop.call_soon_threadsafe(self.async_runner.loop.stop)
-        if self.async_runner.thread.is_alive():
-            self.async_runner.thread.join()
-        print("Service stopped.")
+        threading.Thread(target=listen, daemon=True).start()
 
     def _load_initial_state(self):
-        """Loads all preferences and triggers the first process scan."""
+        """
+        Loads all preferences and the monitored programs.
+        A valid snapshot from the previous run counts as already applied, so a profile
+        the machine is still in is not applied again.
+        """
         print("Loading initial state...")
+        self.launch_predictor.load()
         self.on_preferences_changed()
-        self.on_programs_changed() # This also flags for the initial scan
+        self.on_programs_changed()
+        if self.snapshot.load(self.config_hash):
+            self.last_applied_profile_name = self.snapshot.profile_name
+            self.last_applied_settings = self.snapshot.settings
+            print(f"[SNAPSHOT] Restored last applied profile '{self.snapshot.profile_name}'.")
 
     def _setup_watchers(self):
         """Sets up watchdog to monitor JSON configuration files for changes."""
@@ -118,181 +345,546 @@ class BackgroundService:
         self.observer = Observer()
         # Watch the directory where the writable data files are
         self.observer.schedule(event_handler, path=os.path.dirname(get_preferences_path()), recursive=False)
+        # Directory rules are refreshed incrementally by the same observer
+        self.executable_index.attach(self.observer)
         self.observer.start()
 
+    def post_config_change(self, kind):
+        """Queues a config file change for the event loop. Called from the watchdog thread."""
+        self.loop.call_soon_threadsafe(self.config_changes.put_nowait, kind)
+
+    async def _watch_config(self):
+        """Applies config file changes, folding the burst of events a single save produces."""
+        while True:
+            kinds = {await self.config_changes.get()}
+            await asyncio.sleep(0.1) # Wait for write to complete
+            while not self.config_changes.empty():
+                kinds.add(self.config_changes.get_nowait())
+            if 'preferences' in kinds:
+                self.on_preferences_changed()
+            if 'programs' in kinds:
+                self.on_programs_changed()
+
+    def post_trigger_input(self, input_name):
+        """Reports a changed trigger input to the event loop. Called from backend threads."""
+        self.loop.call_soon_threadsafe(self._on_trigger_input, input_name)
+
+    def _on_trigger_input(self, input_name):
+        self.triggers.invalidate(input_name)
+        self.trigger_event.set()
+
+    async def _watch_triggers(self):
+        """Re-evaluates trigger conditions when an input is due or reported a change."""
+        while True:
+            try:
+                await asyncio.wait_for(self.trigger_event.wait(), self.triggers.time_until_update())
+            except asyncio.TimeoutError:
+                pass
+            self.trigger_event.clear()
+            opened, closed = self.triggers.update()
+            if self._apply_trigger_transitions(opened, closed):
+                self._log_stack_top()
+                self.update_settings()
+
+    def _apply_trigger_transitions(self, opened, closed):
+        """Updates the stack for programs whose conditions started or stopped holding. Returns True if the effective profile changed."""
+        if not (opened or closed):
+            return False
+        profile_changed = False
+        released = set()
+        for program in closed:
+            released |= self.app_stack.pids_of(program_key(program))
+            profile_changed |= self.app_stack.remove_program(program_key(program))
+        # Processes of closed programs may match a rule that is still active
+        profile_changed |= self._add_programs(opened, released)
+        print(f"[TRIGGERS] Conditions now hold for {[p['name'] for p in opened]}, no longer for {[p['name'] for p in closed]}.")
+        return profile_changed
+
+    def _wake(self):
+        """Makes the detection task re-evaluate its state right away."""
+        self.wake_event.set()
+        if self.process_source is not None:
+            self.process_source.interrupt()
+
     def on_preferences_changed(self):
         """Handles changes to 'preferences.json'."""
-        with self.lock:
-            prefs = load_preferences()
-            self.service_enabled = prefs.get('service_enabled', True)
-            self.default_settings_option = prefs.get('default_settings_option', 'use')
-            
-            if self.service_enabled:
-                self.service_paused.clear()
-            else:
-                self.service_paused.set()
-            
-            # Force re-application of settings
-            self.last_applied_profile_name = None
+        prefs = load_preferences()
+        was_enabled = self.service_enabled
+        self.service_enabled = prefs.get('service_enabled', True)
+        if self.service_enabled and not was_enabled:
+            # The user may have changed anything while the service was off
+            self.settings_manager.invalidate_ledger()
+        self.default_settings_option = prefs.get('default_settings_option', 'use')
+        self.default_settings = prefs.get('default_settings', {})
+        self._update_config_hash()
+        self.event_coalescer.configure_from_preferences(prefs)
+        self.cadence.configure_from_preferences(prefs)
+        self.switch_scheduler.configure_from_preferences(prefs)
+        self.apply_worker.configure_from_preferences(prefs)
+        apply_options = prefs.get('apply', {})
+        self.settings_manager.ledger_max_age = apply_options.get('ledger_max_age_ms', SettingsManager.LEDGER_MAX_AGE * 1000) / 1000.0
+        self.settings_manager.probes.ttl = apply_options.get('probe_ttl_ms', 2000) / 1000.0
+        self.settings_manager.plans.capacity = apply_options.get('plan_cache_size', TransitionPlanner.DEFAULT_CAPACITY)
+        self.settings_manager.shell.size = apply_options.get('shell_workers', 2)
+        self.settings_manager.shell.max_calls = apply_options.get('shell_max_calls', 200)
+        self.launch_predictor.configure_from_preferences(prefs)
+        prediction_mode = prefs.get('launch_prediction', {}).get('mode', 'observe')
+        if prediction_mode not in self.PREDICTION_MODES:
+            print(f"[WARNING] Unknown launch prediction mode '{prediction_mode}', using 'observe'.")
+            prediction_mode = 'observe'
+        if prediction_mode != 'prestage':
+            self._unstage_prediction()
+        self.prediction_mode = prediction_mode
+        if self.process_source is None:
+            self.process_source = create_process_source(prefs.get('process_source', 'auto'))
+            print(f"Using '{self.process_source.name}' process source.")
 
+        self._wake()
         print(f"Preferences updated: Service Enabled={self.service_enabled}, Default Option='{self.default_settings_option}'")
+        # Settings are only re-applied if the effective profile changed
         self.update_settings()
 
     def on_programs_changed(self):
-        """Handles changes to 'programs.json' and flags for a rescan."""
-        with self.lock:
-            self.monitored_programs = load_programs()
-            self.monitored_executables = {
-                os.path.basename(prog['path']).lower(): prog 
-                for prog in self.monitored_programs if prog.get('is_enabled', True)
-            }
-            # Force re-application of settings
-            self.last_applied_profile_name = None
-        print(f"Monitored programs list updated. Flagging for rescan.")
-        self.rescan_needed.set()
-
-    def _perform_process_scan(self, wmi_connection):
         """
-        Scans for running monitored processes using a targeted WQL query.
-        This is the single source of truth for the running application stack.
-        MUST be called from the WMI thread and use the provided WMI connection.
+        Handles changes to 'programs.json'.
+        The new config is diffed against the old one and only the affected stack entries are touched.
         """
-        #print("Performing targeted process scan...")
-        
-        with self.lock:
-            monitored_names = list(self.monitored_executables.keys())
-            if not monitored_names or wmi_connection is None:
-                self.running_apps_stack = []
-            else:
-                # Build a WQL query for efficiency
-                where_clause = " OR ".join([f"Name = '{name}'" for name in monitored_names])
-                query = f"SELECT ProcessId, Name FROM Win32_Process WHERE {where_clause}"
-                
-                try:
-                    found_processes = wmi_connection.query(query)
-                    new_stack = []
-                    for process in found_processes:
-                        try:
-                            p_name = process.Name.lower()
-                            if p_name in self.monitored_executables:
-                                prog_data = self.monitored_executables[p_name]
-                                new_stack.append({
-                                    'name': prog_data['name'],
-                                    'pid': process.ProcessId,
-                                    'settings': prog_data['settings'],
-                                    'path': prog_data['path']
-                                })
-                        except Exception:
-                            continue
-                    
-                    self.running_apps_stack = new_stack
-                    self.sort_stack()
-                except wmi.x_wmi as e:
-                    print(f"[ERROR] WMI query failed during process scan: {e}. The stack may be outdated.")
-                    # Don't clear the stack, just log the error and proceed.
-                    # The main loop will handle re-initializing the connection.
-                    raise # Re-raise to be caught by the main loop's error handler
+        programs = load_programs()
+        version = config_version(programs)
+        if version == self.executable_matcher.version:
+            return
+        diff = diff_programs(self.monitored_programs, programs)
+        self.monitored_programs = programs
+        self.monitored_keys = {program_key(program) for program in programs if program.get('is_enabled', True)}
+        self._update_config_hash()
+        self.executable_index.set_roots(directory_roots(programs))
+        self.executable_matcher = ExecutableMatcher(programs, version, self.executable_index)
+        opened, closed = self.triggers.set_programs(programs)
+        if self.trigger_event is not None:
+            self.trigger_event.set()  # The next condition check may now be due earlier
+        profile_changed = self._apply_programs_diff(diff)
+        if self._apply_trigger_transitions(opened, closed):
+            self._log_stack_top()
+            profile_changed = True
+
+        print(f"Monitored programs list updated: {diff}.")
+        self._wake()
+        if profile_changed:
+            self.update_settings()
+
+    def _update_config_hash(self):
+        """Hashes everything that decides which settings get applied, to validate the snapshot."""
+        self.config_hash = config_version({
+            'programs': self.monitored_programs,
+            'service_enabled': self.service_enabled,
+            'default_settings_option': self.default_settings_option,
+            'default_settings': self.default_settings,
+        })
+
+    def _apply_programs_diff(self, diff):
+        """Updates the stack for a config diff. Returns True if the effective profile changed."""
+        profile_changed = False
+        orphaned = set()
+        for program in diff.removed + [old for old, _ in diff.rule_changed]:
+            key = program_key(program)
+            orphaned |= self.app_stack.pids_of(key)
+            self.process_tree.forget_program(key)
+            profile_changed |= self.app_stack.remove_program(key)
+        for program in diff.settings_changed:
+            profile_changed |= self.app_stack.update_program(program)
+        # Processes of dropped rules may match a remaining one
+        profile_changed |= self._add_programs(diff.added + [new for _, new in diff.rule_changed], orphaned)
+        if profile_changed:
+            self._log_stack_top()
+        return profile_changed
 
+    def _add_programs(self, programs, pids=()):
+        """
+        Adds newly configured or activated programs to the stack, if their conditions hold.
+        Only their rules are run over the in-memory process snapshot, to find the processes
+        they may claim. Those and `pids` are then matched again against every rule, so a more
+        specific new rule takes over processes that a broader rule claimed before.
+        Returns True if the effective profile changed.
+        """
+        profile_changed = False
+        pids = set(pids)
+        programs = [program for program in programs if self.triggers.is_active(program)]
+        for program in programs:
+            if is_trigger_only(program):
+                profile_changed |= self.app_stack.add(self.TRIGGER_INSTANCE + ':' + program_key(program), program)
+        matcher = ExecutableMatcher([program for program in programs if not is_trigger_only(program)], executable_index=self.executable_index)
+        if matcher.rule_count:
+            # A copy, since the detection thread may be applying a delta
+            for info in list(self.process_source.processes.values()):
+                if matcher.match(info.name, info.path) is not None:
+                    pids.add(info.pid)
+        profile_changed |= self._rematch_processes(pids)
+        return profile_changed
+
+    def _rematch_processes(self, pids):
+        """
+        Matches running processes, and the descendants that may inherit from them, against
+        every rule again and moves them to the program they now count for.
+        Returns True if the effective profile changed.
+        """
+        if not pids:
+            return False
+        profile_changed = False
+        pids = set(pids)
+        for info in start_order(list(self.process_source.processes.values())):
+            if info.pid not in pids:
+                if self.process_tree.parent_of(info.pid) not in pids:
+                    continue
+                pids.add(info.pid)
+            self.process_tree.remove(info)
+            program = self._match_process(info)
+            key = program_key(program) if program is not None else None
+            if self.app_stack.key_of(info.pid) == key:
+                continue
+            profile_changed |= self.app_stack.remove(info.pid)
+            if program is not None:
+                profile_changed |= self.app_stack.add(info.pid, program)
+        return profile_changed
+
+    def _match_process(self, info):
+        """
+        Returns the monitored program a started process counts for, otherwise None.
+        Also registers the process in the process tree, so its children can inherit the program.
+        """
+        program = self.executable_matcher.match(info.name, info.path)
+        program = self.process_tree.add(info, program, self.process_source.processes)
+        if program is not None and not self.triggers.is_active(program):
+            return None
+        return program
+
+    def _reset_stack(self):
+        """Empties the stack down to the programs that run on their conditions alone."""
+        self.app_stack.clear()
+        self.process_tree.clear()
+        for program in self.monitored_programs:
+            if program.get('is_enabled', True) and is_trigger_only(program) and self.triggers.is_active(program):
+                self.app_stack.add(self.TRIGGER_INSTANCE + ':' + program_key(program), program)
+        if self.staged_key is not None:
+            program = self._monitored_program(self.staged_key)
+            if program is not None:
+                self.app_stack.add(self.PREDICTED_INSTANCE + ':' + self.staged_key, program)
+
+    def _perform_process_scan(self):
+        """
+        Rebuilds the running application stack from every known process.
+        Works on the process source's snapshot, so no process query is issued.
+        """
+        self._reset_stack()
+        for info in start_order(list(self.process_source.processes.values())):
+            program = self._match_process(info)
+            if program is not None:
+                self.app_stack.add(info.pid, program)
+        self.state_resolved = True
+        self._log_stack_top()
         self.update_settings()
 
-    def _wmi_event_loop(self):
+    def _handle_process_delta(self, delta):
         """
-        The core event-driven loop. It watches for any process change and triggers a full rescan.
-        COM initialization is handled here as this function runs in its own thread.
+        Applies a created/exited delta to the running application stack.
+        Settings are only re-evaluated when the effective profile changed.
         """
-        pythoncom.CoInitialize()
-        wmi_connection = None
-        watcher = None
+        profile_changed = False
+        for info in delta.exited:
+            self.process_tree.remove(info)
+            profile_changed |= self.app_stack.remove(info.pid)
+        for info in start_order(delta.created):
+            program = self._match_process(info)
+            if program is not None:
+                key = program_key(program)
+                is_launch = self.app_stack.refcount(key) == (1 if key == self.staged_key else 0)
+                profile_changed |= self.app_stack.add(info.pid, program)
+                if is_launch:
+                    self._on_program_launched(program)
+        if profile_changed:
+            self._log_stack_top()
+            self.update_settings()
+
+    # --- Launch prediction ---
+
+    def _monitored_program(self, key):
+        for program in self.monitored_programs:
+            if program.get('is_enabled', True) and program_key(program) == key:
+                return program
+        return None
+
+    def _on_program_launched(self, program):
+        """Learns from a program launch and acts on the prediction it leads to."""
+        if self.prediction_mode == 'off':
+            return
+        key = program_key(program)
+        predicted = self.launch_predictor.pending
+        prediction = self.launch_predictor.record_launch(key, program['name'])
+        self._schedule_history_save()
+        if predicted is not None and predicted.key == key:
+            print(f"[PREDICT] Hit: '{program['name']}' was launched as predicted. {self.launch_predictor.stats()}")
+            self._settle_prediction()
+        if prediction is not None:
+            self._on_prediction(prediction)
+
+    def _schedule_history_save(self):
+        """Saves the launch history a while after it changed, so launches that follow within the delay share one write."""
+        if self.history_save_timer is None and self.launch_predictor.dirty:
+            self.history_save_timer = self.loop.call_later(self.launch_predictor.save_delay, self._on_history_save_due)
+
+    def _on_history_save_due(self):
+        self.history_save_timer = None
+        history = self.launch_predictor.take_history()
+        if history is not None:
+            # Copied on the loop, so the write cannot see the history change under it
+            self.loop.run_in_executor(self.io_executor, save_json, self.launch_predictor.history_path, history)
+
+    def _on_prediction(self, prediction):
+        # A new prediction replaces (and misses) the previous one
+        self._settle_prediction()
+        print(f"[PREDICT] Expecting '{prediction.name}' within {self.launch_predictor.window:.0f}s ({prediction.reason}, p={prediction.probability:.2f}).")
+        self.prediction_timer = self.loop.call_later(self.launch_predictor.time_until_expiry(), self._on_prediction_expired)
+        if self.prediction_mode == 'observe':
+            return
+        # Poll faster until the launch happened, so the switch follows it closely
+        self._wake()
+        if self.prediction_mode == 'prestage' and self.service_enabled:
+            program = self._monitored_program(prediction.key)
+            if program is not None and self.triggers.is_active(program) and not self.app_stack.refcount(prediction.key):
+                self.staged_key = prediction.key
+                if self.app_stack.add(self.PREDICTED_INSTANCE + ':' + prediction.key, program):
+                    self._log_stack_top()
+                    self.update_settings()
+
+    def _on_prediction_expired(self):
+        self.prediction_timer = None
+        expired = self.launch_predictor.expire()
+        if expired is not None:
+            print(f"[PREDICT] Miss: '{expired.name}' was not launched. {self.launch_predictor.stats()}")
+        self._settle_prediction()
+
+    def _settle_prediction(self):
+        """Ends the effects of the pending prediction."""
+        if self.prediction_timer is not None:
+            self.prediction_timer.cancel()
+            self.prediction_timer = None
+        self._unstage_prediction()
+
+    def _unstage_prediction(self):
+        """Takes a pre-staged program off the stack again, unless it has really been launched meanwhile."""
+        key = self.staged_key
+        if key is None:
+            return
+        self.staged_key = None
+        instance = self.PREDICTED_INSTANCE + ':' + key
+        if not self.app_stack.has_pid(instance):
+            return
+        if self.app_stack.refcount(key) > 1:
+            self.app_stack.remove(instance)
+        # remove_program, so a launch that never happened is not recorded as a session
+        elif self.app_stack.remove_program(key):
+            self._log_stack_top()
+            self.update_settings()
+
+    def _schedule_hour_timer(self):
+        now = self.launch_predictor.now()
+        next_hour = now.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+        self.hour_timer = self.loop.call_later((next_hour - now).total_seconds(), self._on_hour)
+
+    def _on_hour(self):
+        """Predicts the programs usually launched at this time of day."""
+        self._schedule_hour_timer()
+        if self.prediction_mode != 'off':
+            prediction = self.launch_predictor.predict_for_hour()
+            if prediction is not None:
+                self._on_prediction(prediction)
+
+    async def _call_source(self, method, *args):
+        """Calls a process source method, on the detection thread if the source blocks."""
+        if not self.process_source.needs_thread:
+            return method(*args)
+        if self.detection_executor is None:
+            # One thread, so a COM apartment opened by the source stays valid
+            self.detection_executor = DaemonThreadExecutor(max_workers=1, thread_name_prefix='detection')
+        return await self.loop.run_in_executor(self.detection_executor, method, *args)
+
+    def _poll_blocking(self, interval, timeout):
+        self.process_source.set_interval(interval)
+        return self.process_source.poll(timeout)
+
+    async def _poll_source(self, interval, timeout):
+        """Waits up to `timeout` seconds for process changes, returning early when woken."""
+        if self.process_source.needs_thread:
+            return await self._call_source(self._poll_blocking, interval, timeout)
         try:
-            raw_wql = "SELECT * FROM __InstanceOperationEvent WITHIN 2 WHERE TargetInstance ISA 'Win32_Process'"
-            
-            while not self.stop_event.is_set():
-                # Pause the loop if the service is disabled
-                if self.service_paused.is_set():
-                    self.service_paused.wait()
-                    # After resuming, a rescan is needed to catch up on any changes
-                    self.rescan_needed.set()
+            await asyncio.wait_for(self.wake_event.wait(), timeout)
+            self.wake_event.clear()
+        except asyncio.TimeoutError:
+            pass
+        return self.process_source.poll(0)
+
+    async def _detect_processes(self):
+        """
+        The core event-driven task. It feeds process deltas from the process source into the stack.
+        While there is nothing to watch the source is closed and the task waits without any wakeups.
+        """
+        source = self.process_source
+        is_open = False
+        is_blocked = False
+        try:
+            while True:
+                has_rules = self.service_enabled and self.executable_matcher.rule_count > 0
+                launch_expected = self.prediction_mode in ('prepare', 'prestage') and self.launch_predictor.pending is not None
+                interval = self.cadence.interval(has_rules, self.app_stack.top(), launch_expected)
+
+                if interval is None:
+                    if is_open:
+                        await self._call_source(source.close)
+                        is_open = False
+                        self.rescan_needed = True
+                    if not is_blocked:
+                        is_blocked = True
+                        self._reset_stack()
+                        self.state_resolved = True
+                        self.update_settings()
+                    # Wait until the config changes or the service stops
+                    await self.wake_event.wait()
+                    self.wake_event.clear()
+                    self.cadence.record_wakeup()
                     continue
 
+                is_blocked = False
                 try:
-                    if wmi_connection is None:
-                        print("Initializing WMI connection...")
-                        wmi_connection = wmi.WMI()
-                        watcher = wmi_connection.watch_for(raw_wql=raw_wql)
-                        print("WMI connection and event watcher started.")
-                        self.rescan_needed.set()
-
-                    if self.rescan_needed.is_set():
-                        self.rescan_needed.clear()
-                        self._perform_process_scan(wmi_connection)
-
-                    event = watcher(timeout_ms=1000)
-                    if event:
-                        self._perform_process_scan(wmi_connection)
-
-                except wmi.x_wmi_timed_out:
-                    continue
-                
-                except (wmi.x_wmi, pythoncom.com_error) as e:
-                    print(f"[WARNING] WMI/COM error occurred: {e}. Re-initializing connection.")
-                    watcher = None
-                    wmi_connection = None
-                    time.sleep(5)
+                    if not is_open:
+                        print(f"Initializing '{source.name}' process source...")
+                        await self._call_source(source.open)
+                        is_open = True
+                        await self._call_source(source.snapshot)
+                        print("Process source started.")
+                        self.rescan_needed = True
+
+                    if self.rescan_needed:
+                        self.rescan_needed = False
+                        # A full rescan supersedes any pending burst
+                        self.event_coalescer.take()
+                        self._perform_process_scan()
+
+                    # Bursts of events are folded into one reconciliation
+                    flush_in = self.event_coalescer.time_until_flush()
+                    delta = await self._poll_source(interval, interval if flush_in is None else min(flush_in, interval))
+                    self.cadence.record_wakeup()
+                    if delta:
+                        self.event_coalescer.add(delta)
+                    if self.event_coalescer.time_until_flush() == 0:
+                        batch = self.event_coalescer.take()
+                        if batch:
+                            self._handle_process_delta(batch)
+
+                except ProcessSourceError as e:
+                    print(f"[WARNING] Process source error occurred: {e}. Re-initializing source.")
+                    await self._call_source(source.close)
+                    is_open = False
+                    await asyncio.sleep(5)
 
                 except Exception as e:
-                    print(f"[ERROR] An unexpected error occurred in WMI loop: {e}")
-                    watcher = None
-                    wmi_connection = None
-                    time.sleep(10)
+                    print(f"[ERROR] An unexpected error occurred in process detection: {e}")
+                    await self._call_source(source.close)
+                    is_open = False
+                    await asyncio.sleep(10)
         finally:
-            watcher = None
-            wmi_connection = None
-            pythoncom.CoUninitialize()
-            print("WMI event watcher stopped.")
+            if is_open:
+                source.interrupt()
+                if source.needs_thread:
+                    # Queued behind a poll that may still be blocked; never wait for it here
+                    self.detection_executor.submit(source.close)
+                else:
+                    source.close()
+            print("Process event watcher stopped.")
 
-    def sort_stack(self):
-        """
-        Sorts the running apps stack by priority.
-        """
-        self.running_apps_stack.sort(key=lambda x: (
-            x['settings'].get('priority', {}).get('is_unchanged', True),
-            x['settings'].get('priority', {}).get('tile_value', 9999)
-        ))
-        # Debug print for the queue state
-        stack_names = [app['name'] for app in self.running_apps_stack]
-        print(f"[QUEUE] Priority stack updated: {stack_names}")
+    def _log_stack_top(self):
+        top_app = self.app_stack.top()
+        top_name = top_app['name'] if top_app else None
+        print(f"[QUEUE] Top of priority stack: {top_name} ({len(self.app_stack)} programs running)")
 
     def update_settings(self):
         """
         The core state machine. Determines the correct profile and applies it
-        ONLY if it's different from the last applied profile.
+        ONLY if it or its settings differ from the last applied profile.
+        Switches to another profile go through the switch scheduler, which may hold
+        them back; a timer then re-evaluates once the switch is due.
+        The setters run on the apply thread, so detection never waits for them.
         """
-        with self.lock:
-            target_profile_name = None
-            target_profile_settings = None
-            target_profile_path = None
-
-            if not self.service_enabled:
-                target_profile_name = "service_disabled"
-            elif self.running_apps_stack:
-                top_app = self.running_apps_stack[0]
-                target_profile_name = top_app['name']
-                target_profile_settings = top_app['settings']
-                target_profile_path = top_app['path']
+        if not self.state_resolved:
+            # Until the first scan, the stack would resolve to the default profile
+            return
+
+        target_profile_name = None
+        target_profile_settings = None
+        target_profile_path = None
+        target_profile_key = None
+
+        if not self.service_enabled:
+            target_profile_name = "service_disabled"
+        elif self.app_stack.top() is not None:
+            top_app = self.app_stack.top()
+            target_profile_name = top_app['name']
+            # Settings the top program leaves unchanged come from the programs below it
+            target_profile_settings = self.app_stack.effective_settings()
+            target_profile_path = top_app['path']
+            target_profile_key = top_app['key']
+        else:
+            if self.default_settings_option == 'use':
+                target_profile_name = "Default"
+                target_profile_settings = self.default_settings
+                target_profile_path = os.path.abspath(os.path.join(get_asset_path(), 'main.py'))
             else:
-                if self.default_settings_option == 'use':
-                    prefs = load_preferences()
-                    target_profile_name = "Default"
-                    target_profile_settings = prefs.get('default_settings', {})
-                    target_profile_path = os.path.abspath(os.path.join(get_asset_path(), 'main.py'))
-                else:
-                    target_profile_name = "Idle"
+                target_profile_name = "Idle"
+
+        if target_profile_name == self.last_applied_profile_name and target_profile_settings == self.last_applied_settings:
+            self._cancel_switch_timer()
+            self.switch_scheduler.cancel()
+            return
+
+        # Settings edits of the current profile and disabling the service are never held back
+        if target_profile_name != self.last_applied_profile_name and target_profile_name != "service_disabled":
+            # A program removed from the config is not expected back, so only real exits get the grace period
+            key = self.last_applied_key
+            is_exit = key is not None and key in self.monitored_keys and self.app_stack.refcount(key) == 0
+            delay = self.switch_scheduler.delay(target_profile_name, is_exit)
+            if delay > 0:
+                self._cancel_switch_timer()
+                self.switch_timer = self.loop.call_later(delay, self._on_switch_due)
+                return
+
+        self._cancel_switch_timer()
+        print(f"State change: '{self.last_applied_profile_name}' -> '{target_profile_name}'")
+        # Also submitted without settings, so a profile still being applied is superseded.
+        # The snapshot is only recorded once every step succeeded.
+        on_done = functools.partial(self._record_snapshot, target_profile_name, target_profile_settings, self.config_hash)
+        self.apply_worker.submit(target_profile_settings, target_profile_name, target_profile_path, on_done)
+        if target_profile_name != self.last_applied_profile_name:
+            self.switch_scheduler.record_switch()
+        else:
+            self.switch_scheduler.cancel()
+        self.last_applied_profile_name = target_profile_name
+        self.last_applied_settings = target_profile_settings
+        self.last_applied_key = target_profile_key
+
+    def _on_switch_due(self):
+        self.switch_timer = None
+        self.update_settings()
+
+    def _cancel_switch_timer(self):
+        if self.switch_timer is not None:
+            self.switch_timer.cancel()
+            self.switch_timer = None
 
-            if target_profile_name != self.last_applied_profile_name:
-                print(f"State change: '{self.last_applied_profile_name}' -> '{target_profile_name}'")
-                if target_profile_settings:
-                    self.settings_manager.apply_settings(target_profile_settings, target_profile_name, target_profile_path)
-                self.last_applied_profile_name = target_profile_name
+    def _record_snapshot(self, profile_name, settings, config_hash, applied):
+        if not applied:
+            # The system is somewhere between two profiles, so the next start must apply everything
+            self.snapshot.forget()
+            return
+        self.snapshot.record(profile_name, settings, config_hash)
+        self.snapshot.save()
 
 if __name__ == '__main__':
     service = BackgroundService()
@@ -0,0 +1,76 @@
+"""
+Measures ExecutableMatcher build and per-process match cost against the number of rules.
+Runs on any platform: python benchmarks/bench_executable_matcher.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from executable_matcher import ExecutableMatcher
+
+RULE_COUNTS = [10, 100, 1000, 5000, 10000]
+PROCESS_COUNT = 5000
+# The warm run repeats processes that all fit in the matcher's LRU cache
+WARM_COUNT = ExecutableMatcher.CACHE_SIZE // 2
+
+def make_programs(count, rng):
+    """60% full paths, 20% bare names, 18% globs, 2% regexes."""
+    programs = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.6:
+            match = None
+            path = f"C:\\Program Files\\Vendor{i % 97}\\App{i}\\app{i}.exe"
+        elif roll < 0.8:
+            match = {'type': 'basename', 'pattern': f"tool{i}.exe"}
+            path = f"tool{i}.exe"
+        elif roll < 0.98:
+            match = {'type': 'glob', 'pattern': f"D:\\Games\\Library{i}\\*\\*.exe"}
+            path = match['pattern']
+        else:
+            match = {'type': 'regex', 'pattern': rf"\\build{i}\\.*\.exe$"}
+            path = match['pattern']
+        program = {'name': f"program{i}", 'path': path, 'settings': {}, 'is_enabled': True}
+        if match:
+            program['match'] = match
+        programs.append(program)
+    return programs
+
+def make_processes(rule_count, rng):
+    """Mostly unmonitored system processes, with ~10% hitting some rule."""
+    processes = []
+    for i in range(PROCESS_COUNT):
+        if rng.random() < 0.1:
+            n = rng.randrange(rule_count)
+            processes.append((f"app{n}.exe", f"C:\\Program Files\\Vendor{n % 97}\\App{n}\\app{n}.exe"))
+        else:
+            processes.append((f"svc{i}.exe", f"C:\\Windows\\System32\\svc{i}.exe"))
+    return processes
+
+def main():
+    rng = random.Random(42)
+    print(f"{'rules':>7} {'build ms':>10} {'cold us/proc':>13} {'warm us/proc':>13} {'matched':>8}")
+    for count in RULE_COUNTS:
+        programs = make_programs(count, rng)
+        processes = make_processes(count, rng)
+
+        start = time.perf_counter()
+        matcher = ExecutableMatcher(programs)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matched = sum(1 for name, path in processes if matcher.match(name, path) is not None)
+        cold = time.perf_counter() - start
+
+        repeated = processes[-WARM_COUNT:]
+        start = time.perf_counter()
+        for name, path in repeated:
+            matcher.match(name, path)
+        warm = time.perf_counter() - start
+
+        print(f"{count:>7} {build * 1000:>10.2f} {cold / PROCESS_COUNT * 1e6:>13.2f} {warm / WARM_COUNT * 1e6:>13.2f} {matched:>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Measures the in-process setting backends (system color, night light, performance plan) against
+in-memory registry and power plan stand-ins, next to the cost of starting one interpreter process,
+which is what every PowerShell-based setter paid before.
+Runs on any platform: python benchmarks/bench_native_backends.py
+"""
+import os
+import sys
+import time
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from native_backends import (
+    MemoryRegistry, MemoryPower, native_setting_backends,
+    PERSONALIZE_KEY, NIGHT_LIGHT_STATE_KEY, NIGHT_LIGHT_SETTINGS_KEY,
+)
+
+ROUNDS = 10000
+SPAWN_ROUNDS = 10
+# Tile values each setting is switched between
+VALUES = {'systemcolor': (0, 1), 'nightlight': (0, 1), 'performance': (0, 1, 2)}
+
+def make_backends():
+    registry = MemoryRegistry({
+        PERSONALIZE_KEY: {'AppsUseLightTheme': 1, 'SystemUsesLightTheme': 1},
+        NIGHT_LIGHT_STATE_KEY: {'Data': bytes(41)},
+        NIGHT_LIGHT_SETTINGS_KEY: {'Data': bytes(64)},
+    })
+    return native_setting_backends(registry, MemoryPower())
+
+def main():
+    backends = make_backends()
+    print(f"{'setting':>12} {'apply us':>9} {'read us':>8}")
+    for setting, values in VALUES.items():
+        backend = backends[setting]
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            assert backend.apply(values[i % len(values)])
+        apply_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            backend.read()
+        read_time = time.perf_counter() - start
+        print(f"{setting:>12} {apply_time / ROUNDS * 1e6:>9.2f} {read_time / ROUNDS * 1e6:>8.2f}")
+
+    start = time.perf_counter()
+    for _ in range(SPAWN_ROUNDS):
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+    print(f"One interpreter process (stand-in for a PowerShell setter): {(time.perf_counter() - start) / SPAWN_ROUNDS * 1000:.2f} ms")
+
+if __name__ == '__main__':
+    main()
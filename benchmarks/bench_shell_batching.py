@@ -0,0 +1,61 @@
+"""
+Measures one profile switch with several shell-backed setters, run per call or as one batch
+script, each in fresh interpreter processes and on the persistent ShellHost.
+Uses a Python stand-in interpreter, so it runs on any platform: python benchmarks/bench_shell_batching.py
+Pass --powershell on Windows to measure PowerShell itself.
+"""
+import os
+import sys
+import time
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shell_host import ShellHost, parse_batch_results, python_host_command, python_batch, powershell_host_command, powershell_batch
+
+STEP_COUNTS = [1, 2, 4, 8]
+ROUNDS = 10
+
+def interpreter(use_powershell):
+    """(one-shot command prefix, host command, batch builder, step script)"""
+    if use_powershell:
+        return ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command"], powershell_host_command(), powershell_batch, "$x = 1"
+    return [sys.executable, "-c"], python_host_command(), python_batch, "x = 1"
+
+def timed(function):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        function()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+def main():
+    use_powershell = '--powershell' in sys.argv
+    one_shot, host_command, batch, script = interpreter(use_powershell)
+    host = ShellHost(host_command, size=1, max_calls=10 ** 6)
+    host.start()
+    host.run(script)  # Finish the warm-up
+
+    print(f"{'steps':>6} {'per-call ms':>12} {'batched ms':>11} {'host per-call ms':>17} {'host batched ms':>16}")
+    for count in STEP_COUNTS:
+        steps = [(f"step{i}", script) for i in range(count)]
+        batch_script = batch(steps)
+
+        def per_call():
+            for _, step_script in steps:
+                subprocess.run(one_shot + [step_script], check=True, capture_output=True)
+
+        def batched():
+            output = subprocess.run(one_shot + [batch_script], check=True, capture_output=True, text=True).stdout
+            assert len(parse_batch_results(output)) == count
+
+        def host_per_call():
+            for _, step_script in steps:
+                assert host.run(step_script).ok
+
+        def host_batched():
+            assert len(parse_batch_results(host.run(batch_script).output)) == count
+
+        print(f"{count:>6} {timed(per_call):>12.2f} {timed(batched):>11.2f} {timed(host_per_call):>17.2f} {timed(host_batched):>16.2f}")
+    host.shutdown()
+
+if __name__ == '__main__':
+    main()
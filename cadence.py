@@ -0,0 +1,107 @@
+import time
+from collections import deque
+
+def psutil_on_battery():
+    """Returns True when running on battery. Machines without a battery count as plugged in."""
+    try:
+        import psutil
+        battery = psutil.sensors_battery()
+    except Exception:
+        return False
+    return battery is not None and not battery.power_plugged
+
+class CadenceController:
+    """
+    Picks how long the detection loop may sleep before it looks at processes again.
+
+      - nothing to watch (no enabled rules or service disabled): None, i.e. block until woken
+      - an active profile whose app usually exits around now: `exit_interval`
+      - a predicted program launch is pending: `exit_interval`
+      - on battery: `battery_interval`
+      - otherwise: `interval`
+
+    An app is expected to exit soon once it has been running for `exit_threshold` of the
+    median length of its previous sessions, until it outlived twice that median.
+    Every return of the detection loop is counted as a wakeup.
+    """
+    BATTERY_CHECK_INTERVAL = 30.0
+    SESSION_HISTORY = 9
+
+    def __init__(self, interval=2.0, battery_interval=5.0, exit_interval=0.5, exit_threshold=0.8, on_battery=psutil_on_battery, clock=time.monotonic):
+        self.on_battery = on_battery
+        self.clock = clock
+        self.configure(interval, battery_interval, exit_interval, exit_threshold)
+        self.mode = None
+        self._battery = False
+        self._battery_checked = None
+        self._sessions = {}  # program key -> deque of session lengths in seconds
+        self._wakeups = deque()
+
+    def configure(self, interval=2.0, battery_interval=5.0, exit_interval=0.5, exit_threshold=0.8):
+        self.base_interval = interval
+        self.battery_interval = battery_interval
+        self.exit_interval = exit_interval
+        self.exit_threshold = exit_threshold
+
+    def configure_from_preferences(self, prefs):
+        options = prefs.get('detection_cadence', {})
+        self.configure(
+            interval=options.get('interval_ms', 2000) / 1000.0,
+            battery_interval=options.get('battery_interval_ms', 5000) / 1000.0,
+            exit_interval=options.get('exit_interval_ms', 500) / 1000.0,
+            exit_threshold=options.get('exit_threshold', 0.8),
+        )
+
+    def interval(self, has_rules, top_app=None, launch_expected=False):
+        """Returns the detection interval in seconds, or None if the loop should block."""
+        if not has_rules:
+            return self._set_mode('blocked', None)
+        if top_app is not None and self._expected_to_exit(top_app):
+            return self._set_mode('exit-soon', self.exit_interval)
+        if launch_expected:
+            return self._set_mode('launch-soon', self.exit_interval)
+        if self._is_on_battery():
+            return self._set_mode('battery', self.battery_interval)
+        return self._set_mode('active' if top_app is not None else 'normal', self.base_interval)
+
+    def _set_mode(self, mode, interval):
+        if mode != self.mode:
+            self.mode = mode
+            interval_text = 'blocking' if interval is None else f"{interval:.1f}s"
+            print(f"[CADENCE] Detection mode '{mode}' ({interval_text}), {self.wakeups_per_minute()} wakeups in the last minute.")
+        return interval
+
+    def _is_on_battery(self):
+        now = self.clock()
+        if self._battery_checked is None or now - self._battery_checked >= self.BATTERY_CHECK_INTERVAL:
+            self._battery = self.on_battery()
+            self._battery_checked = now
+        return self._battery
+
+    def _expected_to_exit(self, app):
+        sessions = self._sessions.get(app['key'])
+        if not sessions:
+            return False
+        median = sorted(sessions)[len(sessions) // 2]
+        elapsed = self.clock() - app['started_at']
+        return median * self.exit_threshold <= elapsed <= median * 2
+
+    def record_session(self, app):
+        """Remembers how long an app ran, once its last instance exited."""
+        sessions = self._sessions.setdefault(app['key'], deque(maxlen=self.SESSION_HISTORY))
+        sessions.append(self.clock() - app['started_at'])
+
+    def record_wakeup(self):
+        now = self.clock()
+        self._wakeups.append(now)
+        while self._wakeups and now - self._wakeups[0] > 60.0:
+            self._wakeups.popleft()
+
+    def wakeups_per_minute(self):
+        now = self.clock()
+        while self._wakeups and now - self._wakeups[0] > 60.0:
+            self._wakeups.popleft()
+        return len(self._wakeups)
+
+    def stats(self):
+        return {'mode': self.mode, 'wakeups_per_minute': self.wakeups_per_minute()}
@@ -0,0 +1,45 @@
+from app_stack import program_key
+from executable_matcher import rule_of
+
+# Fields that decide which processes belong to a program, and when it is active
+RULE_FIELDS = ('match', 'include_descendants', 'conditions')
+
+class ProgramsDiff:
+    """The difference between two versions of programs.json, keyed by program path."""
+    def __init__(self):
+        self.added = []             # new or re-enabled programs
+        self.removed = []           # deleted or disabled programs
+        self.rule_changed = []      # (old, new) pairs whose matching rule changed
+        self.settings_changed = []  # programs whose name or settings changed only
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.rule_changed or self.settings_changed)
+
+    def __str__(self):
+        return (f"{len(self.added)} added, {len(self.removed)} removed, "
+                f"{len(self.rule_changed)} rule changes, {len(self.settings_changed)} settings changes")
+
+def _enabled_by_key(programs):
+    by_key = {}
+    for program in programs:
+        if program.get('is_enabled', True):
+            by_key.setdefault(program_key(program), program)
+    return by_key
+
+def diff_programs(old_programs, new_programs):
+    """Compares the enabled programs of two configs. Disabling counts as removal, enabling as addition."""
+    old = _enabled_by_key(old_programs)
+    new = _enabled_by_key(new_programs)
+    diff = ProgramsDiff()
+    for key, program in new.items():
+        previous = old.get(key)
+        if previous is None:
+            diff.added.append(program)
+        elif rule_of(previous) != rule_of(program) or any(previous.get(f) != program.get(f) for f in RULE_FIELDS):
+            diff.rule_changed.append((previous, program))
+        elif previous.get('settings') != program.get('settings') or previous['name'] != program['name']:
+            diff.settings_changed.append(program)
+    for key, program in old.items():
+        if key not in new:
+            diff.removed.append(program)
+    return diff
@@ -0,0 +1,72 @@
+import queue
+import threading
+from concurrent.futures import Executor, Future
+
+class DaemonThreadExecutor(Executor):
+    """
+    Executor backed by daemon threads.
+    Unlike ThreadPoolExecutor, work that is still blocked at shutdown (a WMI wait,
+    a hung setter) is abandoned instead of keeping the process alive at exit.
+    """
+    def __init__(self, max_workers=1, thread_name_prefix='worker'):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._queue = queue.SimpleQueue()
+        self._threads = []
+        self._idle = 0     # workers waiting for an item
+        self._pending = 0  # submitted items no worker has taken yet
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+            self._queue.put((future, fn, args, kwargs))
+            self._pending += 1
+            # Like ThreadPoolExecutor: a burst must not queue behind a single idle worker
+            if self._pending > self._idle and len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._work, name=f"{self.thread_name_prefix}_{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        return future
+
+    def _work(self):
+        while True:
+            with self._lock:
+                self._idle += 1
+            item = self._queue.get()
+            with self._lock:
+                self._idle -= 1
+                if item is not None:
+                    self._pending -= 1
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+        if cancel_futures:
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    with self._lock:
+                        self._pending -= 1
+                    item[0].cancel()
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,119 @@
+import time
+from process_source import ProcessDelta
+
+class EventCoalescer:
+    """
+    Merges bursts of process deltas into a single reconciliation.
+
+    A burst starts with the first event and is flushed once no new event arrived
+    for `window` seconds, or at the latest `max_window` seconds after it started.
+    When the event rate stays above `storm_rate` events/s, the coalescer switches to
+    storm mode and only flushes every `reconcile_interval` seconds until the rate
+    drops below half the threshold again.
+    """
+    def __init__(self, window=0.05, max_window=0.5, storm_rate=100, reconcile_interval=2.0, clock=time.monotonic):
+        self.clock = clock
+        self.configure(window, max_window, storm_rate, reconcile_interval)
+        self.storm_mode = False
+        self._created = {}  # (pid, create_time) -> ProcessInfo
+        self._exited = {}   # (pid, create_time) -> ProcessInfo
+        self._burst_started = None
+        self._last_event = None
+        self._rate_window_start = self.clock()
+        self._rate_window_events = 0
+
+        # --- Counters ---
+        self.events_received = 0
+        self.events_folded = 0
+        self.batches = 0
+        self.storms = 0
+
+    def configure(self, window=0.05, max_window=0.5, storm_rate=100, reconcile_interval=2.0):
+        self.window = window
+        self.max_window = max(max_window, window)
+        self.storm_rate = storm_rate
+        self.reconcile_interval = reconcile_interval
+
+    def configure_from_preferences(self, prefs):
+        options = prefs.get('event_coalescing', {})
+        self.configure(
+            window=options.get('window_ms', 50) / 1000.0,
+            max_window=options.get('max_window_ms', 500) / 1000.0,
+            storm_rate=options.get('storm_events_per_sec', 100),
+            reconcile_interval=options.get('reconcile_interval_ms', 2000) / 1000.0,
+        )
+
+    @property
+    def pending(self):
+        return self._burst_started is not None
+
+    def add(self, delta):
+        """Folds a delta into the current burst."""
+        now = self.clock()
+        if self._burst_started is None:
+            self._burst_started = now
+        self._last_event = now
+
+        for info in delta.exited:
+            self._count_event(now)
+            if self._created.pop(info.key, None) is not None:
+                # Started and exited within the same burst: nothing to reconcile
+                self.events_folded += 2
+            else:
+                self._exited[info.key] = info
+        for info in delta.created:
+            self._count_event(now)
+            if info.key in self._created:
+                self.events_folded += 1
+            self._created[info.key] = info
+
+    def _count_event(self, now):
+        self.events_received += 1
+        self._rate_window_events += 1
+        elapsed = now - self._rate_window_start
+        if elapsed < 1.0:
+            return
+        rate = self._rate_window_events / elapsed
+        self._rate_window_start = now
+        self._rate_window_events = 0
+        if not self.storm_mode and rate > self.storm_rate:
+            self.storm_mode = True
+            self.storms += 1
+            print(f"[EVENTS] Event storm detected ({rate:.0f} events/s), reconciling every {self.reconcile_interval:.1f}s. {self.stats()}")
+        elif self.storm_mode and rate < self.storm_rate / 2:
+            self.storm_mode = False
+            print(f"[EVENTS] Event storm over ({rate:.0f} events/s). {self.stats()}")
+
+    def time_until_flush(self):
+        """Seconds until the pending burst should be flushed, or None if nothing is pending."""
+        if self._burst_started is None:
+            return None
+        now = self.clock()
+        if self.storm_mode:
+            deadline = self._burst_started + self.reconcile_interval
+        else:
+            deadline = min(self._last_event + self.window, self._burst_started + self.max_window)
+        return max(0.0, deadline - now)
+
+    def take(self):
+        """Returns the merged delta of the current burst and starts a new one."""
+        exited = list(self._exited.values())
+        created = list(self._created.values())
+        if self._burst_started is not None:
+            self.batches += 1
+            # Every event beyond the first of a batch was folded into it
+            self.events_folded += max(0, len(exited) + len(created) - 1)
+        self._created = {}
+        self._exited = {}
+        self._burst_started = None
+        self._last_event = None
+        return ProcessDelta(created, exited)
+
+    def stats(self):
+        return {
+            'events_received': self.events_received,
+            'events_folded': self.events_folded,
+            'batches': self.batches,
+            'storms': self.storms,
+            'storm_mode': self.storm_mode,
+        }
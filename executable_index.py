@@ -0,0 +1,231 @@
+import os
+import threading
+
+from watchdog.events import FileSystemEventHandler
+from json_handler import load_json, save_json, get_executable_index_path
+from executable_matcher import normalize_path
+
+EXECUTABLE_EXTENSIONS = ('.exe',)
+
+def _parent_of(path):
+    return path.rsplit('/', 1)[0] + '/' if '/' in path else ''
+
+class _IndexEventHandler(FileSystemEventHandler):
+    """Keeps the index current from watchdog events below the indexed directories."""
+    def __init__(self, index):
+        self.index = index
+
+    def on_created(self, event):
+        if event.is_directory:
+            self.index.rescan_directory(event.src_path)
+        else:
+            self.index.add_file(event.src_path)
+
+    def on_deleted(self, event):
+        self.index.remove_path(event.src_path)
+
+    def on_moved(self, event):
+        self.index.remove_path(event.src_path)
+        if event.is_directory:
+            self.index.rescan_directory(event.dest_path)
+        else:
+            self.index.add_file(event.dest_path)
+
+class ExecutableIndex:
+    """
+    Index of the executables found below the directories of 'directory' rules.
+
+    The index is built by a background scan and persisted together with the mtime of
+    every scanned directory, so a restart only re-lists directories whose contents
+    changed. Afterwards it is kept current by watchdog events. Lookups are a set
+    membership test plus a walk over the path's ancestors to find its rule root.
+    """
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path or get_executable_index_path()
+        self.lock = threading.Lock()
+        self.generation = 0     # bumped on every change, so matchers can drop stale lookups
+        self.ready = False      # False until the first scan of the current roots finished
+        self._roots = {}        # normalized root -> root as configured
+        self._executables = set()  # normalized executable paths
+        self._directories = {}  # directory as on disk -> [mtime, [executable names], [subdirectory names]]
+        self._observer = None
+        self._watches = {}      # normalized root -> watchdog watch
+        self._handler = _IndexEventHandler(self)
+        self._scan_thread = None
+        self._scan_requested = threading.Event()
+
+    def __len__(self):
+        return len(self._executables)
+
+    def set_roots(self, roots):
+        """Sets the directories to index and starts a background scan if they changed."""
+        roots = {normalize_path(root).rstrip('/') + '/': root for root in roots}
+        with self.lock:
+            if roots.keys() == self._roots.keys():
+                return
+            self._roots = roots
+            self.ready = not roots
+            self.generation += 1
+        self._update_watches()
+        if roots:
+            self._request_scan()
+
+    def attach(self, observer):
+        """Uses a running watchdog observer to refresh the index incrementally."""
+        self._observer = observer
+        self._update_watches()
+
+    def root_of(self, path):
+        """Returns the deepest configured root containing the executable at `path`, or None."""
+        normalized = normalize_path(path)
+        if normalized not in self._executables:
+            return None
+        return self._deepest_root(normalized)
+
+    def _deepest_root(self, normalized):
+        roots = self._roots
+        parent = _parent_of(normalized)
+        while parent:
+            if parent in roots:
+                return roots[parent]
+            parent = _parent_of(parent.rstrip('/'))
+        return None
+
+    # --- Incremental updates ---
+
+    def add_file(self, path):
+        if not path.lower().endswith(EXECUTABLE_EXTENSIONS):
+            return
+        normalized = normalize_path(path)
+        with self.lock:
+            if self._deepest_root(normalized) is None or normalized in self._executables:
+                return
+            self._executables.add(normalized)
+            self._refresh_directory(os.path.dirname(path))
+            self.generation += 1
+
+    def remove_path(self, path):
+        normalized = normalize_path(path)
+        with self.lock:
+            if normalized in self._executables:
+                self._executables.discard(normalized)
+            else:
+                # A removed directory takes all of its executables with it
+                prefix = normalized.rstrip('/') + '/'
+                removed = {exe for exe in self._executables if exe.startswith(prefix)}
+                if not removed:
+                    return
+                self._executables -= removed
+                for directory in [d for d in self._directories if normalize_path(d).startswith(prefix)]:
+                    del self._directories[directory]
+            self._refresh_directory(os.path.dirname(path))
+            self.generation += 1
+
+    def rescan_directory(self, path):
+        directories, executables = self._scan_tree(path, {})
+        with self.lock:
+            self._directories.update(directories)
+            self._executables |= executables
+            self.generation += 1
+
+    def _refresh_directory(self, directory):
+        listing = self._list_directory(directory)
+        if listing is None:
+            self._directories.pop(directory, None)
+        else:
+            self._directories[directory] = listing
+
+    # --- Background scan ---
+
+    def _request_scan(self):
+        self._scan_requested.set()
+        if self._scan_thread is None or not self._scan_thread.is_alive():
+            self._scan_thread = threading.Thread(target=self._scan_loop, daemon=True)
+            self._scan_thread.start()
+
+    def _scan_loop(self):
+        while self._scan_requested.is_set():
+            self._scan_requested.clear()
+            try:
+                self._scan_all()
+            except Exception as e:
+                print(f"[ERROR] Executable index scan failed: {e}")
+
+    def _scan_all(self):
+        cached = load_json(self.cache_path, {}).get('directories', {})
+        roots = list(self._roots.values())
+        directories = {}
+        executables = set()
+        for root in roots:
+            root_directories, root_executables = self._scan_tree(root, cached)
+            directories.update(root_directories)
+            executables |= root_executables
+        with self.lock:
+            self._directories = directories
+            self._executables = executables
+            self.ready = True
+            self.generation += 1
+        print(f"Executable index ready: {len(executables)} executables below {len(roots)} directories.")
+        self.save()
+
+    def _list_directory(self, directory):
+        """Returns [mtime, executable names, subdirectory names] for a directory, or None if it is gone."""
+        try:
+            mtime = os.stat(directory).st_mtime
+            names = []
+            subdirectories = []
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.name)
+                    elif entry.name.lower().endswith(EXECUTABLE_EXTENSIONS):
+                        names.append(entry.name)
+        except OSError:
+            return None
+        return [mtime, names, subdirectories]
+
+    def _scan_tree(self, root, cached):
+        """
+        Walks `root`, re-listing only directories whose mtime differs from the cache.
+        An unchanged directory costs a single stat, as its listing comes from the cache.
+        """
+        directories = {}
+        executables = set()
+        pending = [root]
+        while pending:
+            directory = pending.pop()
+            entry = cached.get(directory)
+            try:
+                unchanged = entry is not None and len(entry) == 3 and os.stat(directory).st_mtime == entry[0]
+            except OSError:
+                continue
+            listing = entry if unchanged else self._list_directory(directory)
+            if listing is None:
+                continue
+            directories[directory] = listing
+            for name in listing[1]:
+                executables.add(normalize_path(os.path.join(directory, name)))
+            pending.extend(os.path.join(directory, name) for name in listing[2])
+        return directories, executables
+
+    def save(self):
+        with self.lock:
+            data = {'directories': dict(self._directories)}
+        save_json(self.cache_path, data)
+
+    # --- Watchdog ---
+
+    def _update_watches(self):
+        if self._observer is None:
+            return
+        with self.lock:
+            roots = dict(self._roots)
+        for key in list(self._watches):
+            if key not in roots:
+                self._observer.unschedule(self._watches.pop(key))
+        for key, root in roots.items():
+            if key not in self._watches and os.path.isdir(root):
+                try:
+                    self._watches[key] = self._observer.schedule(self._handler, path=root, recursive=True)
+                except OSError as e:
+                    print(f"[WARNING] Cannot watch '{root}' for new executables: {e}")
@@ -0,0 +1,218 @@
+import re
+import json
+import hashlib
+import fnmatch
+from collections import OrderedDict
+
+RULE_TYPES = ('path', 'basename', 'directory', 'glob', 'regex')
+_WILDCARDS = re.compile(r'[*?\[]')
+
+def normalize_path(path):
+    """Paths are compared case-insensitively with forward slashes, like Windows does."""
+    return path.replace('\\', '/').lower() if path else ''
+
+def basename_of(path):
+    return path.rsplit('/', 1)[-1]
+
+def config_version(programs):
+    """A stable hash of a program list, used to rebuild the matcher only when the config really changed."""
+    payload = json.dumps(programs, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()
+
+def directory_roots(programs):
+    """The directories of all enabled 'directory' rules."""
+    roots = []
+    for program in programs:
+        if program.get('is_enabled', True):
+            rule_type, pattern = rule_of(program)
+            if rule_type == 'directory':
+                roots.append(pattern)
+    return roots
+
+def rule_of(program):
+    """
+    Returns (type, pattern) for a program entry.
+    Entries without an explicit 'match' rule match their full 'path', falling back to the executable name.
+    """
+    match = program.get('match')
+    if match:
+        return match.get('type', 'path'), match.get('pattern', program.get('path', ''))
+    return 'path', program.get('path', '')
+
+class ExecutableMatcher:
+    """
+    Precompiled index that maps a process (name, path) to its monitored program.
+
+    Lookups are tried in order of specificity, and within a tier the first rule in
+    programs.json wins:
+      1. exact full path            - dict lookup
+      2. exact executable name      - dict lookup; a 'path' rule's executable name also
+                                      counts here when the process path is unknown
+      3. directory                  - the ExecutableIndex knows which root an executable
+                                      lives under; until its first scan finished, the
+                                      path's ancestors are looked up instead
+      4. glob                       - bucketed by the literal directory or name prefix
+                                      before the first wildcard, so only rules sharing
+                                      an anchor with the process are tested
+      5. 'path' rule by name        - a 'path' rule still matches its executable in
+                                      another folder, but only after the rules above
+      6. regex                      - searched in the raw path one by one, so this tier
+                                      costs one search per rule for every process that
+                                      no rule above matched; keep these few. One joined
+                                      alternation measured slower with the re module,
+                                      which only skips ahead on a lone rule's literals
+    Results are memoized per (name, path), since the same executables start over and over.
+    """
+    CACHE_SIZE = 4096
+
+    def __init__(self, programs, version=None, executable_index=None):
+        self.version = version if version is not None else config_version(programs)
+        self.programs = programs
+        self.executable_index = executable_index
+        self._index_generation = executable_index.generation if executable_index else 0
+        self._by_path = {}
+        self._by_name = {}
+        self._by_path_name = {}     # executable name of a 'path' rule -> program
+        self._by_directory = {}     # normalized directory -> program
+        self._globs_by_dir = {}     # literal directory prefix -> [(order, compiled, program)]
+        self._globs_by_prefix = {}  # literal name prefix -> [(order, compiled, program)]
+        self._prefix_lengths = set()
+        self._unanchored = []       # [(order, compiled, matches_full_path, program)]
+        self._regexes = []          # [(order, compiled, program)]
+        self._cache = OrderedDict()
+        self.rule_count = 0
+
+        for order, program in enumerate(programs):
+            if not program.get('is_enabled', True):
+                continue
+            rule_type, pattern = rule_of(program)
+            if rule_type == 'trigger':
+                # No process rule, the TriggerEngine activates these programs on its own
+                continue
+            self._add_rule(order, rule_type, pattern, program)
+            self.rule_count += 1
+
+    def __len__(self):
+        return len(self.programs)
+
+    def _add_rule(self, order, rule_type, pattern, program):
+        if rule_type == 'path':
+            normalized = normalize_path(pattern)
+            self._by_path.setdefault(normalized, program)
+            self._by_path_name.setdefault(basename_of(normalized), program)
+        elif rule_type == 'basename':
+            self._by_name.setdefault(pattern.lower(), program)
+        elif rule_type == 'directory':
+            self._by_directory.setdefault(normalize_path(pattern).rstrip('/') + '/', program)
+        elif rule_type == 'glob':
+            self._add_glob(order, normalize_path(pattern), program)
+        elif rule_type == 'regex':
+            try:
+                self._regexes.append((order, re.compile(pattern, re.IGNORECASE), program))
+            except re.error as e:
+                print(f"[WARNING] Ignoring invalid regex rule '{pattern}' for '{program.get('name')}': {e}")
+        else:
+            print(f"[WARNING] Ignoring unknown rule type '{rule_type}' for '{program.get('name')}'.")
+
+    def _add_glob(self, order, pattern, program):
+        compiled = re.compile(fnmatch.translate(pattern))
+        wildcard = _WILDCARDS.search(pattern)
+        literal = pattern[:wildcard.start()] if wildcard else pattern
+        if '/' in pattern:
+            # Anchor on the deepest literal directory before the first wildcard
+            anchor = literal[:literal.rfind('/') + 1]
+            if anchor:
+                self._globs_by_dir.setdefault(anchor, []).append((order, compiled, program))
+                return
+            self._unanchored.append((order, compiled, True, program))
+        elif literal:
+            self._globs_by_prefix.setdefault(literal, []).append((order, compiled, program))
+            self._prefix_lengths.add(len(literal))
+        else:
+            self._unanchored.append((order, compiled, False, program))
+
+    def match(self, name, path=None):
+        """Returns the program matching a process, or None."""
+        raw_path = path
+        name = (name or '').lower()
+        path = normalize_path(path)
+        cache_key = (name, path)
+        if self.executable_index is not None and self.executable_index.generation != self._index_generation:
+            # Executables appeared or disappeared below a directory rule
+            self._index_generation = self.executable_index.generation
+            self._cache.clear()
+        try:
+            program = self._cache[cache_key]
+            self._cache.move_to_end(cache_key)
+            return program
+        except KeyError:
+            pass
+
+        program = self._lookup(name or basename_of(path), path, raw_path)
+        self._cache[cache_key] = program
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return program
+
+    def _lookup(self, name, path, raw_path):
+        if path:
+            program = self._by_path.get(path)
+            if program is not None:
+                return program
+        program = self._by_name.get(name)
+        if program is None and not path:
+            # Without a path the executable name is all a 'path' rule can be matched by
+            program = self._by_path_name.get(name)
+        if program is not None:
+            return program
+        if path and self._by_directory:
+            program = self._match_directory(path, raw_path)
+            if program is not None:
+                return program
+        program = self._match_globs(name, path)
+        if program is not None:
+            return program
+        if path:
+            # The same executable installed elsewhere, unless a directory or glob rule claimed it
+            program = self._by_path_name.get(name)
+            if program is not None:
+                return program
+        # Regex rules see the path as the OS reported it, so they can be written with backslashes
+        target = raw_path or name
+        for _, compiled, program in self._regexes:
+            if compiled.search(target):
+                return program
+        return None
+
+    def _match_directory(self, path, raw_path):
+        index = self.executable_index
+        if index is not None and index.ready:
+            root = index.root_of(raw_path)
+            return self._by_directory.get(normalize_path(root).rstrip('/') + '/') if root else None
+        parent = path
+        while '/' in parent:
+            parent = parent.rsplit('/', 1)[0]
+            program = self._by_directory.get(parent + '/')
+            if program is not None:
+                return program
+        return None
+
+    def _match_globs(self, name, path):
+        best = None
+        if path and self._globs_by_dir:
+            end = path.find('/')
+            while end != -1:
+                for candidate in self._globs_by_dir.get(path[:end + 1], ()):
+                    if (best is None or candidate[0] < best[0]) and candidate[1].match(path):
+                        best = candidate
+                end = path.find('/', end + 1)
+        for length in self._prefix_lengths:
+            for candidate in self._globs_by_prefix.get(name[:length], ()):
+                if (best is None or candidate[0] < best[0]) and candidate[1].match(name):
+                    best = candidate
+        for order, compiled, full_path, program in self._unanchored:
+            if best is not None and order > best[0]:
+                break
+            if compiled.match(path if full_path else name):
+                return program
+        return best[-1] if best is not None else None
@@ -11,6 +11,9 @@ from floating_widget_default_item import default_settings_item
 from json_handler import load_preferences, save_preferences, load_programs, save_programs
 from settings_tile_functions import SettingsManager
 
+# Fields edited through the UI; anything else in programs.json is carried over untouched
+PROGRAM_FIELDS = ('name', 'path', 'settings', 'is_enabled')
+
 class FloatingWidgetMenuMain(StyledSplitter):
     def __init__(self, parent=None):
         super().__init__(parent, orientation=Qt.Orientation.Vertical)
@@ -92,7 +95,8 @@ class FloatingWidgetMenuMain(StyledSplitter):
                 self._add_program_from_path(exe_path)
 
     def _add_program_from_path(self, exe_path):
-        exe_name = os.path.splitext(os.path.basename(exe_path))[0]
+        is_directory = os.path.isdir(exe_path)
+        exe_name = os.path.basename(os.path.normpath(exe_path)) if is_directory else os.path.splitext(os.path.basename(exe_path))[0]
         lw = self.programs_area.list_widget
         # Check for duplicates
         for i in range(lw.count()):
@@ -104,7 +108,9 @@ class FloatingWidgetMenuMain(StyledSplitter):
         icon_provider = QFileIconProvider()
         icon = icon_provider.icon(QFileInfo(exe_path))
         default_settings = {k: {"tile_value": 0, "is_unchanged": True} for k in self.settings_tiles.keys()}
-        prog_item = ProgramItem(name=exe_name, path=exe_path, icon=icon, settings=default_settings, parent_list=lw)
+        # A dropped folder becomes a directory rule covering every executable below it
+        options = {"match": {"type": "directory", "pattern": exe_path}} if is_directory else None
+        prog_item = ProgramItem(name=exe_name, path=exe_path, icon=icon, settings=default_settings, parent_list=lw, options=options)
         
         # Insert before the add button and default item
         lw.insertItem(lw.count() - 2, prog_item) 
@@ -123,7 +129,8 @@ class FloatingWidgetMenuMain(StyledSplitter):
                 icon=icon, 
                 settings=entry.get('settings', {}), 
                 parent_list=self.programs_area.list_widget,
-                is_enabled=is_enabled
+                is_enabled=is_enabled,
+                options={k: v for k, v in entry.items() if k not in PROGRAM_FIELDS}
             )
             self.programs_area.add_item(prog_item)
 
@@ -133,12 +140,14 @@ class FloatingWidgetMenuMain(StyledSplitter):
         for i in range(lw.count()):
             item = lw.item(i)
             if isinstance(item, ProgramItem) and item.path != "internal::default":
-                programs.append({
+                program = {
                     'name': item.name, 
                     'path': item.path, 
                     'settings': getattr(item, 'settings', {}),
                     'is_enabled': getattr(item, 'is_enabled', True)
-                })
+                }
+                program.update(getattr(item, 'options', {}))
+                programs.append(program)
         save_programs(programs)
 
     def _load_default_settings(self):
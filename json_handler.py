@@ -1,6 +1,7 @@
 import os
 import json
 import sys
+import tempfile
 
 def get_asset_path():
     """
@@ -40,6 +41,15 @@ def get_preferences_path():
 def get_programs_path():
     return os.path.join(get_data_path(), 'programs.json')
 
+def get_executable_index_path():
+    return os.path.join(get_data_path(), 'executable_index.json')
+
+def get_service_snapshot_path():
+    return os.path.join(get_data_path(), 'service_snapshot.json')
+
+def get_launch_history_path():
+    return os.path.join(get_data_path(), 'launch_history.json')
+
 def load_json(path, default=None):
     if default is None:
         default = {}
@@ -50,11 +60,20 @@ def load_json(path, default=None):
         return default
 
 def save_json(path, data):
+    """
+    Writes to a temporary file next to `path` and swaps it in, so a save that is
+    interrupted (e.g. abandoned at shutdown) never leaves a truncated file behind.
+    """
+    temp_path = None
     try:
-        with open(path, 'w', encoding='utf-8') as f:
+        fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=os.path.dirname(path))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2)
+        os.replace(temp_path, path)
     except Exception as e:
         print(f"Error saving to {os.path.basename(path)}: {e}")
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
 
 def load_preferences():
     return load_json(get_preferences_path(), {})
@@ -0,0 +1,192 @@
+import copy
+import time
+import datetime
+
+from json_handler import load_json, save_json, get_launch_history_path
+
+class Prediction:
+    """A program expected to be launched before `expires_at`."""
+    __slots__ = ('key', 'name', 'probability', 'reason', 'expires_at')
+
+    def __init__(self, key, name, probability, reason, expires_at):
+        self.key = key
+        self.name = name
+        self.probability = probability
+        self.reason = reason
+        self.expires_at = expires_at
+
+class LaunchPredictor:
+    """
+    Learns which monitored program is likely to be launched next.
+
+      - sequences: how often program B was launched within `sequence_window` seconds
+        after program A (e.g. a launcher, then its game)
+      - time of day: on how many of the observed days a program was launched in a given hour
+
+    After a launch (or at the start of an hour) the most likely next program becomes
+    the pending prediction, if it was seen at least `min_observations` times and its
+    probability reaches `min_probability`. The prediction counts as a hit if that
+    program is launched within `window` seconds, otherwise as a miss.
+    The service saves the history `save_delay` seconds after a launch was learned.
+    """
+    HISTORY_DAYS = 28
+
+    def __init__(self, history_path=None, min_probability=0.6, min_observations=3, window=120.0, sequence_window=600.0, save_delay=60.0, clock=time.monotonic, now=datetime.datetime.now):
+        self.history_path = history_path or get_launch_history_path()
+        self.clock = clock
+        self.now = now
+        self.configure(min_probability, min_observations, window, sequence_window, save_delay)
+        self.names = {}        # program key -> name, for logs and predictions
+        self.launches = {}     # program key -> launches observed as a predecessor
+        self.sequences = {}    # program key -> {next program key: count}
+        self.hours = {}        # program key -> {hour: [day ordinals]}
+        self.days = []         # day ordinals with at least one launch
+        self.pending = None
+        self._last_launch = None  # (program key, monotonic time)
+        self._dirty = False
+
+        # --- Counters ---
+        self.predictions = 0
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, min_probability=0.6, min_observations=3, window=120.0, sequence_window=600.0, save_delay=60.0):
+        self.min_probability = min_probability
+        self.min_observations = min_observations
+        self.window = window
+        self.sequence_window = sequence_window
+        self.save_delay = save_delay
+
+    def configure_from_preferences(self, prefs):
+        options = prefs.get('launch_prediction', {})
+        self.configure(
+            min_probability=options.get('min_probability', 0.6),
+            min_observations=options.get('min_observations', 3),
+            window=options.get('window_ms', 120000) / 1000.0,
+            sequence_window=options.get('sequence_window_ms', 600000) / 1000.0,
+            save_delay=options.get('save_delay_ms', 60000) / 1000.0,
+        )
+
+    def load(self):
+        data = load_json(self.history_path, {})
+        self.names = data.get('names', {})
+        self.launches = data.get('launches', {})
+        self.sequences = data.get('sequences', {})
+        self.hours = {key: {int(hour): days for hour, days in hours.items()} for key, hours in data.get('hours', {}).items()}
+        self.days = data.get('days', [])
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    def take_history(self):
+        """A copy of the history to save, or None if it did not change since it was last taken."""
+        if not self._dirty:
+            return None
+        self._dirty = False
+        return copy.deepcopy({
+            'names': self.names,
+            'launches': self.launches,
+            'sequences': self.sequences,
+            'hours': self.hours,
+            'days': self.days,
+        })
+
+    def save(self):
+        history = self.take_history()
+        if history is not None:
+            save_json(self.history_path, history)
+
+    def record_launch(self, key, name):
+        """
+        Learns from a program launch and settles the pending prediction.
+        Returns the new prediction, or None.
+        """
+        now = self.clock()
+        if self.pending is not None and self.pending.key == key:
+            self._settle(hit=True)
+
+        self.names[key] = name
+        if self._last_launch is not None and self._last_launch[0] != key and now - self._last_launch[1] <= self.sequence_window:
+            previous = self._last_launch[0]
+            following = self.sequences.setdefault(previous, {})
+            following[key] = following.get(key, 0) + 1
+        self.launches[key] = self.launches.get(key, 0) + 1
+        self._last_launch = (key, now)
+
+        today = self.now()
+        day = today.toordinal()
+        if not self.days or self.days[-1] != day:
+            self.days = [d for d in self.days if d > day - self.HISTORY_DAYS] + [day]
+        days = self.hours.setdefault(key, {}).setdefault(today.hour, [])
+        if day not in days:
+            days.append(day)
+            del days[:-self.HISTORY_DAYS]
+        self._dirty = True
+
+        following = self.sequences.get(key, {})
+        if following:
+            total = self.launches[key]
+            best = max(following, key=following.get)
+            if following[best] >= self.min_observations:
+                return self._predict(best, following[best] / total, f"often launched after '{name}'")
+        return None
+
+    def predict_for_hour(self):
+        """Predicts the program most often launched in the current hour. Called at the start of an hour."""
+        today = self.now()
+        recent_days = [d for d in self.days if d > today.toordinal() - self.HISTORY_DAYS]
+        if len(recent_days) < self.min_observations:
+            return None
+        best, best_count = None, 0
+        for key, hours in self.hours.items():
+            count = sum(1 for d in hours.get(today.hour, []) if d > today.toordinal() - self.HISTORY_DAYS)
+            if count > best_count:
+                best, best_count = key, count
+        if best is None or best_count < self.min_observations:
+            return None
+        return self._predict(best, best_count / len(recent_days), f"usually launched around {today.hour}:00")
+
+    def expire(self):
+        """Counts the pending prediction as a miss once its window is over. Returns it, or None."""
+        if self.pending is not None and self.clock() >= self.pending.expires_at:
+            expired = self.pending
+            self._settle(hit=False)
+            return expired
+        return None
+
+    def time_until_expiry(self):
+        if self.pending is None:
+            return None
+        return max(0.0, self.pending.expires_at - self.clock())
+
+    def _predict(self, key, probability, reason):
+        if probability < self.min_probability:
+            return None
+        if self.pending is not None:
+            if self.pending.key == key:
+                return None
+            self._settle(hit=False)
+        self.pending = Prediction(key, self.names.get(key, key), probability, reason, self.clock() + self.window)
+        self.predictions += 1
+        return self.pending
+
+    def _settle(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.pending = None
+
+    def hit_rate(self):
+        settled = self.hits + self.misses
+        return self.hits / settled if settled else None
+
+    def stats(self):
+        hit_rate = self.hit_rate()
+        return {
+            'predictions': self.predictions,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': None if hit_rate is None else round(hit_rate, 2),
+        }
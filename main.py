@@ -1,5 +1,6 @@
 from PyQt6.QtWidgets import QApplication
 import sys
+import time
 import multiprocessing
 import atexit
 from floating_widget import FloatingWidget
@@ -23,14 +24,15 @@ def run_background_service():
 def cleanup_background_process():
     if background_process and background_process.is_alive():
         print("Requesting background service to stop...")
+        stop_started = time.perf_counter()
         stop_queue.put('stop')
-        background_process.join(timeout=10) # Wait for clean exit
+        background_process.join(timeout=2) # The service abandons blocked work after 100 ms
         if background_process.is_alive():
             print("Background service did not stop gracefully, terminating.")
             background_process.terminate()
             background_process.join()
         else:
-            print("Background service stopped gracefully.")
+            print(f"Background service stopped gracefully in {(time.perf_counter() - stop_started) * 1000:.0f} ms.")
 
 if __name__ == "__main__":
     multiprocessing.freeze_support()  # For PyInstaller
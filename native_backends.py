@@ -0,0 +1,243 @@
+import sys
+import uuid
+
+# Profile tile values of the two-state settings: 0 is "on", 1 is "off"
+ON, OFF = 0, 1
+
+PERFORMANCE_SCHEMES = {
+    "8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c": 0,
+    "381b4222-f694-41f0-9685-ff5bb260df2e": 1,
+    "a1841308-3541-4fab-bc81-f71556f20b4a": 2,
+}
+PERSONALIZE_KEY = r"Software\Microsoft\Windows\CurrentVersion\Themes\Personalize"
+NIGHT_LIGHT_STATE_KEY = (
+    r"Software\Microsoft\Windows\CurrentVersion\CloudStore\Store\DefaultAccount\Current"
+    r"\default$windows.data.bluelightreduction.bluelightreductionstate"
+    r"\windows.data.bluelightreduction.bluelightreductionstate"
+)
+NIGHT_LIGHT_SETTINGS_KEY = (
+    r"Software\Microsoft\Windows\CurrentVersion\CloudStore\Store\DefaultAccount\Current"
+    r"\default$windows.data.bluelightreduction.settings"
+    r"\windows.data.bluelightreduction.settings"
+)
+
+# --- System backends ---
+
+class RegistryBackend:
+    """Values under HKEY_CURRENT_USER. `read` returns None for a missing key or value."""
+    def key_exists(self, path):
+        raise NotImplementedError
+
+    def read(self, path, name):
+        raise NotImplementedError
+
+    def write(self, path, name, value):
+        """Writes an int as REG_DWORD and bytes as REG_BINARY."""
+        raise NotImplementedError
+
+class WinregRegistry(RegistryBackend):
+    def key_exists(self, path):
+        import winreg
+        try:
+            winreg.CloseKey(winreg.OpenKey(winreg.HKEY_CURRENT_USER, path))
+            return True
+        except OSError:
+            return False
+
+    def read(self, path, name):
+        import winreg
+        try:
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, path) as key:
+                return winreg.QueryValueEx(key, name)[0]
+        except OSError:
+            return None
+
+    def write(self, path, name, value):
+        import winreg
+        kind = winreg.REG_BINARY if isinstance(value, (bytes, bytearray)) else winreg.REG_DWORD
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, path, 0, winreg.KEY_SET_VALUE) as key:
+            winreg.SetValueEx(key, name, 0, kind, bytes(value) if kind == winreg.REG_BINARY else value)
+
+class MemoryRegistry(RegistryBackend):
+    """An in-memory registry, for running the registry-based setters without Windows."""
+    def __init__(self, keys=None):
+        self.keys = {path.lower(): dict(values) for path, values in (keys or {}).items()}
+        self.writes = 0
+
+    def key_exists(self, path):
+        return path.lower() in self.keys
+
+    def read(self, path, name):
+        return self.keys.get(path.lower(), {}).get(name)
+
+    def write(self, path, name, value):
+        if path.lower() not in self.keys:
+            raise OSError(f"registry key not found: {path}")
+        self.keys[path.lower()][name] = bytes(value) if isinstance(value, (bytes, bytearray)) else value
+        self.writes += 1
+
+class PowerBackend:
+    """The active power scheme, as a lower case GUID string."""
+    def active_scheme(self):
+        raise NotImplementedError
+
+    def set_active_scheme(self, guid):
+        raise NotImplementedError
+
+class PowrprofPower(PowerBackend):
+    """PowerGetActiveScheme / PowerSetActiveScheme from powrprof.dll, what powercfg /setactive calls."""
+    def active_scheme(self):
+        import ctypes
+        pointer = ctypes.c_void_p()
+        if ctypes.windll.powrprof.PowerGetActiveScheme(None, ctypes.byref(pointer)) != 0:
+            return None
+        try:
+            return str(uuid.UUID(bytes_le=ctypes.string_at(pointer, 16)))
+        finally:
+            ctypes.windll.kernel32.LocalFree(pointer)
+
+    def set_active_scheme(self, guid):
+        import ctypes
+        scheme = (ctypes.c_ubyte * 16).from_buffer_copy(uuid.UUID(guid).bytes_le)
+        error = ctypes.windll.powrprof.PowerSetActiveScheme(None, ctypes.byref(scheme))
+        if error != 0:
+            raise OSError(f"PowerSetActiveScheme failed with error {error}")
+
+class MemoryPower(PowerBackend):
+    """An in-memory power plan list, for running the performance setter without Windows."""
+    def __init__(self, active=None, schemes=tuple(PERFORMANCE_SCHEMES)):
+        self.schemes = set(schemes)
+        self.active = active
+        self.switches = 0
+
+    def active_scheme(self):
+        return self.active
+
+    def set_active_scheme(self, guid):
+        if guid not in self.schemes:
+            raise OSError(f"power scheme not found: {guid}")
+        self.active = guid
+        self.switches += 1
+
+# --- Setting backends ---
+
+class SettingBackend:
+    """
+    Reads and applies one setting in-process, as profile tile values.
+    `apply` returns False when it failed, like the other setters.
+    """
+    setting = None
+
+    def read(self):
+        """The current tile value, or None if unknown."""
+        raise NotImplementedError
+
+    def apply(self, tile_value):
+        try:
+            self._apply(tile_value)
+            return True
+        except Exception as e:
+            print(f"Error setting {self.setting}: {e}")
+            return False
+
+    def _apply(self, tile_value):
+        raise NotImplementedError
+
+class SystemColorSetting(SettingBackend):
+    """Dark (0) or light (1) mode for apps and the system alike."""
+    setting = 'systemcolor'
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def read(self):
+        apps_light = self.registry.read(PERSONALIZE_KEY, 'AppsUseLightTheme')
+        system_light = self.registry.read(PERSONALIZE_KEY, 'SystemUsesLightTheme')
+        if apps_light is None or apps_light != system_light:
+            return None
+        return 1 - apps_light
+
+    def _apply(self, tile_value):
+        light = 1 - tile_value
+        self.registry.write(PERSONALIZE_KEY, 'AppsUseLightTheme', light)
+        self.registry.write(PERSONALIZE_KEY, 'SystemUsesLightTheme', light)
+
+def night_light_enabled(data):
+    # Same test as Test-NightLightEnabled in Switch-NightLight.psm1
+    return len(data) > 18 and data[18] == 0x15
+
+def toggled_night_light_data(data):
+    """The night light state blob with the state flipped, as written by Switch-NightLight in Switch-NightLight.psm1."""
+    if night_light_enabled(data):
+        new_data = bytearray(41)
+        new_data[:min(22, len(data))] = data[:22]
+        if len(data) > 25:
+            length = min(len(data) - 25, 43 - 25)
+            new_data[23:23 + length] = data[25:25 + length]
+        new_data[18] = 0x13
+    else:
+        new_data = bytearray(43)
+        new_data[:min(22, len(data))] = data[:22]
+        if len(data) > 23:
+            length = min(len(data) - 23, 41 - 23)
+            new_data[25:25 + length] = data[23:23 + length]
+        new_data[18] = 0x15
+        new_data[23] = 0x10
+        new_data[24] = 0x00
+
+    # Increment the first byte in the range 10-14 that isn't 0xff
+    for i in range(10, 15):
+        if new_data[i] != 0xff:
+            new_data[i] += 1
+            break
+    return bytes(new_data)
+
+class NightLightSetting(SettingBackend):
+    setting = 'nightlight'
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def _state_data(self):
+        if not (self.registry.key_exists(NIGHT_LIGHT_STATE_KEY) and self.registry.key_exists(NIGHT_LIGHT_SETTINGS_KEY)):
+            raise OSError("Night Light feature is not supported on this system.")
+        data = self.registry.read(NIGHT_LIGHT_STATE_KEY, 'Data')
+        if data is None:
+            raise OSError("Could not retrieve Night Light data.")
+        return data
+
+    def read(self):
+        try:
+            return ON if night_light_enabled(self._state_data()) else OFF
+        except OSError:
+            return None
+
+    def _apply(self, tile_value):
+        data = self._state_data()
+        if night_light_enabled(data) != (tile_value == ON):
+            self.registry.write(NIGHT_LIGHT_STATE_KEY, 'Data', toggled_night_light_data(data))
+
+class PerformanceSetting(SettingBackend):
+    setting = 'performance'
+    SCHEME_BY_VALUE = {value: guid for guid, value in PERFORMANCE_SCHEMES.items()}
+
+    def __init__(self, power):
+        self.power = power
+
+    def read(self):
+        return PERFORMANCE_SCHEMES.get((self.power.active_scheme() or '').lower())
+
+    def _apply(self, tile_value):
+        guid = self.SCHEME_BY_VALUE.get(tile_value)
+        if guid is None:
+            raise ValueError(f"no power scheme for tile value {tile_value}")
+        self.power.set_active_scheme(guid)
+
+def native_setting_backends(registry=None, power=None):
+    """{setting: SettingBackend} of the settings applied in-process. Empty off Windows unless stand-ins are given."""
+    if registry is None and power is None and sys.platform != 'win32':
+        return {}
+    registry = registry if registry is not None else WinregRegistry()
+    power = power if power is not None else PowrprofPower()
+    backends = [SystemColorSetting(registry), NightLightSetting(registry), PerformanceSetting(power)]
+    return {backend.setting: backend for backend in backends}
@@ -0,0 +1,354 @@
+import os
+import sys
+import threading
+
+class ProcessSourceError(Exception):
+    """Raised by a process source when its backend connection is lost and must be re-opened."""
+
+class ProcessInfo:
+    """A single process as seen by a process source."""
+    __slots__ = ('pid', 'name', 'path', 'create_time', 'ppid')
+
+    def __init__(self, pid, name, path=None, create_time=None, ppid=None):
+        self.pid = pid
+        self.name = name or ''
+        self.path = path
+        self.create_time = create_time
+        self.ppid = ppid
+
+    @property
+    def key(self):
+        """PID + start time uniquely identifies a process, even when the PID gets reused."""
+        return (self.pid, self.create_time)
+
+    def __repr__(self):
+        return f"ProcessInfo(pid={self.pid}, name={self.name!r})"
+
+class ProcessDelta:
+    """The processes that were created and exited since the previous call to a source."""
+    __slots__ = ('created', 'exited')
+
+    def __init__(self, created=None, exited=None):
+        self.created = created or []
+        self.exited = exited or []
+
+    def __bool__(self):
+        return bool(self.created or self.exited)
+
+class ProcessSource:
+    """
+    Base class for process backends.
+    A source keeps a PID + start-time snapshot of the process table in `processes`
+    and only reports created/exited deltas, so the cost of an event is proportional
+    to the change instead of to the whole process table.
+    """
+    name = 'base'
+    # Sources whose calls block (or need a COM apartment) are driven from a dedicated thread.
+    # Only a source whose calls return right away, e.g. one reading a queue, may opt out.
+    needs_thread = True
+
+    def __init__(self):
+        self.processes = {}  # pid -> ProcessInfo
+
+    def open(self):
+        """Acquires backend resources. Called from the thread that will poll the source."""
+
+    def close(self):
+        """
+        Releases backend resources. Called from the same thread as `open`.
+        The snapshot is dropped too: nothing tells a closed source about exits, and `open`
+        is followed by a full `snapshot`. Subclasses must call this.
+        """
+        # Rebound rather than cleared, so a copy being taken on the loop stays intact
+        self.processes = {}
+
+    def set_interval(self, seconds):
+        """Hints how often the source is polled, for backends that poll on their own side."""
+
+    def interrupt(self):
+        """Wakes up a blocked `poll` early, where the backend allows it."""
+
+    def snapshot(self):
+        """Reads the full process table and returns the delta against the previous snapshot."""
+        raise NotImplementedError
+
+    def poll(self, timeout):
+        """Blocks for at most `timeout` seconds and returns a ProcessDelta (possibly empty)."""
+        raise NotImplementedError
+
+    def _apply(self, created, exited):
+        """Updates the snapshot with a delta and returns it. Processes already known are not created again."""
+        created = [info for info in created if self._is_new(info)]
+        for info in exited:
+            known = self.processes.get(info.pid)
+            if known is not None and known.create_time == info.create_time:
+                del self.processes[info.pid]
+        for info in created:
+            self.processes[info.pid] = info
+        return ProcessDelta(created, exited)
+
+    def _is_new(self, info):
+        known = self.processes.get(info.pid)
+        return known is None or known.create_time != info.create_time
+
+    def _diff_table(self, table):
+        """Diffs a full {pid: ProcessInfo} table against the snapshot, detecting PID reuse."""
+        created = []
+        exited = []
+        for pid, known in self.processes.items():
+            current = table.get(pid)
+            if current is None or current.create_time != known.create_time:
+                exited.append(known)
+        for pid, info in table.items():
+            known = self.processes.get(pid)
+            if known is None or known.create_time != info.create_time:
+                created.append(info)
+        return self._apply(created, exited)
+
+class PollingProcessSource(ProcessSource):
+    """
+    Base for sources without native process events.
+    Each poll only lists PIDs; details are read for new PIDs alone.
+    A PID that is reused between two polls is not noticed until the next full snapshot.
+    Listing the process table still takes milliseconds on a busy system, so these sources
+    are driven from the detection thread as well; `interrupt` ends their wait early.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._wake_event = threading.Event()
+
+    def _list_pids(self):
+        raise NotImplementedError
+
+    def _read_process(self, pid):
+        """Returns a ProcessInfo for `pid`, or None if it has already exited."""
+        raise NotImplementedError
+
+    def _read_table(self):
+        table = {}
+        for pid in self._list_pids():
+            info = self._read_process(pid)
+            if info is not None:
+                table[pid] = info
+        return table
+
+    def snapshot(self):
+        return self._diff_table(self._read_table())
+
+    def poll(self, timeout):
+        if self._wake_event.wait(timeout):
+            self._wake_event.clear()
+        pids = self._list_pids()
+        exited = [info for pid, info in self.processes.items() if pid not in pids]
+        created = []
+        for pid in pids:
+            if pid not in self.processes:
+                info = self._read_process(pid)
+                if info is not None:
+                    created.append(info)
+        return self._apply(created, exited)
+
+    def interrupt(self):
+        self._wake_event.set()
+
+class PsutilProcessSource(PollingProcessSource):
+    """Cross-platform polling source backed by psutil."""
+    name = 'psutil'
+
+    def __init__(self):
+        super().__init__()
+        import psutil
+        self._psutil = psutil
+
+    def _list_pids(self):
+        return set(self._psutil.pids())
+
+    def _read_process(self, pid):
+        psutil = self._psutil
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                name = proc.name()
+                create_time = proc.create_time()
+                ppid = proc.ppid()
+                try:
+                    path = proc.exe() or None
+                except (psutil.AccessDenied, psutil.ZombieProcess):
+                    path = None
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+        return ProcessInfo(pid, name, path, create_time, ppid)
+
+    def _read_table(self):
+        psutil = self._psutil
+        table = {}
+        for proc in psutil.process_iter(['name', 'exe', 'create_time', 'ppid']):
+            try:
+                info = proc.info
+                table[proc.pid] = ProcessInfo(proc.pid, info['name'], info['exe'] or None, info['create_time'], info['ppid'])
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+        return table
+
+class ProcfsProcessSource(PollingProcessSource):
+    """Linux polling source that reads /proc directly, without any third-party dependency."""
+    name = 'procfs'
+
+    def __init__(self, proc_root='/proc'):
+        super().__init__()
+        self.proc_root = proc_root
+
+    def _list_pids(self):
+        return {int(entry) for entry in os.listdir(self.proc_root) if entry.isdigit()}
+
+    def _read_process(self, pid):
+        base = os.path.join(self.proc_root, str(pid))
+        try:
+            with open(os.path.join(base, 'stat'), 'rb') as f:
+                stat = f.read().decode('utf-8', 'replace')
+        except OSError:
+            return None
+        # The command name is wrapped in parentheses and may itself contain spaces or ')'
+        name_start = stat.find('(')
+        name_end = stat.rfind(')')
+        name = stat[name_start + 1:name_end]
+        fields = stat[name_end + 2:].split()
+        try:
+            path = os.readlink(os.path.join(base, 'exe'))
+        except OSError:
+            path = None
+        if path:
+            # /proc/<pid>/comm is truncated to 15 characters, the executable name is not
+            name = os.path.basename(path)
+        # fields[0] is the state (field 3 in proc(5)), so ppid is fields[1] and starttime fields[19]
+        return ProcessInfo(pid, name, path, int(fields[19]), int(fields[1]))
+
+class WmiProcessSource(ProcessSource):
+    """
+    Windows source using WMI instance creation/deletion events.
+    Each event carries the affected process, so no query is needed after the initial snapshot.
+    MUST be opened, polled and closed from the same thread (COM apartment).
+
+    WMI itself checks the process table every WITHIN seconds, so the subscription
+    follows the detection cadence. Replacing it drops the events still queued on the
+    old one, so the next `poll` diffs a full snapshot instead of waiting for an event.
+    """
+    name = 'wmi'
+    WQL_EVENTS = (
+        "SELECT * FROM __InstanceOperationEvent WITHIN {within} "
+        "WHERE (__CLASS = '__InstanceCreationEvent' OR __CLASS = '__InstanceDeletionEvent') "
+        "AND TargetInstance ISA 'Win32_Process'"
+    )
+    WQL_SNAPSHOT = "SELECT ProcessId, Name, ExecutablePath, CreationDate, ParentProcessId FROM Win32_Process"
+
+    def __init__(self, within=2):
+        super().__init__()
+        import wmi
+        import pythoncom
+        self._wmi = wmi
+        self._pythoncom = pythoncom
+        self.within = within
+        self._connection = None
+        self._watcher = None
+        self._com_initialized = False
+        self._resync = False  # the subscription was replaced, events may have been dropped
+
+    def open(self):
+        if not self._com_initialized:
+            self._pythoncom.CoInitialize()
+            self._com_initialized = True
+        try:
+            self._connection = self._wmi.WMI()
+        except (self._wmi.x_wmi, self._pythoncom.com_error) as e:
+            raise ProcessSourceError(e) from e
+        self._subscribe()
+
+    def _subscribe(self):
+        try:
+            self._watcher = self._connection.watch_for(raw_wql=self.WQL_EVENTS.format(within=self.within))
+        except (self._wmi.x_wmi, self._pythoncom.com_error) as e:
+            raise ProcessSourceError(e) from e
+
+    def set_interval(self, seconds):
+        within = max(0.5, round(seconds, 1))
+        if within == self.within:
+            return
+        self.within = within
+        if self._connection is not None:
+            self._subscribe()
+            self._resync = True
+
+    def close(self):
+        super().close()
+        self._watcher = None
+        self._connection = None
+        self._resync = False
+        if self._com_initialized:
+            self._pythoncom.CoUninitialize()
+            self._com_initialized = False
+
+    def _to_info(self, process):
+        return ProcessInfo(process.ProcessId, process.Name, process.ExecutablePath, process.CreationDate, process.ParentProcessId)
+
+    def snapshot(self):
+        try:
+            table = {}
+            for process in self._connection.query(self.WQL_SNAPSHOT):
+                try:
+                    info = self._to_info(process)
+                except Exception:
+                    continue
+                table[info.pid] = info
+        except (self._wmi.x_wmi, self._pythoncom.com_error) as e:
+            raise ProcessSourceError(e) from e
+        return self._diff_table(table)
+
+    def poll(self, timeout):
+        if self._resync:
+            self._resync = False
+            return self.snapshot()
+        try:
+            event = self._watcher(timeout_ms=int(timeout * 1000))
+        except self._wmi.x_wmi_timed_out:
+            return ProcessDelta()
+        except (self._wmi.x_wmi, self._pythoncom.com_error) as e:
+            raise ProcessSourceError(e) from e
+        if not event:
+            return ProcessDelta()
+
+        info = self._to_info(event)
+        event_type = getattr(event, 'event_type', None)
+        if event_type == 'creation':
+            return self._apply([info], [])
+        if event_type == 'deletion':
+            return self._apply([], [self.processes.get(info.pid, info)])
+        return ProcessDelta()
+
+PROCESS_SOURCES = {
+    'wmi': WmiProcessSource,
+    'psutil': PsutilProcessSource,
+    'procfs': ProcfsProcessSource,
+}
+
+def create_process_source(name='auto'):
+    """
+    Creates a process source by name.
+    'auto' prefers WMI events on Windows, then psutil, then /proc. An unknown name, or
+    a source whose module is missing, falls back to 'auto'.
+    """
+    if name and name != 'auto':
+        try:
+            return PROCESS_SOURCES[name]()
+        except KeyError:
+            print(f"[WARNING] Unknown process source '{name}', choosing one automatically.")
+        except ImportError as e:
+            print(f"[WARNING] Process source '{name}' is not available ({e}), choosing one automatically.")
+
+    candidates = ['wmi', 'psutil'] if sys.platform == 'win32' else ['psutil', 'procfs']
+    for candidate in candidates:
+        try:
+            return PROCESS_SOURCES[candidate]()
+        except ImportError:
+            continue
+    return ProcfsProcessSource()
@@ -0,0 +1,71 @@
+from app_stack import program_key
+
+def inherits_to_descendants(program):
+    """Programs with 'include_descendants' stay active while any process they started is running."""
+    return bool(program and program.get('include_descendants', False))
+
+class ProcessTree:
+    """
+    Parent-PID index maintained from process deltas.
+
+    Besides the lineage of every known process, the tree remembers which program each
+    process counts for when that program was inherited from an ancestor. A new process
+    only looks at its direct parent, so inheritance costs O(1) per event and the tree is
+    never walked. Processes MUST be added parents first (i.e. in start-time order).
+    """
+    def __init__(self):
+        self.parents = {}  # pid -> ProcessInfo of the parent, while it is known
+        self.owners = {}   # pid -> program whose descendants inherit it
+
+    def __len__(self):
+        return len(self.parents)
+
+    def clear(self):
+        self.parents.clear()
+        self.owners.clear()
+
+    def add(self, info, program, processes):
+        """
+        Registers a started process and returns the program it counts for:
+        its own match, otherwise the program inherited from its parent (or None).
+        `processes` is the process source's pid -> ProcessInfo snapshot.
+        """
+        parent = processes.get(info.ppid) if info.ppid else None
+        if parent is not None and parent.pid != info.pid and self._started_before(parent, info):
+            self.parents[info.pid] = parent
+        else:
+            parent = None
+
+        if program is None and parent is not None:
+            program = self.owners.get(parent.pid)
+            if program is not None:
+                self.owners[info.pid] = program
+                return program
+        if inherits_to_descendants(program):
+            self.owners[info.pid] = program
+        return program
+
+    def remove(self, info):
+        """Forgets an exited process. Its running descendants keep their inherited program."""
+        self.parents.pop(info.pid, None)
+        self.owners.pop(info.pid, None)
+
+    def forget_program(self, key):
+        """Stops descendants from inheriting a program that was removed from the config."""
+        for pid in [pid for pid, program in self.owners.items() if program_key(program) == key]:
+            del self.owners[pid]
+
+    def parent_of(self, pid):
+        parent = self.parents.get(pid)
+        return parent.pid if parent is not None else None
+
+    @staticmethod
+    def _started_before(parent, child):
+        # A PID can be reused by a newer process, which then cannot be the child's parent
+        if parent.create_time is None or child.create_time is None:
+            return True
+        return parent.create_time <= child.create_time
+
+def start_order(infos):
+    """Sorts processes by start time, so parents come before their children."""
+    return sorted(infos, key=lambda info: (info.create_time is not None, info.create_time))
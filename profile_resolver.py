@@ -0,0 +1,70 @@
+class ProfileResolver:
+    """
+    Merges the profiles of all running programs into one effective profile.
+
+    Every setting is taken from the highest-priority running program that changes it,
+    so a setting the top program leaves unchanged still follows the programs below it.
+    The merged settings are cached; when a program starts or exits, only the settings
+    that program changes are looked at again.
+    """
+    # Per-program fields that are not system settings
+    IGNORED_KEYS = ('priority', 'startup')
+
+    def __init__(self):
+        self.settings = {}      # setting -> state; replaced on change, never mutated
+        self._candidates = {}   # setting -> {program key: stack entry changing it}
+        self._winners = {}      # setting -> program key whose state is in effect
+        self.recomputed_settings = 0
+
+    def _changed_settings(self, entry):
+        for name, state in entry['settings'].items():
+            if name not in self.IGNORED_KEYS and isinstance(state, dict) and not state.get('is_unchanged', True):
+                yield name
+
+    def add(self, entry):
+        """Accounts for a program entering the stack. Returns True if the effective settings changed."""
+        changed = []
+        for name in self._changed_settings(entry):
+            candidates = self._candidates.setdefault(name, {})
+            candidates[entry['key']] = entry
+            winner = self._winners.get(name)
+            if winner is None or entry['sort_key'] < candidates[winner]['sort_key']:
+                self._winners[name] = entry['key']
+                changed.append(name)
+        return self._publish(changed)
+
+    def remove(self, entry):
+        """Accounts for a program leaving the stack. Returns True if the effective settings changed."""
+        changed = []
+        for name in self._changed_settings(entry):
+            candidates = self._candidates.get(name)
+            if not candidates or candidates.pop(entry['key'], None) is None:
+                continue
+            if self._winners.get(name) != entry['key']:
+                continue
+            if candidates:
+                self._winners[name] = min(candidates.values(), key=lambda candidate: candidate['sort_key'])['key']
+            else:
+                del self._candidates[name]
+                del self._winners[name]
+            changed.append(name)
+        return self._publish(changed)
+
+    def clear(self):
+        self.settings = {}
+        self._candidates.clear()
+        self._winners.clear()
+
+    def _publish(self, changed):
+        if not changed:
+            return False
+        self.recomputed_settings += len(changed)
+        settings = dict(self.settings)
+        for name in changed:
+            winner = self._winners.get(name)
+            if winner is None:
+                settings.pop(name, None)
+            else:
+                settings[name] = self._candidates[name][winner]['settings'][name]
+        self.settings = settings
+        return True
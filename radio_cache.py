@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+async def enumerate_radios():
+    from winsdk.windows.devices.radios import Radio
+    return list(await Radio.get_radios_async())
+
+def watch_radio_devices(callback):
+    """Calls `callback()` when a radio device is added or removed. Returns the watcher, which must be kept alive."""
+    from winsdk.windows.devices.enumeration import DeviceInformation
+    from winsdk.windows.devices.radios import Radio
+
+    watcher = DeviceInformation.create_watcher(Radio.get_device_selector())
+    enumerated = threading.Event()
+    # The watcher first reports every existing radio as added; only later changes matter
+    watcher.add_enumeration_completed(lambda sender, args: enumerated.set())
+    watcher.add_added(lambda sender, info: callback() if enumerated.is_set() else None)
+    watcher.add_removed(lambda sender, update: callback())
+    watcher.start()
+    return watcher
+
+class RadioCache:
+    """
+    The radios of the system, enumerated once and shared by all setters and probes.
+
+    Used from coroutines on the service loop. Concurrent callers share one enumeration.
+    The radios are enumerated again after the set of radio devices changed, and after
+    `invalidate`, which setters call when a cached radio failed.
+    """
+    def __init__(self, enumerator=enumerate_radios, watch=watch_radio_devices):
+        self.enumerator = enumerator
+        self.watch = watch
+        self._lock = threading.Lock()
+        self._radios = None
+        self._generation = 0
+        self._pending = None  # asyncio.Task of the running enumeration
+        self._watcher = None
+        self._watching = False
+
+        # --- Counters ---
+        self.enumerations = 0
+        self.hits = 0
+        self.invalidations = 0
+
+    async def get(self):
+        """The list of radios."""
+        self._start_watching()
+        with self._lock:
+            radios = self._radios
+        if radios is not None:
+            self.hits += 1
+            return radios
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._enumerate())
+        # A caller giving up must not cancel the enumeration the others wait for
+        return await asyncio.shield(self._pending)
+
+    def invalidate(self):
+        """Forgets the radios, so the next caller enumerates them again. Safe to call from any thread."""
+        with self._lock:
+            self._radios = None
+            self._generation += 1
+            self.invalidations += 1
+
+    async def _enumerate(self):
+        try:
+            with self._lock:
+                generation = self._generation
+            radios = list(await self.enumerator())
+            self.enumerations += 1
+            with self._lock:
+                if generation == self._generation:
+                    self._radios = radios
+            return radios
+        finally:
+            self._pending = None
+
+    def _start_watching(self):
+        if self._watching or self.watch is None:
+            return
+        self._watching = True
+        try:
+            self._watcher = self.watch(self.invalidate)
+        except Exception as e:
+            print(f"[WARNING] Radio device changes cannot be watched ({e}), radios are only enumerated again after errors.")
+
+    def stats(self):
+        return {'enumerations': self.enumerations, 'hits': self.hits, 'invalidations': self.invalidations}
@@ -0,0 +1,64 @@
+import os
+import time
+import threading
+
+from json_handler import load_json, save_json, get_service_snapshot_path
+
+class ServiceSnapshot:
+    """
+    The last profile the service applied, persisted across restarts.
+
+    The snapshot is written at every confirmed switch and on shutdown, and dropped
+    when a profile failed to apply. It is only
+    trusted on the next start if its format and the hash of the config it was made
+    from still match, so a config edited while the service was down is re-applied.
+    """
+    FORMAT_VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path or get_service_snapshot_path()
+        self.profile_name = None
+        self.settings = None
+        self.config_hash = None
+        self.lock = threading.Lock()
+
+    def record(self, profile_name, settings, config_hash):
+        with self.lock:
+            self.profile_name = profile_name
+            self.settings = settings
+            self.config_hash = config_hash
+
+    def forget(self):
+        """Drops the snapshot, so the next start applies its profile in full."""
+        with self.lock:
+            self.profile_name = None
+            self.settings = None
+            self.config_hash = None
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error removing {os.path.basename(self.path)}: {e}")
+
+    def load(self, config_hash):
+        """Reads the snapshot. Returns True if it is valid for the given config hash."""
+        data = load_json(self.path, {})
+        if data.get('version') != self.FORMAT_VERSION or data.get('config_hash') != config_hash:
+            return False
+        if not isinstance(data.get('profile_name'), str):
+            return False
+        self.record(data['profile_name'], data.get('settings'), config_hash)
+        return True
+
+    def save(self):
+        with self.lock:
+            if self.profile_name is None:
+                return
+            save_json(self.path, {
+                'version': self.FORMAT_VERSION,
+                'profile_name': self.profile_name,
+                'settings': self.settings,
+                'config_hash': self.config_hash,
+                'saved_at': time.time(),
+            })
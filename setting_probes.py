@@ -0,0 +1,164 @@
+import time
+import threading
+
+from native_backends import ON, OFF
+
+class SettingProbe:
+    """
+    Reads the current value of one or more settings from the system, as profile tile values.
+    A probe covering several settings reads them together in one call.
+    """
+    settings = ()
+
+    def read(self):
+        """Returns {setting: tile value}; settings that cannot be read are left out."""
+        raise NotImplementedError
+
+class BrightnessProbe(SettingProbe):
+    settings = ('brightness',)
+
+    def read(self):
+        import screen_brightness_control as sbc
+        return {'brightness': sbc.get_brightness()[0]}
+
+class AudioEndpointProbe(SettingProbe):
+    """Speaker volume and microphone mute, read through the cached endpoint handles."""
+    settings = ('volume', 'microphone')
+
+    def __init__(self, audio):
+        self.audio = audio
+
+    def read(self):
+        from audio_endpoints import SPEAKERS, MICROPHONE
+        return {
+            'volume': self.audio.call(SPEAKERS, lambda speakers: speakers.volume()),
+            'microphone': 1 if self.audio.call(MICROPHONE, lambda mic: mic.muted()) else 0,
+        }
+
+class NativeProbe(SettingProbe):
+    """Performance plan, app theme and night light, read through their in-process setting backends."""
+    def __init__(self, backends):
+        self.backends = dict(backends)
+        self.settings = tuple(self.backends)
+
+    def read(self):
+        values = {}
+        for setting, backend in self.backends.items():
+            value = backend.read()
+            if value is not None:
+                values[setting] = value
+        return values
+
+class RadioProbe(SettingProbe):
+    """Wi-Fi, Bluetooth and hotspot from a single radio enumeration."""
+    settings = ('wifi', 'bt', 'hotspot')
+    TIMEOUT = 5.0
+
+    def __init__(self, async_runner, radios):
+        self.async_runner = async_runner
+        self.radios = radios
+
+    async def _read_async(self):
+        from winsdk.windows.devices.radios import RadioKind, RadioState
+        from winsdk.windows.networking.connectivity import NetworkInformation
+        from winsdk.windows.networking.networkoperators import NetworkOperatorTetheringManager, TetheringOperationalState
+
+        values = {}
+        for radio in await self.radios.get():
+            setting = {RadioKind.WI_FI: 'wifi', RadioKind.BLUETOOTH: 'bt'}.get(radio.kind)
+            if setting is not None and setting not in values:
+                values[setting] = ON if radio.state == RadioState.ON else OFF
+        profile = NetworkInformation.get_internet_connection_profile()
+        if profile is not None:
+            manager = NetworkOperatorTetheringManager.create_from_connection_profile(profile)
+            values['hotspot'] = ON if manager.tethering_operational_state == TetheringOperationalState.ON else OFF
+        return values
+
+    def read(self):
+        return self.async_runner.run(self._read_async(), "read radios", self.TIMEOUT)
+
+class FakeProbe(SettingProbe):
+    """Returns fixed values and counts its reads, for running the apply logic without Windows."""
+    def __init__(self, values):
+        self.values = dict(values)
+        self.settings = tuple(values)
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        return dict(self.values)
+
+def default_probes(async_runner, backends, audio, radios):
+    # Airplane mode is only reachable through an undocumented COM interface, so it has no probe
+    return [BrightnessProbe(), AudioEndpointProbe(audio), NativeProbe(backends), RadioProbe(async_runner, radios)]
+
+class ProbeCache:
+    """
+    Current setting values, read through probes and cached for `ttl` seconds.
+
+    `prefetch` reads every probe needed for a set of settings once, so related
+    settings share one system call. A probe that fails counts as "unknown" for all
+    of its settings, which never lets a setter be skipped.
+    """
+    def __init__(self, probes, ttl=2.0, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._probes = {}  # setting -> probe
+        for probe in probes:
+            for setting in probe.settings:
+                self._probes.setdefault(setting, probe)
+        self._values = {}  # setting -> (value or None, monotonic time read)
+
+        # --- Counters ---
+        self.probe_reads = 0
+        self.hits = 0
+
+    def prefetch(self, settings):
+        """Reads the probes of all given settings that are not cached, each probe once."""
+        now = self.clock()
+        with self.lock:
+            probes = []
+            for setting in settings:
+                probe = self._probes.get(setting)
+                cached = self._values.get(setting)
+                if probe is not None and (cached is None or now - cached[1] >= self.ttl) and probe not in probes:
+                    probes.append(probe)
+        for probe in probes:
+            self._read(probe)
+
+    def get_current(self, setting):
+        """The current tile value of a setting, or None if unknown."""
+        with self.lock:
+            cached = self._values.get(setting)
+            if cached is not None and self.clock() - cached[1] < self.ttl:
+                self.hits += 1
+                return cached[0]
+            probe = self._probes.get(setting)
+        if probe is None:
+            return None
+        return self._read(probe).get(setting)
+
+    def invalidate(self, settings=None):
+        with self.lock:
+            if settings is None:
+                self._values.clear()
+            else:
+                for setting in settings:
+                    self._values.pop(setting, None)
+
+    def _read(self, probe):
+        try:
+            values = probe.read()
+        except Exception as e:
+            print(f"[WARNING] Reading {', '.join(probe.settings)} failed: {e}")
+            values = {}
+        now = self.clock()
+        with self.lock:
+            self.probe_reads += 1
+            for setting in probe.settings:
+                self._values[setting] = (values.get(setting), now)
+        return values
+
+    def stats(self):
+        return {'probe_reads': self.probe_reads, 'hits': self.hits}
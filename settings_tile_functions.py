@@ -1,22 +1,176 @@
 import os
+import time
+import functools
+import threading
 import subprocess
-import winreg
 import ctypes
 import sys
 import screen_brightness_control as sbc
-from ctypes import cast, POINTER
-from comtypes import CoInitialize, CoUninitialize, CLSCTX_ALL
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-from winsdk.windows.devices.radios import Radio, RadioKind, RadioState
+from comtypes import CoInitialize, CoUninitialize
+from winsdk.windows.devices.radios import RadioKind, RadioState
 from winsdk.windows.networking.networkoperators import NetworkOperatorTetheringManager
 from winsdk.windows.networking.connectivity import NetworkInformation
 import win32com.client
+from setting_probes import ProbeCache, default_probes
+from native_backends import native_setting_backends
+from audio_endpoints import AudioEndpointCache, PycawProvider, SPEAKERS, MICROPHONE
+from radio_cache import RadioCache
+from transition_plans import TransitionPlanner, PlanStep
+from shell_host import ShellHost, ShellResult, ShellTimeout, powershell_host_command, powershell_batch, parse_batch_results
+
+# COM signatures of the radio manager used for airplane mode; defined once per PowerShell session
+AIRPLANE_TYPES = """
+        Add-Type -TypeDefinition @'
+        using System;
+        using System.Runtime.InteropServices;
+
+        public static class NativeMethods {
+            [DllImport("ole32.dll")]
+            public static extern int CoInitialize(IntPtr pv);
+            [DllImport("ole32.dll")]
+            public static extern void CoUninitialize();
+            [DllImport("ole32.dll")]
+            public static extern uint CoCreateInstance(Guid clsid, IntPtr pv, uint ctx, Guid iid, out IntPtr ppv);
+        }
+
+        [UnmanagedFunctionPointer(CallingConvention.StdCall)]
+        public delegate int GetSystemRadioStateDelegate(IntPtr cg, out int ie, out int se, out int p3);
+
+        [UnmanagedFunctionPointer(CallingConvention.StdCall)]
+        public delegate int SetSystemRadioStateDelegate(IntPtr ptr, int state);
+
+        [UnmanagedFunctionPointer(CallingConvention.StdCall)]
+        public delegate int ReleaseDelegate(IntPtr ptr);
+'@
+"""
 
 class SettingsManager:
-    def __init__(self, async_runner):
+    """
+    Applies profile settings to the system.
+
+    Setters return False when they failed. Every setting applied successfully is
+    written to a ledger, and planning a profile skips the settings whose desired value
+    is already in the ledger. Ledger entries expire after `ledger_max_age` seconds,
+    and `invalidate_ledger` drops them when something else may have changed the system.
+    Settings the ledger does not know are read back through the probes, and skipped
+    as well if the system already has the desired value.
+
+    Profiles are compiled into plans once and cached, see TransitionPlanner. After
+    `profile_applied`, the next profile is planned as a transition from that one.
+    Registry and power plan settings are applied in-process through `backends`. The
+    remaining PowerShell commands run on a pool of long-lived shells, see ShellHost,
+    where they run in parallel. Without the host, all PowerShell-backed steps of one
+    switch are sent as a single batch script, so they share one process start. With
+    the native backends on Windows only airplane mode is left on PowerShell, so in
+    practice the host and the backends took over what batching was meant to save.
+    """
+    # A hung PowerShell is killed after this long
+    POWERSHELL_TIMEOUT = 30
+    # Radio and hotspot operations are cancelled after this long
+    RADIO_TIMEOUT = 15
+    # Setting name of the step running all PowerShell-backed settings of a switch
+    SHELL_BATCH = 'shell'
+    NIGHT_LIGHT_MODULE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Switch-NightLight.psm1')
+    LEDGER_MAX_AGE = 1800
+    # Airplane mode switches these radios by itself
+    RADIO_SETTINGS = ('wifi', 'bt', 'hotspot')
+
+    def __init__(self, async_runner, probes=None, backends=None, audio_provider=None, radios=None):
         self.async_runner = async_runner
+        self.radios = radios or RadioCache()
+        # setting -> SettingBackend for the settings applied in-process instead of through PowerShell
+        self.backends = backends if backends is not None else native_setting_backends()
+        self.audio = AudioEndpointCache(audio_provider or PycawProvider())
+        self.probes = ProbeCache(probes if probes is not None else default_probes(async_runner, self.backends, self.audio, self.radios))
+        self.ledger = {}  # setting -> (tile_value, monotonic time it was applied)
+        self.ledger_lock = threading.Lock()
+        self.ledger_max_age = self.LEDGER_MAX_AGE
+        self.plans = TransitionPlanner(self._compile_profile)
+        self.applied_profile = None  # (settings, monotonic time) of the last profile applied in full
+        self.shell = ShellHost(
+            powershell_host_command(),
+            warmup=[AIRPLANE_TYPES] + ([] if 'nightlight' in self.backends else [f"Import-Module '{self.NIGHT_LIGHT_MODULE}'"]),
+            timeout=self.POWERSHELL_TIMEOUT,
+        )
+        self.shell_available = True
+
+    def is_applied(self, setting, state):
+        """True if the ledger says the setting already has the desired value."""
+        with self.ledger_lock:
+            entry = self.ledger.get(setting)
+        return entry is not None and entry[0] == state.get('tile_value') and time.monotonic() - entry[1] < self.ledger_max_age
+
+    def invalidate_ledger(self, settings=None):
+        """Forgets what was applied, for all or the given settings, so they are applied again."""
+        with self.ledger_lock:
+            if settings is None:
+                self.ledger.clear()
+            else:
+                for setting in settings:
+                    self.ledger.pop(setting, None)
+            self.applied_profile = None
+        self.probes.invalidate(settings)
+
+    def profile_applied(self, settings_profile):
+        """Notes that every step of a profile succeeded, so the next switch can start from it."""
+        with self.ledger_lock:
+            self.applied_profile = (settings_profile, time.monotonic())
+
+    def _applied_profile(self):
+        with self.ledger_lock:
+            if self.applied_profile is None or time.monotonic() - self.applied_profile[1] >= self.ledger_max_age:
+                return None
+            return self.applied_profile[0]
+
+    def _record_applied(self, setting, state):
+        with self.ledger_lock:
+            self.ledger[setting] = (state.get('tile_value'), time.monotonic())
+            if setting == 'airplane':
+                for radio in self.RADIO_SETTINGS:
+                    self.ledger.pop(radio, None)
+        self.probes.invalidate(self.RADIO_SETTINGS + (setting,) if setting == 'airplane' else (setting,))
+
+    def _tracked(self, setting, setter):
+        """Wraps a setter so a successful call is written to the ledger. The step returns whether it succeeded."""
+        def step(state):
+            if setter(state) is False:
+                return False
+            self._record_applied(setting, state)
+            return True
+        return step
+
+    def start_shell(self):
+        """Starts a PowerShell host worker ahead of the first setter that needs one."""
+        try:
+            self.shell.start()
+        except OSError as e:
+            print(f"[WARNING] PowerShell host could not be started ({e}), running PowerShell per command.")
+            self.shell_available = False
 
     def _run_powershell(self, command):
+        return self._execute_powershell(command).ok
+
+    def _execute_powershell(self, command):
+        """Runs a command on the shell host, or in its own process without one. Returns a ShellResult."""
+        if self.shell_available:
+            try:
+                result = self.shell.run(command, self.POWERSHELL_TIMEOUT)
+            except ShellTimeout as e:
+                print(f"PowerShell command timed out ({e}), its shell was killed.")
+                return ShellResult(False)
+            except FileNotFoundError as e:
+                print(f"[WARNING] PowerShell host could not be started ({e}), running PowerShell per command.")
+                self.shell_available = False
+            except OSError as e:
+                print(f"[WARNING] PowerShell host failed ({e}), running the command in its own PowerShell.")
+            else:
+                if not result.ok:
+                    print(f"Error executing PowerShell command: {result.error}")
+                    print(f"Output: {result.output}")
+                return result
+        return self._run_powershell_process(command)
+
+    def _run_powershell_process(self, command):
         try:
             # For Windows, use CREATE_NO_WINDOW to prevent console pop-up
             creation_flags = 0
@@ -26,33 +180,89 @@ class SettingsManager:
             result = subprocess.run(
                 ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", command],
                 check=True, capture_output=True, text=True,
-                creationflags=creation_flags
+                creationflags=creation_flags, timeout=self.POWERSHELL_TIMEOUT
             )
+            return ShellResult(True, result.stdout)
+        except subprocess.TimeoutExpired:
+            print(f"PowerShell command timed out after {self.POWERSHELL_TIMEOUT}s and was killed.")
         except subprocess.CalledProcessError as e:
             print(f"Error executing PowerShell command: {e}")
             print(f"Stderr: {e.stderr}")
             print(f"Stdout: {e.stdout}")
+            return ShellResult(False, e.stdout or '', str(e))
         except Exception as e:
             print(f"An unexpected error occurred while executing PowerShell command: {e}")
+        return ShellResult(False)
+
+    def _batched(self, steps):
+        """
+        Replaces the PowerShell-backed steps by one SHELL_BATCH step, if there are several
+        and every command would start its own PowerShell. On the host, separate steps are
+        faster, since they run on its shells in parallel.
+        This only batches when the native backends are missing as well, as in the tests:
+        on Windows airplane mode is the one PowerShell-backed step left.
+        """
+        if self.shell_available:
+            return steps
+        shell_steps = [step for step in steps if step.script]
+        if len(shell_steps) < 2:
+            return steps
+        names = {step.setting for step in shell_steps}
+        batch = PlanStep(
+            self.SHELL_BATCH, functools.partial(self._run_batch, shell_steps), {},
+            tuple(dict.fromkeys(dep for step in shell_steps for dep in step.after if dep not in names)),
+        )
+        batched = []
+        for step in steps:
+            if step is shell_steps[0]:
+                batched.append(batch)
+            elif step.setting not in names:
+                after = tuple(dict.fromkeys(self.SHELL_BATCH if dep in names else dep for dep in step.after))
+                batched.append(step._replace(after=after))
+        return batched
+
+    def _run_batch(self, shell_steps, _state):
+        """Runs the scripts of several steps in one PowerShell request. Each step is recorded on its own."""
+        output = self._execute_powershell(powershell_batch([(step.setting, step.script) for step in shell_steps])).output
+        results = parse_batch_results(output)
+        succeeded = True
+        for step in shell_steps:
+            ok, error = results.get(step.setting, (False, "the batch stopped before this step"))
+            if ok:
+                self._record_applied(step.setting, step.state)
+            else:
+                print(f"Error setting {step.setting}: {error}")
+                succeeded = False
+        return succeeded
 
     async def _set_radio_state_async(self, kind, turn_on):
         try:
-            all_radios = await Radio.get_radios_async()
-            for r in all_radios:
+            for r in await self.radios.get():
                 if r.kind == kind:
                     await r.set_state_async(RadioState.ON if turn_on else RadioState.OFF)
         except Exception as e:
+            # The cached radio may be gone
+            self.radios.invalidate()
             print(f"Error setting radio state for {kind.name}: {e}")
+            return False
+
+    def _run_radio_operation(self, coro, name):
+        # Waits for the radio, so the apply worker can order and time out the step
+        try:
+            return self.async_runner.run(coro, name, self.RADIO_TIMEOUT)
+        except TimeoutError as e:
+            print(f"Error: {e}")
+            return False
 
     def _set_radio_state(self, kind, turn_on):
-        self.async_runner.run_coroutine(self._set_radio_state_async(kind, turn_on))
+        return self._run_radio_operation(self._set_radio_state_async(kind, turn_on), f"set {kind.name} radio")
 
     async def _set_hotspot_state_async(self, turn_on):
         try:
             connection_profile = NetworkInformation.get_internet_connection_profile()
             if not connection_profile:
                 print("Error: Not connected to a network. Cannot manage hotspot.")
-                return
+                return False
             tethering_manager = NetworkOperatorTetheringManager.create_from_connection_profile(connection_profile)
             if turn_on:
                 await tethering_manager.start_tethering_async()
@@ -60,51 +270,31 @@ class SettingsManager:
                 await tethering_manager.stop_tethering_async()
         except Exception as e:
             print(f"Error setting hotspot state: {e}")
+            return False
 
     def set_hotspot(self, state):
         if state.get('is_unchanged', True): return
-        self.async_runner.run_coroutine(self._set_hotspot_state_async(state.get('tile_value') == 0))
+        return self._run_radio_operation(self._set_hotspot_state_async(state.get('tile_value') == 0), "set hotspot")
 
     def set_wifi(self, state):
         if state.get('is_unchanged', True): return
-        self._set_radio_state(RadioKind.WI_FI, state.get('tile_value') == 0)
+        return self._set_radio_state(RadioKind.WI_FI, state.get('tile_value') == 0)
 
     def set_bluetooth(self, state):
         if state.get('is_unchanged', True): return
-        self._set_radio_state(RadioKind.BLUETOOTH, state.get('tile_value') == 0)
+        return self._set_radio_state(RadioKind.BLUETOOTH, state.get('tile_value') == 0)
 
-    def set_airplane_mode(self, state):
-        if state.get('is_unchanged', True): return
-        
+    def _airplane_mode_command(self, state):
         # UI "On" (tile_value 0) -> Airplane Mode ON -> PowerShell state 0
         # UI "Off" (tile_value 1) -> Airplane Mode OFF -> PowerShell state 1
         turn_on = state.get('tile_value') == 0
         desired_state = 0 if turn_on else 1
 
-        command = f"""
-        Add-Type -TypeDefinition @'
-        using System;
-        using System.Runtime.InteropServices;
-
-        public static class NativeMethods {{
-            [DllImport("ole32.dll")]
-            public static extern int CoInitialize(IntPtr pv);
-            [DllImport("ole32.dll")]
-            public static extern void CoUninitialize();
-            [DllImport("ole32.dll")]
-            public static extern uint CoCreateInstance(Guid clsid, IntPtr pv, uint ctx, Guid iid, out IntPtr ppv);
+        return f"""
+        if (-not ('NativeMethods' -as [type])) {{
+{AIRPLANE_TYPES}
         }}
 
-        [UnmanagedFunctionPointer(CallingConvention.StdCall)]
-        public delegate int GetSystemRadioStateDelegate(IntPtr cg, out int ie, out int se, out int p3);
-
-        [UnmanagedFunctionPointer(CallingConvention.StdCall)]
-        public delegate int SetSystemRadioStateDelegate(IntPtr ptr, int state);
-
-        [UnmanagedFunctionPointer(CallingConvention.StdCall)]
-        public delegate int ReleaseDelegate(IntPtr ptr);
-'@
-
         $CLSID = '581333F6-28DB-41BE-BC7A-FF201F12F3F6'
         $IID   = 'DB3AFBFB-08E6-46C6-AA70-BF9A34C30AB7'
         $mrs   = [System.Runtime.InteropServices.Marshal]
@@ -136,10 +326,14 @@ class SettingsManager:
             $null = [NativeMethods]::CoUninitialize()
         }}
         """
+
+    def set_airplane_mode(self, state):
+        if state.get('is_unchanged', True): return
         try:
-            self._run_powershell(command)
+            return self._run_powershell(self._airplane_mode_command(state))
         except Exception as e:
             print(f"Error setting airplane mode: {e}")
+            return False
 
     def set_brightness(self, state):
         if state.get('is_unchanged', True): return
@@ -147,65 +341,75 @@ class SettingsManager:
             sbc.set_brightness(state.get('tile_value', 100))
         except Exception as e:
             print(f"Error setting brightness: {e}")
+            return False
 
     def set_volume(self, state):
         if state.get('is_unchanged', True): return
-        CoInitialize()
+        level = state.get('tile_value', 100)
         try:
-            devices = AudioUtilities.GetSpeakers()
-            interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-            volume = cast(interface, POINTER(IAudioEndpointVolume))
-            level = state.get('tile_value', 100)
-            volume.SetMasterVolumeLevelScalar(level / 100.0, None)
-        finally:
-            CoUninitialize()
+            self.audio.call(SPEAKERS, lambda speakers: speakers.set_volume(level))
+        except Exception as e:
+            print(f"Error setting volume: {e}")
+            return False
 
-    def set_performance_mode(self, state):
-        if state.get('is_unchanged', True): return
+    def _performance_mode_command(self, state):
         power_schemes = {0: "8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c", 1: "381b4222-f694-41f0-9685-ff5bb260df2e", 2: "a1841308-3541-4fab-bc81-f71556f20b4a"}
         scheme_guid = power_schemes.get(state.get('tile_value'))
-        if scheme_guid:
-            self._run_powershell(f"powercfg /setactive {scheme_guid}")
+        return f"powercfg /setactive {scheme_guid}" if scheme_guid else None
 
-    def set_system_color(self, state):
+    def _apply_native(self, setting, state):
+        return self.backends[setting].apply(state.get('tile_value'))
+
+    def set_performance_mode(self, state):
         if state.get('is_unchanged', True): return
+        if 'performance' in self.backends:
+            return self._apply_native('performance', state)
+        command = self._performance_mode_command(state)
+        if command:
+            return self._run_powershell(command)
+        return False
+
+    def _system_color_command(self, state):
         new_value = 1 - state.get('tile_value', 0)
-        command = f"""
+        return f"""
         $path = 'HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Themes\\Personalize'
         Set-ItemProperty -Path $path -Name AppsUseLightTheme -Value {new_value}
         Set-ItemProperty -Path $path -Name SystemUsesLightTheme -Value {new_value}
         """
-        self._run_powershell(command)
+
+    def set_system_color(self, state):
+        if state.get('is_unchanged', True): return
+        if 'systemcolor' in self.backends:
+            return self._apply_native('systemcolor', state)
+        return self._run_powershell(self._system_color_command(state))
+
+    def _night_light_command(self, state):
+        turn_on = state.get('tile_value') == 0
+
+        # The functions in the module are idempotent, so we can call them directly.
+        action = "Enable-NightLight" if turn_on else "Disable-NightLight"
+
+        # Import the module unless the shell already has it, and call the appropriate function.
+        return f"if (-not (Get-Module Switch-NightLight)) {{ Import-Module '{self.NIGHT_LIGHT_MODULE}' }}; {action}"
 
     def set_night_light(self, state):
         if state.get('is_unchanged', True): return
+        if 'nightlight' in self.backends:
+            return self._apply_native('nightlight', state)
         try:
-            turn_on = state.get('tile_value') == 0
-            script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Switch-NightLight.psm1')
-            
-            # The functions in the module are idempotent, so we can call them directly.
-            action = "Enable-NightLight" if turn_on else "Disable-NightLight"
-            
-            # Import the module and call the appropriate function.
-            command = f"Import-Module '{script_path}'; {action}"
-            
-            self._run_powershell(command)
+            return self._run_powershell(self._night_light_command(state))
         except Exception as e:
             print(f"Error setting night light: {e}")
+            return False
 
     def set_microphone(self, state):
         if state.get('is_unchanged', True): return
-        CoInitialize()
+        is_muted = state.get('tile_value') == 1
         try:
-            mic = AudioUtilities.GetMicrophone()
-            interface = mic.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-            volume = cast(interface, POINTER(IAudioEndpointVolume))
-            is_muted = state.get('tile_value') == 1
-            volume.SetMute(is_muted, None)
+            self.audio.call(MICROPHONE, lambda mic: mic.set_muted(is_muted))
         except Exception as e:
             print(f"Error setting microphone mute: {e}")
-        finally:
-            CoUninitialize()
+            return False
 
     def set_startup(self, state, program_path, program_name):
         if state.get('is_unchanged', True) or not program_path: return
@@ -251,41 +455,83 @@ class SettingsManager:
             CoUninitialize()
 
 
-    def apply_settings(self, settings_profile, profile_name="Unknown", program_path=None):
-        if not settings_profile: return
-        
-        airplane_state = settings_profile.get('airplane', {'is_unchanged': True})
+    def _compile_profile(self, settings_profile):
+        """
+        Compiles a profile into PlanSteps, listed in an order that satisfies their dependencies.
+        Shell commands are built here once, so running a step only starts the shell.
+        """
+        steps = []
 
-        # Check if airplane mode is explicitly being turned ON by the profile
-        is_airplane_on = not airplane_state.get('is_unchanged', True) and airplane_state.get('tile_value') == 0
+        def add_step(setting, setter, state=None, after=(), command=None):
+            state = state if state is not None else settings_profile.get(setting, {'is_unchanged': True})
+            if state.get('is_unchanged', True):
+                return
+            script = None
+            if command is not None:
+                script = command(state)
+                setter = lambda _state, script=script: self._run_powershell(script) if script else False
+            planned = {step.setting for step in steps}
+            steps.append(PlanStep(setting, self._tracked(setting, setter), state, tuple(dep for dep in after if dep in planned), script))
 
-        if is_airplane_on:
-            self.set_airplane_mode(airplane_state)
-        else:
-            # If airplane mode is not being turned ON, it's either OFF or UNCHANGED.
-            
-            # Check if any other radio is being turned ON
-            wifi_on = not settings_profile.get('wifi', {}).get('is_unchanged', True) and settings_profile.get('wifi', {}).get('tile_value') == 0
-            bt_on = not settings_profile.get('bt', {}).get('is_unchanged', True) and settings_profile.get('bt', {}).get('tile_value') == 0
-            hotspot_on = not settings_profile.get('hotspot', {}).get('is_unchanged', True) and settings_profile.get('hotspot', {}).get('tile_value') == 0
+        def is_turned_on(setting):
+            state = settings_profile.get(setting, {'is_unchanged': True})
+            return not state.get('is_unchanged', True) and state.get('tile_value') == 0
 
-            # If airplane mode is explicitly set to OFF, or if any other radio is being turned ON,
-            # we must first ensure airplane mode is OFF.
+        airplane_state = settings_profile.get('airplane', {'is_unchanged': True})
+
+        if is_turned_on('airplane'):
+            add_step('airplane', None, command=self._airplane_mode_command)
+        else:
+            # Airplane mode is either turned OFF or left unchanged. Turning it off, or
+            # turning any radio on, must first ensure airplane mode is OFF.
             is_airplane_off = not airplane_state.get('is_unchanged', True) and airplane_state.get('tile_value') == 1
-            
-            if is_airplane_off or wifi_on or bt_on or hotspot_on:
-                self.set_airplane_mode({'tile_value': 1, 'is_unchanged': False}) # Force airplane mode OFF
-
-            # Now apply the individual radio settings
-            self.set_wifi(settings_profile.get('wifi', {'is_unchanged': True}))
-            self.set_bluetooth(settings_profile.get('bt', {'is_unchanged': True}))
-            self.set_hotspot(settings_profile.get('hotspot', {'is_unchanged': True}))
-
-        self.set_brightness(settings_profile.get('brightness', {'is_unchanged': True}))
-        self.set_volume(settings_profile.get('volume', {'is_unchanged': True}))
-        self.set_performance_mode(settings_profile.get('performance', {'is_unchanged': True}))
-        self.set_system_color(settings_profile.get('systemcolor', {'is_unchanged': True}))
-        self.set_night_light(settings_profile.get('nightlight', {'is_unchanged': True}))
-        self.set_microphone(settings_profile.get('microphone', {'is_unchanged': True}))
+            if is_airplane_off or is_turned_on('wifi') or is_turned_on('bt') or is_turned_on('hotspot'):
+                add_step('airplane', None, {'tile_value': 1, 'is_unchanged': False}, command=self._airplane_mode_command) # Force airplane mode OFF
+
+            # Now apply the individual radio settings, once airplane mode is off
+            add_step('wifi', self.set_wifi, after=('airplane',))
+            add_step('bt', self.set_bluetooth, after=('airplane',))
+            # The hotspot shares the Wi-Fi adapter
+            add_step('hotspot', self.set_hotspot, after=('airplane', 'wifi'))
+
+        add_step('brightness', self.set_brightness)
+        add_step('volume', self.set_volume)
+        # Settings with a native backend need no shell
+        add_step('performance', self.set_performance_mode, command=None if 'performance' in self.backends else self._performance_mode_command)
+        add_step('systemcolor', self.set_system_color, command=None if 'systemcolor' in self.backends else self._system_color_command)
+        add_step('nightlight', self.set_night_light, command=None if 'nightlight' in self.backends else self._night_light_command)
+        add_step('microphone', self.set_microphone)
         # The startup setting is handled separately in the UI, so we ignore it here.
-        # self.set_startup(settings_profile.get('startup', {'is_unchanged': True}), program_path, profile_name)
+        return steps
+
+    def plan_settings(self, settings_profile, profile_name="Unknown", program_path=None):
+        """
+        Returns the setter calls for a profile as PlanSteps (setting, setter, state, after), where
+        `after` names the settings whose steps must finish first. Steps are listed in an order
+        that satisfies these dependencies; all other steps are independent of each other.
+        Settings the profile leaves unchanged, that the previous profile already set, that the
+        ledger says are already applied, or that the system already has get no step.
+        Without the shell host, several PowerShell-backed settings share one SHELL_BATCH step.
+        """
+        if not settings_profile: return []
+        candidates = [step for step in self.plans.plan(settings_profile, self._applied_profile()) if not self.is_applied(step.setting, step.state)]
+
+        # Switching airplane mode switches the radios too, so what they read now says nothing
+        # about their state afterwards: Windows restores them when airplane mode goes off
+        unprobed = self.RADIO_SETTINGS if any(step.setting == 'airplane' for step in candidates) else ()
+        # One read per probe for everything the ledger could not rule out
+        self.probes.prefetch([step.setting for step in candidates if step.setting not in unprobed])
+        steps = []
+        for step in candidates:
+            if step.setting not in unprobed and self.probes.get_current(step.setting) == step.state.get('tile_value'):
+                with self.ledger_lock:
+                    self.ledger[step.setting] = (step.state.get('tile_value'), time.monotonic())
+                continue
+            planned = {planned_step.setting for planned_step in steps}
+            steps.append(step._replace(after=tuple(dep for dep in step.after if dep in planned)))
+        return self._batched(steps)
+
+    def apply_settings(self, settings_profile, profile_name="Unknown", program_path=None):
+        results = [step.setter(step.state) for step in self.plan_settings(settings_profile, profile_name, program_path)]
+        if all(results):
+            self.profile_applied(settings_profile)
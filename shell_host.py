@@ -0,0 +1,321 @@
+import sys
+import time
+import queue
+import base64
+import threading
+import subprocess
+
+# Ends the output of every request: "<MARKER> <request id> <0 ok | 1 failed> <base64 error>"
+RESULT_MARKER = '#QAUTIC-RESULT'
+# Reports one step of a batch script: "<MARKER> <step name> <0 ok | 1 failed> <base64 error>"
+STEP_MARKER = '#QAUTIC-STEP'
+
+# Reads one base64 script per line and runs it in the session, so types and modules
+# loaded by one request stay loaded for the next ones
+POWERSHELL_LOOP = r"""
+[Console]::OutputEncoding = [Text.Encoding]::UTF8
+while ($null -ne ($__qauticLine = [Console]::In.ReadLine())) {
+    $__qauticId, $__qauticPayload = $__qauticLine.Split(' ', 2)
+    $__qauticStatus = 0
+    $__qauticMessage = ''
+    try {
+        $global:LASTEXITCODE = 0
+        $__qauticScript = [Text.Encoding]::UTF8.GetString([Convert]::FromBase64String($__qauticPayload))
+        $__qauticOutput = . ([ScriptBlock]::Create($__qauticScript)) 2>&1 | Out-String
+        if ($__qauticOutput) { [Console]::Out.Write($__qauticOutput) }
+        if ($LASTEXITCODE) {
+            $__qauticStatus = 1
+            $__qauticMessage = "exit code $LASTEXITCODE"
+        }
+    } catch {
+        $__qauticStatus = 1
+        $__qauticMessage = $_.ToString()
+    }
+    $__qauticEncoded = [Convert]::ToBase64String([Text.Encoding]::UTF8.GetBytes($__qauticMessage))
+    [Console]::Out.WriteLine("#QAUTIC-RESULT $__qauticId $__qauticStatus $__qauticEncoded")
+    [Console]::Out.Flush()
+}
+"""
+
+# The same protocol for Python source, to run the host without PowerShell (e.g. on Linux)
+PYTHON_LOOP = r"""
+import sys, io, base64, contextlib
+namespace = {}
+for line in sys.stdin:
+    request_id, _, payload = line.strip().partition(' ')
+    status, message, output = 0, '', io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            exec(base64.b64decode(payload).decode('utf-8'), namespace)
+    except BaseException as e:
+        status, message = 1, f'{type(e).__name__}: {e}'
+    text = output.getvalue()
+    sys.stdout.write(text if not text or text.endswith('\n') else text + '\n')
+    sys.stdout.write('#QAUTIC-RESULT %s %d %s\n' % (request_id, status, base64.b64encode(message.encode('utf-8')).decode('ascii')))
+    sys.stdout.flush()
+"""
+
+def powershell_batch(steps):
+    """One PowerShell script running the (name, script) steps in order; a failing step does not stop the others."""
+    parts = []
+    for name, script in steps:
+        parts.append(f"""
+try {{
+    $global:LASTEXITCODE = 0
+{script}
+    if ($LASTEXITCODE) {{ throw "exit code $LASTEXITCODE" }}
+    [Console]::Out.WriteLine('{STEP_MARKER} {name} 0')
+}} catch {{
+    [Console]::Out.WriteLine('{STEP_MARKER} {name} 1 ' + [Convert]::ToBase64String([Text.Encoding]::UTF8.GetBytes($_.ToString())))
+}}""")
+    return '\n'.join(parts)
+
+def python_batch(steps):
+    """The same as `powershell_batch` for Python source."""
+    parts = ['import base64 as __qautic_base64']
+    for name, script in steps:
+        parts.append(
+            f"try:\n"
+            f"    exec({script!r})\n"
+            f"    print('{STEP_MARKER} {name} 0')\n"
+            f"except Exception as e:\n"
+            f"    print('{STEP_MARKER} {name} 1 ' + __qautic_base64.b64encode(f'{{type(e).__name__}}: {{e}}'.encode('utf-8')).decode('ascii'))"
+        )
+    return '\n'.join(parts)
+
+def parse_batch_results(output):
+    """{step name: (ok, error)} for the steps of a batch script that reported a result."""
+    results = {}
+    for line in output.splitlines():
+        if line.startswith(STEP_MARKER):
+            _, name, status, error = (line.split() + [''])[:4]
+            results[name] = (status == '0', base64.b64decode(error).decode('utf-8', 'replace'))
+    return results
+
+def powershell_host_command():
+    return ["powershell", "-NoProfile", "-NoLogo", "-NonInteractive", "-ExecutionPolicy", "Bypass", "-Command", POWERSHELL_LOOP]
+
+def python_host_command():
+    return [sys.executable, "-u", "-c", PYTHON_LOOP]
+
+class ShellResult:
+    """The outcome of one request: `ok`, the script's output and the error text if it failed."""
+    __slots__ = ('ok', 'output', 'error')
+
+    def __init__(self, ok, output='', error=''):
+        self.ok = ok
+        self.output = output
+        self.error = error
+
+class ShellTimeout(Exception):
+    pass
+
+class ShellWorker:
+    """One long-lived interpreter process, running one request at a time."""
+    def __init__(self, command, warmup=()):
+        creation_flags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, encoding='utf-8', errors='replace', bufsize=1, creationflags=creation_flags,
+        )
+        self.calls = 0
+        self.last_used = time.monotonic()
+        self._lines = queue.Queue()
+        self._next_id = 0
+        self._warmup = []  # ids of warm-up requests whose results were not read yet
+        self._reader = threading.Thread(target=self._read, name='shell_reader', daemon=True)
+        self._reader.start()
+        for script in warmup:
+            self._warmup.append(self._send(script))
+
+    def _read(self):
+        for line in self.process.stdout:
+            self._lines.put(line)
+        self._lines.put(None)  # The process is gone
+
+    def _send(self, script):
+        self._next_id += 1
+        payload = base64.b64encode(script.encode('utf-8')).decode('ascii')
+        self.process.stdin.write(f"{self._next_id} {payload}\n")
+        self.process.stdin.flush()
+        return str(self._next_id)
+
+    def _receive(self, request_id, deadline):
+        output = []
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise ShellTimeout()
+            if line is None:
+                raise OSError(f"shell exited with code {self.process.wait()}")
+            if line.startswith(RESULT_MARKER):
+                _, result_id, status, error = (line.split() + [''])[:4]
+                if result_id == request_id:
+                    return ShellResult(status == '0', ''.join(output), base64.b64decode(error).decode('utf-8', 'replace'))
+                continue
+            output.append(line)
+
+    def run(self, script, timeout):
+        """Runs a script. Raises ShellTimeout, or OSError if the process died; the worker is unusable after either."""
+        deadline = time.monotonic() + timeout
+        while self._warmup:
+            result = self._receive(self._warmup.pop(0), deadline)
+            if not result.ok:
+                print(f"[WARNING] Shell warm-up failed: {result.error}")
+        self.calls += 1
+        try:
+            request_id = self._send(script)
+        except (OSError, ValueError) as e:
+            raise OSError(f"shell is not accepting requests: {e}")
+        result = self._receive(request_id, deadline)
+        self.last_used = time.monotonic()
+        return result
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        try:
+            self.process.kill()
+        except OSError:
+            pass
+
+class ShellHost:
+    """
+    A pool of long-lived shell processes that run scripts sent over stdin.
+
+    Starting an interpreter per call costs far more than most settings take to apply,
+    so workers are kept running and reused, with the `warmup` scripts (type
+    definitions, modules) run once when a worker starts. A worker is replaced after
+    `max_calls` requests, when a request times out, or when it died. A worker that sat
+    idle for `health_interval` seconds is pinged before it gets a request.
+
+    `command` is any interpreter speaking the request protocol, e.g.
+    `powershell_host_command()` or `python_host_command()`.
+    """
+    DEFAULT_TIMEOUT = 30.0
+
+    def __init__(self, command, warmup=(), size=2, max_calls=200, timeout=DEFAULT_TIMEOUT, health_interval=60.0):
+        self.command = list(command)
+        self.warmup = list(warmup)
+        self.size = size
+        self.max_calls = max_calls
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self._condition = threading.Condition()
+        self._idle = []
+        self._busy = 0
+        self._stopped = False
+
+        # --- Counters ---
+        self.calls = 0
+        self.spawned = 0
+        self.recycled = 0
+        self.timeouts = 0
+        self.health_checks = 0
+
+    def start(self):
+        """Starts one worker ahead of the first request. Raises OSError if the interpreter cannot be started."""
+        with self._condition:
+            if self._stopped or self._idle or self._busy:
+                return
+            self._busy += 1
+        worker = None
+        try:
+            worker = self._spawn()
+        finally:
+            self._release(worker)
+
+    def run(self, script, timeout=None):
+        """
+        Runs a script on a free worker and returns its ShellResult.
+        Raises ShellTimeout if it did not finish in time, and OSError if no worker could run it.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._acquire(timeout)
+        try:
+            self.calls += 1
+            result = worker.run(script, timeout)
+        except ShellTimeout:
+            self.timeouts += 1
+            self._discard(worker)
+            worker = None
+            raise ShellTimeout(f"no result after {timeout:.1f}s")
+        except OSError:
+            self._discard(worker)
+            worker = None
+            raise
+        finally:
+            self._release(worker)
+        return result
+
+    def shutdown(self):
+        with self._condition:
+            self._stopped = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for worker in idle:
+            worker.close()
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._idle and self._busy >= self.size and not self._stopped:
+                if not self._condition.wait(max(0.0, deadline - time.monotonic())):
+                    raise ShellTimeout("no shell worker became free")
+            if self._stopped:
+                raise OSError("shell host is shut down")
+            worker = self._idle.pop() if self._idle else None
+            self._busy += 1
+        try:
+            if worker is not None and not self._healthy(worker):
+                self._discard(worker)
+                worker = None
+            return worker if worker is not None else self._spawn()
+        except BaseException:
+            self._release(None)
+            raise
+
+    def _healthy(self, worker):
+        if not worker.alive():
+            return False
+        if time.monotonic() - worker.last_used < self.health_interval:
+            return True
+        self.health_checks += 1
+        try:
+            return worker.run('', min(self.timeout, 5.0)).ok
+        except (ShellTimeout, OSError):
+            return False
+
+    def _spawn(self):
+        worker = ShellWorker(self.command, self.warmup)
+        self.spawned += 1
+        return worker
+
+    def _discard(self, worker):
+        worker.close()
+        self.recycled += 1
+
+    def _release(self, worker):
+        """Returns a checked-out worker; None when it was discarded."""
+        if worker is not None and worker.calls >= self.max_calls:
+            self._discard(worker)
+            worker = None
+        with self._condition:
+            self._busy -= 1
+            if worker is not None:
+                if self._stopped:
+                    worker.close()
+                else:
+                    self._idle.append(worker)
+            self._condition.notify()
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'spawned': self.spawned,
+            'recycled': self.recycled,
+            'timeouts': self.timeouts,
+            'health_checks': self.health_checks,
+        }
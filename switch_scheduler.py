@@ -0,0 +1,96 @@
+import time
+from collections import deque
+
+class SwitchScheduler:
+    """
+    Hysteresis for profile switches, so short-lived processes do not make the
+    service bounce between a program profile and the default profile.
+
+    A switch is held back until:
+      - the current profile was active for at least `min_dwell` seconds,
+      - for switches caused by the active program exiting, the exit was pending for
+        `exit_grace` seconds (the program may be restarted right away),
+      - fewer than `max_switches_per_minute` switches happened in the last minute.
+
+    A held back switch whose target is reverted or replaced before it is due is
+    counted as suppressed; that is a whole apply chain saved.
+    """
+    def __init__(self, min_dwell=2.0, exit_grace=3.0, max_switches_per_minute=6, clock=time.monotonic):
+        self.clock = clock
+        self.configure(min_dwell, exit_grace, max_switches_per_minute)
+        self.pending_target = None
+        self._pending_since = None
+        self._last_switch = None
+        self._switches = deque()
+
+        # --- Counters ---
+        self.switches = 0
+        self.deferred = 0
+        self.suppressed = 0
+
+    def configure(self, min_dwell=2.0, exit_grace=3.0, max_switches_per_minute=6):
+        self.min_dwell = min_dwell
+        self.exit_grace = exit_grace
+        self.max_switches_per_minute = max_switches_per_minute
+
+    def configure_from_preferences(self, prefs):
+        options = prefs.get('profile_switching', {})
+        self.configure(
+            min_dwell=options.get('min_dwell_ms', 2000) / 1000.0,
+            exit_grace=options.get('exit_grace_ms', 3000) / 1000.0,
+            max_switches_per_minute=options.get('max_switches_per_minute', 6),
+        )
+
+    def delay(self, target, is_exit=False):
+        """Returns the seconds to wait before switching to `target`, or 0 to switch now."""
+        now = self.clock()
+        if target != self.pending_target:
+            if self.pending_target is not None:
+                self._suppress(f"replaced by '{target}'")
+            self.pending_target = target
+            self._pending_since = now
+
+        waits = [0.0]
+        if self._last_switch is not None:
+            waits.append(self._last_switch + self.min_dwell - now)
+        if is_exit:
+            waits.append(self._pending_since + self.exit_grace - now)
+        self._forget_old_switches(now)
+        if self.max_switches_per_minute and len(self._switches) >= self.max_switches_per_minute:
+            waits.append(self._switches[0] + 60.0 - now)
+
+        wait = max(waits)
+        if wait > 0 and self._pending_since == now:
+            self.deferred += 1
+        return max(0.0, wait)
+
+    def record_switch(self):
+        """Called once a switch was actually made."""
+        now = self.clock()
+        self._last_switch = now
+        self._switches.append(now)
+        self.switches += 1
+        self.pending_target = None
+        self._pending_since = None
+
+    def cancel(self):
+        """Drops the pending switch because the current profile is wanted again."""
+        if self.pending_target is not None:
+            self._suppress('current profile is wanted again')
+            self.pending_target = None
+            self._pending_since = None
+
+    def _suppress(self, reason):
+        self.suppressed += 1
+        print(f"[SWITCH] Suppressed switch to '{self.pending_target}' ({reason}). {self.stats()}")
+
+    def _forget_old_switches(self, now):
+        while self._switches and now - self._switches[0] > 60.0:
+            self._switches.popleft()
+
+    def stats(self):
+        return {
+            'switches': self.switches,
+            'deferred': self.deferred,
+            'suppressed': self.suppressed,
+        }
@@ -0,0 +1,17 @@
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules settings_tile_functions imports at load time. The tests run it on fakes
+# (probes, audio provider, native backends), so off Windows stand-ins are enough.
+WINDOWS_MODULES = [
+    'screen_brightness_control', 'comtypes', 'pycaw', 'pycaw.pycaw', 'win32com', 'win32com.client',
+    'winsdk', 'winsdk.windows', 'winsdk.windows.devices', 'winsdk.windows.devices.radios',
+    'winsdk.windows.networking', 'winsdk.windows.networking.networkoperators',
+    'winsdk.windows.networking.connectivity',
+]
+if sys.platform != 'win32':
+    for name in WINDOWS_MODULES:
+        sys.modules.setdefault(name, mock.MagicMock())
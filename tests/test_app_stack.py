@@ -0,0 +1,84 @@
+import random
+
+from app_stack import RunningAppStack, program_key
+
+
+def program(name, priority=None, **settings):
+    profile = {setting: {'tile_value': value, 'is_unchanged': False} for setting, value in settings.items()}
+    if priority is not None:
+        profile['priority'] = {'tile_value': priority, 'is_unchanged': False}
+    return {'name': name, 'path': f"C:\\Apps\\{name}.exe", 'settings': profile}
+
+
+def test_top_is_the_highest_priority_program():
+    stack = RunningAppStack()
+    stack.add(1, program('Browser'))
+    stack.add(2, program('Game', priority=1))
+    stack.add(3, program('Editor', priority=2))
+    assert stack.top()['name'] == 'Game'
+    assert stack.names() == ['Game', 'Editor', 'Browser']
+
+
+def test_program_stays_until_its_last_instance_exits():
+    removed = []
+    stack = RunningAppStack(on_removed=removed.append)
+    game = program('Game', priority=1)
+    assert stack.add(1, game)
+    assert not stack.add(2, game)
+    assert stack.refcount(program_key(game)) == 2
+    assert not stack.remove(1)
+    assert stack.top()['name'] == 'Game' and not removed
+    assert stack.remove(2)
+    assert stack.top() is None
+    assert [entry['name'] for entry in removed] == ['Game']
+    assert not stack.remove(2)  # Unknown PIDs are ignored
+
+
+def test_adding_below_the_top_only_reports_settings_it_contributes():
+    stack = RunningAppStack()
+    stack.add(1, program('Game', priority=1, volume=80))
+    assert not stack.add(2, program('Editor', priority=2, volume=20))
+    assert stack.add(3, program('Player', priority=3, brightness=40))
+    assert stack.effective_settings() == {
+        'volume': {'tile_value': 80, 'is_unchanged': False},
+        'brightness': {'tile_value': 40, 'is_unchanged': False},
+    }
+
+
+def test_settings_fall_back_to_the_next_program_when_the_top_exits():
+    stack = RunningAppStack()
+    stack.add(1, program('Game', priority=1, volume=80))
+    stack.add(2, program('Editor', priority=2, volume=20))
+    assert stack.remove(1)
+    assert stack.effective_settings()['volume']['tile_value'] == 20
+
+
+def test_update_program_reorders_the_stack():
+    stack = RunningAppStack()
+    stack.add(1, program('Game', priority=1))
+    stack.add(2, program('Editor', priority=2))
+    assert stack.update_program(program('Editor', priority=0))
+    assert stack.top()['name'] == 'Editor'
+    assert stack.remove_program(program_key(program('Editor')))
+    assert not stack.has_pid(2)
+    assert stack.top()['name'] == 'Game'
+
+
+def test_heap_order_survives_random_changes():
+    rng = random.Random(7)
+    stack = RunningAppStack()
+    running = {}
+    for step in range(500):
+        if running and rng.random() < 0.4:
+            pid = rng.choice(list(running))
+            del running[pid]
+            stack.remove(pid)
+        else:
+            name = f"app{rng.randrange(20)}"
+            running[step] = name
+            stack.add(step, program(name, priority=int(name[3:]) % 7))
+        names = set(running.values())
+        expected = min(names, key=lambda name: int(name[3:]) % 7) if names else None
+        top = stack.top()
+        assert (top['sort_key'][:2] if top else None) == ((False, int(expected[3:]) % 7) if expected else None)
+        assert len(stack) == len(names)
@@ -0,0 +1,145 @@
+import time
+import threading
+
+from apply_worker import ApplyWorker
+from transition_plans import PlanStep
+
+class FakeSettingsManager:
+    """Plans fixed steps and records what the worker reports."""
+    def __init__(self, steps=()):
+        self.steps = list(steps)
+        self.applied_profiles = []
+        self.plans = type('Plans', (), {'stats': lambda self: {}})()
+
+    def plan_settings(self, settings, profile_name="Unknown", program_path=None):
+        return self.steps
+
+    def profile_applied(self, settings):
+        self.applied_profiles.append(settings)
+
+def sleeping_step(setting, seconds, after=()):
+    return PlanStep(setting, lambda state: time.sleep(seconds), {}, after)
+
+def apply_and_wait(worker, settings, name='profile'):
+    """Submits a profile and returns whether all of its steps succeeded."""
+    results = []
+    done = threading.Event()
+    worker.submit(settings, name, on_done=lambda applied: (results.append(applied), done.set()))
+    assert done.wait(5)
+    return results[0]
+
+def test_independent_steps_run_in_parallel():
+    manager = FakeSettingsManager([sleeping_step(setting, 0.3) for setting in ('brightness', 'volume', 'microphone')])
+    worker = ApplyWorker(manager, timeout=0.5)
+    try:
+        started_at = time.perf_counter()
+        apply_and_wait(worker, {'volume': {}})
+        assert time.perf_counter() - started_at < 0.45
+        assert worker.stats()['timeouts'] == 0
+        assert manager.applied_profiles == [{'volume': {}}]
+    finally:
+        worker.shutdown()
+
+def test_dependent_steps_run_in_order():
+    order = []
+    steps = [
+        PlanStep('airplane', lambda state: order.append('airplane'), {}, ()),
+        PlanStep('wifi', lambda state: order.append('wifi'), {}, ('airplane',)),
+        PlanStep('hotspot', lambda state: order.append('hotspot'), {}, ('airplane', 'wifi')),
+    ]
+    worker = ApplyWorker(FakeSettingsManager(steps))
+    try:
+        apply_and_wait(worker, {'wifi': {}})
+        assert order == ['airplane', 'wifi', 'hotspot']
+    finally:
+        worker.shutdown()
+
+def writing_step(system, setting, value, seconds=0.0, after=()):
+    def setter(state):
+        time.sleep(seconds)
+        system[setting] = value
+    return PlanStep(setting, setter, {'tile_value': value}, after)
+
+class ProfileManager(FakeSettingsManager):
+    """Plans the steps registered for each profile name."""
+    def __init__(self, plans):
+        super().__init__()
+        self.profile_plans = plans
+
+    def plan_settings(self, settings, profile_name="Unknown", program_path=None):
+        return self.profile_plans[profile_name]
+
+def test_superseded_job_settles_before_the_next_one_starts():
+    system = {}
+    manager = ProfileManager({
+        'old': [writing_step(system, 'brightness', 50, 0.1), writing_step(system, 'volume', 20, 0.5)],
+        'new': [writing_step(system, 'volume', 80)],
+    })
+    worker = ApplyWorker(manager, timeout=2.0)
+    try:
+        worker.submit({'volume': 20}, 'old')
+        time.sleep(0.05)
+        apply_and_wait(worker, {'volume': 80}, 'new')
+        time.sleep(0.6)  # Past the end of every setter of the old profile
+        assert system['volume'] == 80
+        assert manager.applied_profiles == [{'volume': 80}]
+        assert worker.stats()['superseded'] == 1
+    finally:
+        worker.shutdown()
+
+def test_step_waits_for_an_abandoned_setter_of_the_same_setting():
+    system = {}
+    manager = ProfileManager({
+        'old': [writing_step(system, 'volume', 20, 0.4)],
+        'new': [writing_step(system, 'volume', 80)],
+    })
+    worker = ApplyWorker(manager, timeout=0.3)
+    try:
+        apply_and_wait(worker, {'volume': 20}, 'old')  # Times out, the setter keeps running
+        assert worker.stats()['timeouts'] == 1
+        apply_and_wait(worker, {'volume': 80}, 'new')
+        time.sleep(0.2)
+        assert system['volume'] == 80
+        assert manager.applied_profiles == [{'volume': 80}]
+    finally:
+        worker.shutdown()
+
+def test_timeout_counts_from_when_a_step_starts():
+    count = ApplyWorker.MAX_STEP_THREADS + 2  # The last steps queue for a free step thread
+    manager = FakeSettingsManager([sleeping_step(f'setting{i}', 0.3) for i in range(count)])
+    worker = ApplyWorker(manager, timeout=0.5)
+    try:
+        apply_and_wait(worker, {'volume': {}})
+        assert worker.stats()['timeouts'] == 0
+        assert manager.applied_profiles == [{'volume': {}}]
+    finally:
+        worker.shutdown()
+
+def test_hung_step_is_abandoned_and_its_dependents_go_ahead():
+    order = []
+    steps = [
+        PlanStep('airplane', lambda state: time.sleep(1.0), {}, ()),
+        PlanStep('wifi', lambda state: order.append('wifi'), {}, ('airplane',)),
+    ]
+    manager = FakeSettingsManager(steps)
+    worker = ApplyWorker(manager, timeout=0.2)
+    try:
+        started_at = time.perf_counter()
+        assert not apply_and_wait(worker, {'wifi': {}})
+        assert time.perf_counter() - started_at < 0.5
+        assert order == ['wifi']
+        assert worker.stats()['timeouts'] == 1
+        assert manager.applied_profiles == []  # Not applied in full
+    finally:
+        worker.shutdown()
+
+def test_failed_setter_is_reported_to_the_callback():
+    def failing(state):
+        raise OSError("device gone")
+    manager = FakeSettingsManager([PlanStep('volume', failing, {}, ()), sleeping_step('brightness', 0.0)])
+    worker = ApplyWorker(manager)
+    try:
+        assert not apply_and_wait(worker, {'volume': {}})
+        assert manager.applied_profiles == []
+    finally:
+        worker.shutdown()
@@ -0,0 +1,51 @@
+import pytest
+
+from audio_endpoints import AudioEndpointCache, FakeAudioProvider, FakeEndpoint, SPEAKERS, MICROPHONE
+
+def make_cache(notify=True):
+    provider = FakeAudioProvider(notify=notify)
+    return provider, AudioEndpointCache(provider)
+
+def test_handles_are_activated_once_on_the_apartment_thread():
+    provider, cache = make_cache()
+    try:
+        cache.call(SPEAKERS, lambda speakers: speakers.set_volume(30))
+        assert cache.call(SPEAKERS, lambda speakers: speakers.volume()) == 30
+        assert cache.call(MICROPHONE, lambda mic: mic.muted()) is False
+        assert provider.activations == 2
+        assert cache.stats()['hits'] == 1
+        assert all(name.startswith('audio') for name in provider.threads)
+    finally:
+        cache.shutdown()
+
+def test_default_device_change_drops_the_handle():
+    provider, cache = make_cache()
+    try:
+        cache.call(SPEAKERS, lambda speakers: speakers.volume())
+        provider.change_default(SPEAKERS, FakeEndpoint(level=80))
+        assert cache.call(SPEAKERS, lambda speakers: speakers.volume()) == 80
+        assert cache.stats()['invalidations'] == 1
+        assert cache.stats()['errors'] == 0
+        assert provider.activations == 2
+    finally:
+        cache.shutdown()
+
+def test_failed_call_is_retried_on_a_new_handle():
+    provider, cache = make_cache(notify=False)
+    try:
+        cache.call(SPEAKERS, lambda speakers: speakers.volume())
+        provider.change_default(SPEAKERS, FakeEndpoint(level=80))  # Unnoticed, the cached handle is stale
+        assert cache.call(SPEAKERS, lambda speakers: speakers.volume()) == 80
+        assert cache.stats()['errors'] == 1
+        assert provider.activations == 2
+    finally:
+        cache.shutdown()
+
+def test_failure_on_a_fresh_handle_is_raised():
+    provider, cache = make_cache()
+    try:
+        provider.endpoints[MICROPHONE].removed = True
+        with pytest.raises(OSError):
+            cache.call(MICROPHONE, lambda mic: mic.muted())
+    finally:
+        cache.shutdown()
@@ -0,0 +1,63 @@
+from cadence import CadenceController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cadence(on_battery=False):
+    clock = FakeClock()
+    battery = [on_battery]
+    cadence = CadenceController(interval=2.0, battery_interval=5.0, exit_interval=0.5, on_battery=lambda: battery[0], clock=clock)
+    return cadence, clock, battery
+
+
+def test_blocks_without_rules_and_uses_the_base_interval_otherwise():
+    cadence, _, _ = make_cadence()
+    assert cadence.interval(has_rules=False) is None
+    assert cadence.mode == 'blocked'
+    assert cadence.interval(has_rules=True) == 2.0
+    assert cadence.interval(has_rules=True, launch_expected=True) == 0.5
+
+
+def test_battery_is_only_checked_every_so_often():
+    cadence, clock, battery = make_cadence(on_battery=True)
+    assert cadence.interval(has_rules=True) == 5.0
+    battery[0] = False
+    assert cadence.interval(has_rules=True) == 5.0
+    clock.now += CadenceController.BATTERY_CHECK_INTERVAL
+    assert cadence.interval(has_rules=True) == 2.0
+
+
+def test_polls_faster_around_the_usual_end_of_a_session():
+    cadence, clock, _ = make_cadence()
+    for length in (100, 110, 120):
+        app = {'key': 'game', 'started_at': clock.now}
+        clock.now += length
+        cadence.record_session(app)
+    app = {'key': 'game', 'started_at': clock.now}
+    clock.now += 50
+    assert cadence.interval(has_rules=True, top_app=app) == 2.0
+    clock.now += 50  # 100 s in, past 80% of the 110 s median
+    assert cadence.interval(has_rules=True, top_app=app) == 0.5
+    clock.now += 200  # Outlived twice the median
+    assert cadence.interval(has_rules=True, top_app=app) == 2.0
+
+
+def test_wakeups_are_counted_over_the_last_minute():
+    cadence, clock, _ = make_cadence()
+    for _ in range(3):
+        cadence.record_wakeup()
+        clock.now += 25
+    assert cadence.wakeups_per_minute() == 2
+    assert cadence.stats()['wakeups_per_minute'] == 2
+
+
+def test_preferences_are_read_in_milliseconds():
+    cadence, _, _ = make_cadence()
+    cadence.configure_from_preferences({'detection_cadence': {'interval_ms': 750}})
+    assert cadence.interval(has_rules=True) == 0.75
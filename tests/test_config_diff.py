@@ -0,0 +1,49 @@
+import copy
+
+from config_diff import diff_programs
+
+
+def program(name, volume=50, **fields):
+    entry = {'name': name, 'path': f"C:\\Apps\\{name}.exe", 'settings': {'volume': {'tile_value': volume, 'is_unchanged': False}}}
+    entry.update(fields)
+    return entry
+
+
+def test_unchanged_config_has_no_diff():
+    programs = [program('Game'), program('Editor')]
+    diff = diff_programs(programs, copy.deepcopy(programs))
+    assert not diff
+    assert str(diff) == "0 added, 0 removed, 0 rule changes, 0 settings changes"
+
+
+def test_added_and_removed_programs():
+    diff = diff_programs([program('Game'), program('Editor')], [program('Editor'), program('Player')])
+    assert [entry['name'] for entry in diff.added] == ['Player']
+    assert [entry['name'] for entry in diff.removed] == ['Game']
+
+
+def test_disabling_and_enabling_count_as_removal_and_addition():
+    diff = diff_programs([program('Game'), program('Editor', is_enabled=False)], [program('Game', is_enabled=False), program('Editor')])
+    assert [entry['name'] for entry in diff.added] == ['Editor']
+    assert [entry['name'] for entry in diff.removed] == ['Game']
+
+
+def test_rule_and_settings_changes_are_told_apart():
+    old = [program('Game'), program('Editor'), program('Player')]
+    new = [
+        program('Game', match={'type': 'directory', 'pattern': 'C:\\Apps'}),
+        program('Editor', volume=20),
+        program('Player', include_descendants=True),
+    ]
+    diff = diff_programs(old, new)
+    assert [(before['name'], after['name']) for before, after in diff.rule_changed] == [('Game', 'Game'), ('Player', 'Player')]
+    assert [entry['name'] for entry in diff.settings_changed] == ['Editor']
+    assert diff.rule_changed[0][1]['match']['type'] == 'directory'
+
+
+def test_renaming_a_program_is_a_settings_change():
+    renamed = program('Game')
+    renamed['name'] = 'My Game'
+    diff = diff_programs([program('Game')], [renamed])
+    assert diff.settings_changed == [renamed]
+    assert not diff.added and not diff.removed
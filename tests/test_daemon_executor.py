@@ -0,0 +1,40 @@
+import time
+import threading
+
+from daemon_executor import DaemonThreadExecutor
+
+def test_burst_does_not_queue_behind_an_idle_worker():
+    executor = DaemonThreadExecutor(max_workers=4, thread_name_prefix='test')
+    try:
+        executor.submit(lambda: None).result()
+        time.sleep(0.05)  # The first worker is idle again
+        started_at = time.perf_counter()
+        futures = [executor.submit(time.sleep, 0.2) for _ in range(3)]
+        for future in futures:
+            future.result()
+        assert time.perf_counter() - started_at < 0.35
+        assert len(executor._threads) == 3
+    finally:
+        executor.shutdown()
+
+def test_workers_are_reused_and_bounded():
+    executor = DaemonThreadExecutor(max_workers=2, thread_name_prefix='test')
+    try:
+        for _ in range(5):
+            executor.submit(lambda: None).result()
+        assert len(executor._threads) == 1
+        futures = [executor.submit(time.sleep, 0.05) for _ in range(6)]
+        assert [future.result() for future in futures] == [None] * 6
+        assert len(executor._threads) == 2
+    finally:
+        executor.shutdown()
+
+def test_shutdown_cancels_queued_work():
+    executor = DaemonThreadExecutor(max_workers=1, thread_name_prefix='test')
+    started = threading.Event()
+    running = executor.submit(lambda: (started.set(), time.sleep(0.2)))
+    assert started.wait(1)
+    queued = executor.submit(time.sleep, 0.2)
+    executor.shutdown(wait=False, cancel_futures=True)
+    assert queued.cancelled()
+    running.result()
@@ -0,0 +1,79 @@
+import pytest
+
+from event_coalescer import EventCoalescer
+from process_source import ProcessDelta, ProcessInfo
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def started(pid, create_time=1):
+    return ProcessDelta(created=[ProcessInfo(pid, f"app{pid}.exe", create_time=create_time)])
+
+
+def stopped(pid, create_time=1):
+    return ProcessDelta(exited=[ProcessInfo(pid, f"app{pid}.exe", create_time=create_time)])
+
+
+def test_burst_is_flushed_after_a_quiet_window():
+    clock = FakeClock()
+    coalescer = EventCoalescer(window=0.05, max_window=0.5, clock=clock)
+    assert coalescer.time_until_flush() is None
+    coalescer.add(started(1))
+    clock.now += 0.03
+    coalescer.add(started(2))
+    assert coalescer.time_until_flush() == pytest.approx(0.05)
+    clock.now += 0.05
+    assert coalescer.time_until_flush() == 0.0
+    delta = coalescer.take()
+    assert sorted(info.pid for info in delta.created) == [1, 2]
+    assert not coalescer.pending
+
+
+def test_a_steady_trickle_is_flushed_after_max_window():
+    clock = FakeClock()
+    coalescer = EventCoalescer(window=0.05, max_window=0.2, storm_rate=1000, clock=clock)
+    for pid in range(10):
+        coalescer.add(started(pid))
+        clock.now += 0.04
+    assert coalescer.time_until_flush() == 0.0
+
+
+def test_a_process_that_started_and_exited_within_a_burst_is_dropped():
+    coalescer = EventCoalescer(clock=FakeClock())
+    coalescer.add(started(1))
+    coalescer.add(stopped(1))
+    coalescer.add(stopped(2))
+    delta = coalescer.take()
+    assert delta.created == []
+    assert [info.pid for info in delta.exited] == [2]
+
+
+def test_a_reused_pid_is_kept_apart_from_the_exited_process():
+    coalescer = EventCoalescer(clock=FakeClock())
+    coalescer.add(stopped(1, create_time=1))
+    coalescer.add(started(1, create_time=2))
+    delta = coalescer.take()
+    assert [info.key for info in delta.exited] == [(1, 1)]
+    assert [info.key for info in delta.created] == [(1, 2)]
+
+
+def test_storm_mode_flushes_on_the_reconcile_interval_until_the_rate_drops():
+    clock = FakeClock()
+    coalescer = EventCoalescer(window=0.05, storm_rate=100, reconcile_interval=2.0, clock=clock)
+    for pid in range(300):
+        clock.now += 0.005
+        coalescer.add(started(pid))
+    assert coalescer.storm_mode
+    assert coalescer.time_until_flush() == pytest.approx(2.0 - 299 * 0.005)
+    coalescer.take()
+    for pid in range(10):
+        clock.now += 0.2
+        coalescer.add(started(1000 + pid))
+    assert not coalescer.storm_mode
+    assert coalescer.stats()['storms'] == 1
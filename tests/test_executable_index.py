@@ -0,0 +1,80 @@
+import os
+import time
+
+from executable_index import ExecutableIndex
+from executable_matcher import ExecutableMatcher
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'w').close()
+
+
+def wait_ready(index, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not index.ready:
+        assert time.monotonic() < deadline, "the index scan did not finish"
+        time.sleep(0.01)
+
+
+def make_index(tmp_path, *roots):
+    index = ExecutableIndex(cache_path=str(tmp_path / 'index.json'))
+    index.set_roots([str(root) for root in roots])
+    wait_ready(index)
+    return index
+
+
+def test_scan_finds_executables_below_the_deepest_root(tmp_path):
+    games = tmp_path / 'games'
+    touch(str(games / 'a' / 'game.exe'))
+    touch(str(games / 'tools' / 'mod' / 'patch.exe'))
+    touch(str(games / 'a' / 'readme.txt'))
+    index = make_index(tmp_path, games, games / 'tools')
+    assert len(index) == 2
+    assert index.root_of(str(games / 'a' / 'game.exe')) == str(games)
+    assert index.root_of(str(games / 'tools' / 'mod' / 'patch.exe')) == str(games / 'tools')
+    assert index.root_of(str(games / 'a' / 'other.exe')) is None
+
+
+def test_incremental_updates_bump_the_generation(tmp_path):
+    games = tmp_path / 'games'
+    touch(str(games / 'game.exe'))
+    index = make_index(tmp_path, games)
+    generation = index.generation
+    touch(str(games / 'new' / 'late.exe'))
+    index.add_file(str(games / 'new' / 'late.exe'))
+    assert index.root_of(str(games / 'new' / 'late.exe')) == str(games)
+    assert index.generation > generation
+    index.remove_path(str(games / 'new'))
+    assert index.root_of(str(games / 'new' / 'late.exe')) is None
+    index.add_file(str(tmp_path / 'elsewhere.exe'))  # Outside every root
+    assert len(index) == 1
+
+
+def test_restart_reuses_the_listing_of_unchanged_directories(tmp_path, monkeypatch):
+    games = tmp_path / 'games'
+    touch(str(games / 'a' / 'game.exe'))
+    touch(str(games / 'b' / 'tool.exe'))
+    make_index(tmp_path, games).save()
+
+    listed = []
+    list_directory = ExecutableIndex._list_directory
+    monkeypatch.setattr(ExecutableIndex, '_list_directory', lambda self, directory: listed.append(directory) or list_directory(self, directory))
+    touch(str(games / 'b' / 'added.exe'))
+    index = make_index(tmp_path, games)
+    assert listed == [str(games / 'b')]
+    assert len(index) == 3
+
+
+def test_matcher_follows_the_index(tmp_path):
+    games = tmp_path / 'games'
+    touch(str(games / 'game.exe'))
+    index = make_index(tmp_path, games)
+    rule = {'name': 'Games', 'path': str(games), 'settings': {}, 'match': {'type': 'directory', 'pattern': str(games)}}
+    matcher = ExecutableMatcher([rule], executable_index=index)
+    late = str(games / 'late.exe')
+    assert matcher.match('game.exe', str(games / 'game.exe')) is rule
+    assert matcher.match('late.exe', late) is None  # Not on disk yet
+    touch(late)
+    index.add_file(late)
+    assert matcher.match('late.exe', late) is rule  # The cached miss was dropped
@@ -0,0 +1,61 @@
+from executable_matcher import ExecutableMatcher
+
+
+def program(name, rule_type=None, pattern=None, path=None):
+    entry = {'name': name, 'path': path or pattern, 'settings': {}, 'is_enabled': True}
+    if rule_type:
+        entry['match'] = {'type': rule_type, 'pattern': pattern}
+    return entry
+
+
+def test_directory_rule_beats_a_path_rule_for_the_same_executable_elsewhere():
+    other = program('Other', path=r"C:\Other\launcher.exe")
+    games = program('Games', 'directory', r"D:\Games")
+    matcher = ExecutableMatcher([other, games])
+
+    assert matcher.match('launcher.exe', r"D:\Games\launcher.exe") is games
+    assert matcher.match('launcher.exe', r"C:\Other\launcher.exe") is other
+
+
+def test_glob_rule_beats_a_path_rule_for_the_same_executable_elsewhere():
+    other = program('Other', path=r"C:\Other\launcher.exe")
+    games = program('Games', 'glob', r"D:\Games\*\*.exe")
+    matcher = ExecutableMatcher([other, games])
+
+    assert matcher.match('launcher.exe', r"D:\Games\Steam\launcher.exe") is games
+
+
+def test_path_rule_still_matches_its_executable_in_another_folder():
+    other = program('Other', path=r"C:\Other\launcher.exe")
+    matcher = ExecutableMatcher([other, program('Games', 'directory', r"D:\Games")])
+
+    assert matcher.match('launcher.exe', r"E:\Portable\launcher.exe") is other
+    assert matcher.match('launcher.exe') is other
+
+
+def test_basename_rule_beats_directory_and_glob_rules():
+    tool = program('Tool', 'basename', 'launcher.exe')
+    matcher = ExecutableMatcher([program('Games', 'directory', r"D:\Games"), tool])
+
+    assert matcher.match('launcher.exe', r"D:\Games\launcher.exe") is tool
+
+
+def test_exact_path_beats_everything_and_first_rule_wins_a_tier():
+    exact = program('Exact', path=r"D:\Games\launcher.exe")
+    first = program('First', 'glob', r"D:\Games\*.exe")
+    second = program('Second', 'glob', r"D:\*\*.exe")
+    matcher = ExecutableMatcher([first, second, exact])
+
+    assert matcher.match('launcher.exe', r"D:\Games\launcher.exe") is exact
+    assert matcher.match('game.exe', r"D:\Games\game.exe") is first
+    assert matcher.match('game.exe', r"D:\Mods\game.exe") is second
+
+
+def test_regex_rules_are_tried_last_in_rule_order():
+    first = program('First', 'regex', r"\\build\d+\\")
+    second = program('Second', 'regex', r"tool\.exe$")
+    matcher = ExecutableMatcher([first, second])
+
+    assert matcher.match('tool.exe', r"C:\build7\tool.exe") is first
+    assert matcher.match('tool.exe', r"C:\bin\tool.exe") is second
+    assert matcher.match('other.exe', r"C:\bin\other.exe") is None
@@ -0,0 +1,87 @@
+import datetime
+
+from launch_predictor import LaunchPredictor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.date = datetime.datetime(2026, 3, 2, 20, 5)
+
+    def __call__(self):
+        return self.now
+
+    def today(self):
+        return self.date
+
+
+def make_predictor(tmp_path, **options):
+    clock = FakeClock()
+    predictor = LaunchPredictor(str(tmp_path / 'launch_history.json'), clock=clock, now=clock.today, **options)
+    return predictor, clock
+
+
+def launch_pair(predictor, clock, times):
+    for _ in range(times):
+        predictor.record_launch('launcher', 'Launcher')
+        clock.now += 30
+        predictor.record_launch('game', 'Game')
+        clock.now += 3600
+
+
+def test_a_frequent_sequence_becomes_a_prediction(tmp_path):
+    predictor, clock = make_predictor(tmp_path, min_observations=3)
+    launch_pair(predictor, clock, 2)
+    assert predictor.record_launch('launcher', 'Launcher') is None
+    clock.now += 30
+    predictor.record_launch('game', 'Game')
+    prediction = predictor.record_launch('launcher', 'Launcher')
+    assert (prediction.key, prediction.name) == ('game', 'Game')
+    assert prediction.probability == 0.75
+
+
+def test_a_launch_within_the_window_is_a_hit_and_a_timeout_a_miss(tmp_path):
+    predictor, clock = make_predictor(tmp_path, min_observations=2, window=120.0)
+    launch_pair(predictor, clock, 2)
+    assert predictor.record_launch('launcher', 'Launcher') is not None
+    clock.now += 30
+    predictor.record_launch('game', 'Game')
+    assert predictor.stats()['hits'] == 1
+    clock.now += 3600
+    predictor.record_launch('launcher', 'Launcher')
+    assert predictor.expire() is None
+    clock.now += 120
+    assert predictor.expire().key == 'game'
+    assert predictor.stats() == {'predictions': 2, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_launches_far_apart_are_not_a_sequence(tmp_path):
+    predictor, clock = make_predictor(tmp_path, min_observations=1, sequence_window=600.0)
+    predictor.record_launch('launcher', 'Launcher')
+    clock.now += 601
+    predictor.record_launch('game', 'Game')
+    assert predictor.sequences == {}
+
+
+def test_a_program_launched_at_the_same_hour_is_predicted_for_that_hour(tmp_path):
+    predictor, clock = make_predictor(tmp_path, min_observations=3)
+    for _ in range(3):
+        predictor.record_launch('game', 'Game')
+        clock.date += datetime.timedelta(days=1)
+    prediction = predictor.predict_for_hour()
+    assert prediction.key == 'game' and prediction.probability == 1.0
+    clock.date += datetime.timedelta(hours=3)
+    predictor.pending = None
+    assert predictor.predict_for_hour() is None
+
+
+def test_history_is_only_taken_when_it_changed_and_survives_a_reload(tmp_path):
+    predictor, clock = make_predictor(tmp_path, min_observations=2)
+    assert predictor.take_history() is None
+    launch_pair(predictor, clock, 2)
+    predictor.save()
+    assert not predictor.dirty
+    restored, _ = make_predictor(tmp_path)
+    restored.load()
+    assert restored.sequences == {'launcher': {'game': 2}}
+    assert restored.hours['game'] == predictor.hours['game']
@@ -0,0 +1,81 @@
+import pytest
+
+from audio_endpoints import FakeAudioProvider, SPEAKERS
+from radio_cache import RadioCache
+from setting_probes import FakeProbe
+from settings_tile_functions import SettingsManager
+
+def changed(value):
+    return {'tile_value': value, 'is_unchanged': False}
+
+@pytest.fixture
+def make_manager():
+    managers = []
+
+    def make(values=None, backends=None):
+        probe = FakeProbe(values or {})
+        manager = SettingsManager(
+            None, probes=[probe], backends=backends if backends is not None else {},
+            audio_provider=FakeAudioProvider(), radios=RadioCache(enumerator=None, watch=None),
+        )
+        managers.append(manager)
+        return manager, probe
+
+    yield make
+    for manager in managers:
+        manager.audio.shutdown()
+
+def settings_of(steps):
+    return [step.setting for step in steps]
+
+def test_applied_setting_is_skipped_by_the_ledger(make_manager):
+    manager, probe = make_manager({'volume': 50})
+    [step] = manager.plan_settings({'volume': changed(30)})
+    assert step.setter(step.state)
+    assert manager.audio.call(SPEAKERS, lambda speakers: speakers.volume()) == 30
+    reads = probe.reads
+    assert manager.plan_settings({'volume': changed(30)}) == []
+    assert probe.reads == reads  # The ledger answered without a probe read
+
+    manager.invalidate_ledger(['volume'])
+    assert settings_of(manager.plan_settings({'volume': changed(30)})) == ['volume']
+    assert probe.reads == reads + 1
+
+def test_failed_setter_is_not_recorded(make_manager):
+    manager, _ = make_manager()
+    manager.audio.provider.endpoints[SPEAKERS].removed = True
+    [step] = manager.plan_settings({'volume': changed(30)})
+    assert step.setter(step.state) is False
+    assert not manager.is_applied('volume', changed(30))
+
+def test_setting_the_system_already_has_is_skipped(make_manager):
+    manager, probe = make_manager({'volume': 50, 'microphone': 0})
+    assert settings_of(manager.plan_settings({'volume': changed(50), 'microphone': changed(1)})) == ['microphone']
+    assert probe.reads == 1  # One read for both settings
+    assert manager.is_applied('volume', changed(50))
+
+def test_radios_are_not_probed_when_airplane_mode_switches(make_manager):
+    manager, _ = make_manager({'bt': 1, 'wifi': 1})
+    steps = manager.plan_settings({'airplane': changed(1), 'bt': changed(1)})
+    assert settings_of(steps) == ['airplane', 'bt']
+    assert steps[1].after == ('airplane',)
+
+def test_radios_are_probed_without_airplane_mode(make_manager):
+    manager, _ = make_manager({'bt': 1})
+    assert manager.plan_settings({'bt': changed(1)}) == []
+
+def test_next_profile_is_planned_from_the_applied_one(make_manager):
+    manager, _ = make_manager()
+    first = {'volume': changed(30), 'microphone': changed(1)}
+    manager.profile_applied(first)
+    assert settings_of(manager.plan_settings({'volume': changed(70), 'microphone': changed(1)})) == ['volume']
+    manager.invalidate_ledger()
+    assert settings_of(manager.plan_settings({'volume': changed(70), 'microphone': changed(1)})) == ['volume', 'microphone']
+
+def test_shell_steps_are_batched_without_the_host(make_manager):
+    manager, _ = make_manager()
+    profile = {'performance': changed(0), 'systemcolor': changed(1), 'volume': changed(30)}
+    assert settings_of(manager.plan_settings(profile)) == ['volume', 'performance', 'systemcolor']
+    manager.shell_available = False
+    manager.invalidate_ledger()
+    assert settings_of(manager.plan_settings(profile)) == ['volume', manager.SHELL_BATCH]
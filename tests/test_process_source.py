@@ -0,0 +1,144 @@
+import os
+
+from process_source import ProcfsProcessSource, create_process_source
+
+class FakeProc:
+    """A /proc tree in a temporary directory, for driving ProcfsProcessSource."""
+    def __init__(self, root):
+        self.root = root
+
+    def start(self, pid, path, start_time, ppid=1):
+        base = os.path.join(self.root, str(pid))
+        os.makedirs(base)
+        name = os.path.basename(path)[:15]
+        with open(os.path.join(base, 'stat'), 'w') as f:
+            f.write(f"{pid} ({name}) S {ppid} " + ' '.join(['0'] * 17) + f" {start_time} 0 0\n")
+        os.symlink(path, os.path.join(base, 'exe'))
+
+    def exit(self, pid):
+        base = os.path.join(self.root, str(pid))
+        for entry in os.listdir(base):
+            os.remove(os.path.join(base, entry))
+        os.rmdir(base)
+
+def make_source(tmp_path):
+    proc = FakeProc(str(tmp_path))
+    return proc, ProcfsProcessSource(proc_root=str(tmp_path))
+
+def test_closed_source_forgets_its_snapshot(tmp_path):
+    proc, source = make_source(tmp_path)
+    proc.start(100, '/usr/bin/sleeper', 10)
+    source.open()
+    source.snapshot()
+    assert set(source.processes) == {100}
+    source.close()
+    assert source.processes == {}
+    proc.exit(100)
+    source.open()
+    assert not source.snapshot()  # Nothing exited as far as the reopened source knows
+
+def test_poll_reports_only_the_change(tmp_path):
+    proc, source = make_source(tmp_path)
+    proc.start(100, '/usr/bin/sleeper', 10)
+    proc.start(101, '/usr/bin/editor', 11)
+    assert sorted(info.pid for info in source.snapshot().created) == [100, 101]
+    assert not source.poll(0)
+    proc.exit(100)
+    proc.start(102, '/usr/bin/compiler', 12, ppid=101)
+    delta = source.poll(0)
+    assert [info.pid for info in delta.created] == [102]
+    assert [info.pid for info in delta.exited] == [100]
+    assert set(source.processes) == {101, 102}
+
+def test_snapshot_notices_a_reused_pid(tmp_path):
+    proc, source = make_source(tmp_path)
+    proc.start(100, '/usr/bin/sleeper', 10)
+    source.snapshot()
+    proc.exit(100)
+    proc.start(100, '/usr/bin/editor', 20)
+    delta = source.snapshot()
+    assert [(info.pid, info.create_time) for info in delta.exited] == [(100, 10)]
+    assert [(info.pid, info.name) for info in delta.created] == [(100, 'editor')]
+
+def test_procfs_reads_the_full_executable_name_and_parent(tmp_path):
+    proc, source = make_source(tmp_path)
+    proc.start(100, '/opt/tools/a-very-long-executable-name', 10, ppid=42)
+    info = source.snapshot().created[0]
+    assert info.name == 'a-very-long-executable-name'
+    assert info.path == '/opt/tools/a-very-long-executable-name'
+    assert (info.ppid, info.key) == (42, (100, 10))
+
+class FakeWmiProcess:
+    def __init__(self, pid, name, created, event_type=None):
+        self.ProcessId = pid
+        self.Name = name
+        self.ExecutablePath = 'C:\\Apps\\' + name
+        self.CreationDate = created
+        self.ParentProcessId = 4
+        self.event_type = event_type
+
+class FakeWmiConnection:
+    """Win32_Process and its event subscriptions; events only reach the subscription they were queued on."""
+    def __init__(self):
+        self.processes = {}
+        self.subscriptions = []  # [(wql, queued events)]
+
+    def query(self, wql):
+        return list(self.processes.values())
+
+    def watch_for(self, raw_wql):
+        events = []
+        self.subscriptions.append((raw_wql, events))
+
+        def watcher(timeout_ms):
+            if not events:
+                return None
+            return events.pop(0)
+        return watcher
+
+    def start(self, pid, name, created):
+        self.processes[pid] = FakeWmiProcess(pid, name, created)
+        self.subscriptions[-1][1].append(FakeWmiProcess(pid, name, created, 'creation'))
+
+def make_wmi_source(monkeypatch):
+    import sys
+    import types
+    from process_source import WmiProcessSource
+
+    connection = FakeWmiConnection()
+    wmi = types.SimpleNamespace(WMI=lambda: connection, x_wmi=type('x_wmi', (Exception,), {}))
+    wmi.x_wmi_timed_out = type('x_wmi_timed_out', (wmi.x_wmi,), {})
+    pythoncom = types.SimpleNamespace(CoInitialize=lambda: None, CoUninitialize=lambda: None, com_error=type('com_error', (Exception,), {}))
+    monkeypatch.setitem(sys.modules, 'wmi', wmi)
+    monkeypatch.setitem(sys.modules, 'pythoncom', pythoncom)
+    return connection, WmiProcessSource()
+
+def test_wmi_subscription_follows_the_cadence(monkeypatch):
+    connection, source = make_wmi_source(monkeypatch)
+    source.open()
+    source.snapshot()
+    assert 'WITHIN 2 ' in connection.subscriptions[-1][0]
+    source.set_interval(2.0)
+    assert len(connection.subscriptions) == 1  # Unchanged cadence keeps the subscription
+    source.set_interval(5.0)
+    assert 'WITHIN 5.0 ' in connection.subscriptions[-1][0]
+    assert len(connection.subscriptions) == 2
+
+def test_wmi_events_dropped_by_a_new_subscription_are_recovered(monkeypatch):
+    connection, source = make_wmi_source(monkeypatch)
+    source.open()
+    source.snapshot()
+    connection.start(100, 'game.exe', 1)  # Queued on the first subscription only
+    source.set_interval(5.0)
+    connection.start(101, 'tool.exe', 2)  # In the table and queued on the new subscription
+    assert sorted(info.pid for info in source.poll(0).created) == [100, 101]
+    assert not source.poll(0)  # The queued event of a process the snapshot found is not repeated
+    connection.start(102, 'other.exe', 3)
+    assert [info.pid for info in source.poll(0).created] == [102]
+
+def test_bad_process_source_preference_falls_back_to_auto(monkeypatch):
+    import sys
+    monkeypatch.setitem(sys.modules, 'wmi', None)  # Importing it raises ImportError
+    automatic = create_process_source('auto').name
+    assert create_process_source('no-such-source').name == automatic
+    assert create_process_source('wmi').name == automatic
@@ -0,0 +1,59 @@
+from app_stack import program_key
+from process_source import ProcessInfo
+from process_tree import ProcessTree, start_order
+
+
+LAUNCHER = {'name': 'Launcher', 'path': 'C:\\Games\\launcher.exe', 'settings': {}, 'include_descendants': True}
+EDITOR = {'name': 'Editor', 'path': 'C:\\Apps\\editor.exe', 'settings': {}}
+
+
+class Processes(dict):
+    def start(self, pid, ppid=None, create_time=None):
+        info = ProcessInfo(pid, f"p{pid}.exe", create_time=create_time if create_time is not None else pid, ppid=ppid)
+        self[pid] = info
+        return info
+
+
+def test_descendants_inherit_a_program_that_includes_them():
+    tree, processes = ProcessTree(), Processes()
+    assert tree.add(processes.start(10), LAUNCHER, processes) is LAUNCHER
+    assert tree.add(processes.start(11, ppid=10), None, processes) is LAUNCHER
+    assert tree.add(processes.start(12, ppid=11), None, processes) is LAUNCHER
+    assert tree.parent_of(12) == 11
+
+
+def test_children_of_other_programs_inherit_nothing():
+    tree, processes = ProcessTree(), Processes()
+    tree.add(processes.start(10), EDITOR, processes)
+    assert tree.add(processes.start(11, ppid=10), None, processes) is None
+
+
+def test_a_child_that_matches_itself_keeps_its_own_program():
+    tree, processes = ProcessTree(), Processes()
+    tree.add(processes.start(10), LAUNCHER, processes)
+    assert tree.add(processes.start(11, ppid=10), EDITOR, processes) is EDITOR
+
+
+def test_descendants_keep_the_program_until_it_is_forgotten():
+    tree, processes = ProcessTree(), Processes()
+    launcher = processes.start(10)
+    tree.add(launcher, LAUNCHER, processes)
+    tree.add(processes.start(11, ppid=10), None, processes)
+    tree.remove(launcher)
+    del processes[10]
+    assert tree.add(processes.start(12, ppid=11), None, processes) is LAUNCHER
+    tree.forget_program(program_key(LAUNCHER))
+    assert tree.add(processes.start(13, ppid=11), None, processes) is None
+
+
+def test_a_reused_parent_pid_is_not_the_parent():
+    tree, processes = ProcessTree(), Processes()
+    tree.add(processes.start(10, create_time=50), LAUNCHER, processes)
+    # Process 11 was started by an earlier process 10, whose PID the launcher reused
+    assert tree.add(processes.start(11, ppid=10, create_time=40), None, processes) is None
+    assert tree.parent_of(11) is None
+
+
+def test_start_order_puts_parents_first():
+    infos = [ProcessInfo(3, 'c', create_time=30), ProcessInfo(1, 'a', create_time=10), ProcessInfo(2, 'b')]
+    assert [info.pid for info in start_order(infos)] == [2, 1, 3]
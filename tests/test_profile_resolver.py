@@ -0,0 +1,50 @@
+from profile_resolver import ProfileResolver
+
+
+def entry(key, rank, **settings):
+    profile = {setting: {'tile_value': value, 'is_unchanged': False} for setting, value in settings.items()}
+    profile['priority'] = {'tile_value': rank, 'is_unchanged': False}
+    profile['brightness'] = {'tile_value': 0, 'is_unchanged': True}
+    return {'key': key, 'settings': profile, 'sort_key': (False, rank, 0)}
+
+
+def values(resolver):
+    return {name: state['tile_value'] for name, state in resolver.settings.items()}
+
+
+def test_each_setting_comes_from_the_highest_priority_program_changing_it():
+    resolver = ProfileResolver()
+    resolver.add(entry('browser', 3, volume=30, wifi=1))
+    resolver.add(entry('game', 1, volume=80))
+    assert values(resolver) == {'volume': 80, 'wifi': 1}  # priority and unchanged settings are left out
+
+
+def test_lower_priority_programs_only_touch_what_they_win():
+    resolver = ProfileResolver()
+    resolver.add(entry('game', 1, volume=80))
+    published = resolver.settings
+    assert not resolver.add(entry('editor', 2, volume=20))
+    assert resolver.settings is published
+    assert resolver.recomputed_settings == 1
+
+
+def test_removing_the_winner_falls_back_to_the_next_program():
+    resolver = ProfileResolver()
+    game, editor = entry('game', 1, volume=80, bt=0), entry('editor', 2, volume=20)
+    resolver.add(game)
+    resolver.add(editor)
+    assert not resolver.remove(editor)
+    resolver.add(editor)
+    assert resolver.remove(game)
+    assert values(resolver) == {'volume': 20}
+    assert resolver.remove(editor)
+    assert resolver.settings == {}
+
+
+def test_published_settings_are_never_mutated():
+    resolver = ProfileResolver()
+    resolver.add(entry('game', 1, volume=80))
+    before = resolver.settings
+    resolver.add(entry('player', 0, volume=10))
+    assert before['volume']['tile_value'] == 80
+    assert values(resolver) == {'volume': 10}
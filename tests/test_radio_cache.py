@@ -0,0 +1,99 @@
+import asyncio
+
+from radio_cache import RadioCache
+
+
+class FakeEnumerator:
+    def __init__(self):
+        self.calls = 0
+        self.release = None  # asyncio.Event holding enumerations back, when set
+
+    async def __call__(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        return [f"radio{self.calls}"]
+
+
+def test_radios_are_enumerated_once_and_shared():
+    enumerator = FakeEnumerator()
+    cache = RadioCache(enumerator, watch=None)
+
+    async def scenario():
+        enumerator.release = asyncio.Event()
+        waiting = [asyncio.ensure_future(cache.get()) for _ in range(3)]
+        await asyncio.sleep(0)
+        enumerator.release.set()
+        return await asyncio.gather(*waiting), await cache.get()
+
+    together, later = asyncio.run(scenario())
+    assert together == [['radio1']] * 3
+    assert later == ['radio1']
+    assert cache.stats() == {'enumerations': 1, 'hits': 1, 'invalidations': 0}
+
+
+def test_invalidate_enumerates_again():
+    enumerator = FakeEnumerator()
+    cache = RadioCache(enumerator, watch=None)
+
+    async def scenario():
+        first = await cache.get()
+        cache.invalidate()
+        return first, await cache.get()
+
+    assert asyncio.run(scenario()) == (['radio1'], ['radio2'])
+
+
+def test_an_enumeration_overtaken_by_an_invalidation_is_not_cached():
+    enumerator = FakeEnumerator()
+    cache = RadioCache(enumerator, watch=None)
+
+    async def scenario():
+        enumerator.release = asyncio.Event()
+        waiting = asyncio.ensure_future(cache.get())
+        while enumerator.calls == 0:
+            await asyncio.sleep(0)
+        cache.invalidate()  # A radio was added while the enumeration ran
+        enumerator.release.set()
+        stale = await waiting
+        enumerator.release = None
+        return stale, await cache.get()
+
+    assert asyncio.run(scenario()) == (['radio1'], ['radio2'])
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_enumeration():
+    enumerator = FakeEnumerator()
+    cache = RadioCache(enumerator, watch=None)
+
+    async def scenario():
+        enumerator.release = asyncio.Event()
+        impatient = asyncio.ensure_future(cache.get())
+        patient = asyncio.ensure_future(cache.get())
+        await asyncio.sleep(0)
+        impatient.cancel()
+        enumerator.release.set()
+        return await patient
+
+    assert asyncio.run(scenario()) == ['radio1']
+    assert enumerator.calls == 1
+
+
+def test_device_changes_invalidate_the_cache():
+    watched = []
+    cache = RadioCache(FakeEnumerator(), watch=lambda callback: watched.append(callback) or object())
+
+    async def scenario():
+        await cache.get()
+        watched[0]()  # A radio device was removed
+        return await cache.get()
+
+    assert asyncio.run(scenario()) == ['radio2']
+    assert len(watched) == 1
+
+
+def test_a_failing_watcher_leaves_the_cache_working():
+    def broken_watch(callback):
+        raise OSError("no device watcher")
+    cache = RadioCache(FakeEnumerator(), watch=broken_watch)
+    assert asyncio.run(cache.get()) == ['radio1']
@@ -0,0 +1,42 @@
+import functools
+
+from service_snapshot import ServiceSnapshot
+
+SETTINGS = {'volume': {'tile_value': 50, 'is_unchanged': False}}
+
+def test_snapshot_is_restored_for_the_same_config(tmp_path):
+    path = str(tmp_path / 'service_snapshot.json')
+    snapshot = ServiceSnapshot(path)
+    snapshot.record('sleeper', SETTINGS, 'hash')
+    snapshot.save()
+    restored = ServiceSnapshot(path)
+    assert restored.load('hash')
+    assert (restored.profile_name, restored.settings) == ('sleeper', SETTINGS)
+
+def test_snapshot_of_another_config_is_ignored(tmp_path):
+    path = str(tmp_path / 'service_snapshot.json')
+    snapshot = ServiceSnapshot(path)
+    snapshot.record('sleeper', SETTINGS, 'hash')
+    snapshot.save()
+    assert not ServiceSnapshot(path).load('edited')
+    assert not ServiceSnapshot(str(tmp_path / 'missing.json')).load('hash')
+
+def test_forgotten_snapshot_is_not_restored(tmp_path):
+    path = str(tmp_path / 'service_snapshot.json')
+    snapshot = ServiceSnapshot(path)
+    snapshot.record('sleeper', SETTINGS, 'hash')
+    snapshot.save()
+    snapshot.forget()
+    snapshot.save()  # Shutdown saves nothing after a forget
+    assert not ServiceSnapshot(path).load('hash')
+    snapshot.forget()  # Nothing left to remove
+
+def test_failed_profile_does_not_become_the_snapshot(tmp_path):
+    import background_service
+    service = background_service.BackgroundService.__new__(background_service.BackgroundService)
+    service.snapshot = ServiceSnapshot(str(tmp_path / 'service_snapshot.json'))
+    record = functools.partial(service._record_snapshot, 'sleeper', SETTINGS, 'hash')
+    record(True)
+    record_failed = functools.partial(service._record_snapshot, 'game', SETTINGS, 'hash')
+    record_failed(False)
+    assert not ServiceSnapshot(service.snapshot.path).load('hash')
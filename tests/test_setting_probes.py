@@ -0,0 +1,62 @@
+from setting_probes import ProbeCache, FakeProbe, SettingProbe
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FailingProbe(SettingProbe):
+    settings = ('brightness',)
+
+    def read(self):
+        raise OSError("no display")
+
+def test_values_are_cached_for_ttl():
+    clock = Clock()
+    probe = FakeProbe({'volume': 40})
+    cache = ProbeCache([probe], ttl=2.0, clock=clock)
+    assert cache.get_current('volume') == 40
+    probe.values['volume'] = 60
+    clock.now = 1.9
+    assert cache.get_current('volume') == 40
+    clock.now = 2.0
+    assert cache.get_current('volume') == 60
+    assert probe.reads == 2
+    assert cache.stats() == {'probe_reads': 2, 'hits': 1}
+
+def test_prefetch_reads_each_probe_once():
+    audio = FakeProbe({'volume': 40, 'microphone': 0})
+    radios = FakeProbe({'wifi': 0, 'bt': 1})
+    cache = ProbeCache([audio, radios])
+    cache.prefetch(['volume', 'microphone', 'wifi', 'bt', 'airplane'])
+    assert (audio.reads, radios.reads) == (1, 1)
+    assert [cache.get_current(s) for s in ('volume', 'microphone', 'wifi', 'bt')] == [40, 0, 0, 1]
+    assert (audio.reads, radios.reads) == (1, 1)
+
+def test_prefetch_skips_fresh_values():
+    clock = Clock()
+    probe = FakeProbe({'volume': 40})
+    cache = ProbeCache([probe], ttl=2.0, clock=clock)
+    cache.prefetch(['volume'])
+    cache.prefetch(['volume'])
+    assert probe.reads == 1
+    clock.now = 5.0
+    cache.prefetch(['volume'])
+    assert probe.reads == 2
+
+def test_invalidate_forces_a_read():
+    probe = FakeProbe({'volume': 40, 'microphone': 0})
+    cache = ProbeCache([probe])
+    cache.prefetch(['volume'])
+    cache.invalidate(['volume'])
+    assert cache.get_current('microphone') == 0
+    assert probe.reads == 1
+    assert cache.get_current('volume') == 40
+    assert probe.reads == 2
+
+def test_failing_or_missing_probe_is_unknown():
+    cache = ProbeCache([FailingProbe()])
+    assert cache.get_current('brightness') is None
+    assert cache.get_current('airplane') is None
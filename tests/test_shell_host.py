@@ -0,0 +1,50 @@
+import pytest
+
+from shell_host import ShellHost, ShellTimeout, python_host_command, python_batch, parse_batch_results
+
+@pytest.fixture
+def host():
+    host = ShellHost(python_host_command(), warmup=["loaded = 'yes'"], size=1, max_calls=3, timeout=10.0)
+    yield host
+    host.shutdown()
+
+def test_runs_scripts_in_a_warm_session(host):
+    result = host.run("print(loaded)")
+    assert result.ok and result.output == "yes\n"
+    failed = host.run("raise OSError('denied')")
+    assert not failed.ok and failed.error == "OSError: denied"
+    assert host.spawned == 1
+
+def test_worker_is_recycled_after_max_calls(host):
+    for _ in range(3):
+        assert host.run("x = 1").ok
+    assert host.stats()['recycled'] == 1
+    assert host.run("print(loaded)").output == "yes\n"  # The new worker ran the warm-up too
+    assert host.spawned == 2
+
+def test_timeout_kills_the_worker(host):
+    with pytest.raises(ShellTimeout):
+        host.run("import time; time.sleep(10)", timeout=0.5)
+    assert host.stats()['timeouts'] == 1
+    assert host.run("print(loaded)").ok
+    assert host.spawned == 2
+
+def test_dead_worker_is_replaced(host):
+    assert host.run("x = 1").ok
+    host._idle[0].close()
+    host._idle[0].process.wait()
+    assert host.run("print(loaded)").ok
+    assert host.spawned == 2
+
+def test_batch_reports_every_step(host):
+    script = python_batch([('performance', "print('switched')"), ('systemcolor', "raise OSError('denied')"), ('nightlight', "x = 1")])
+    result = host.run(script)
+    assert result.ok
+    assert parse_batch_results(result.output) == {
+        'performance': (True, ''),
+        'systemcolor': (False, 'OSError: denied'),
+        'nightlight': (True, ''),
+    }
+
+def test_batch_results_of_unreported_steps_are_missing():
+    assert parse_batch_results("output\n#QAUTIC-STEP airplane 0\n") == {'airplane': (True, '')}
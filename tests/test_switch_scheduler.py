@@ -0,0 +1,63 @@
+import pytest
+
+from switch_scheduler import SwitchScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(**options):
+    clock = FakeClock()
+    return SwitchScheduler(clock=clock, **options), clock
+
+
+def test_first_switch_is_immediate_and_the_next_waits_for_the_dwell_time():
+    scheduler, clock = make_scheduler(min_dwell=2.0)
+    assert scheduler.delay('Game') == 0.0
+    scheduler.record_switch()
+    clock.now += 0.5
+    assert scheduler.delay('Editor') == pytest.approx(1.5)
+    clock.now += 1.5
+    assert scheduler.delay('Editor') == 0.0
+    assert scheduler.stats()['deferred'] == 1
+
+
+def test_exit_switch_waits_for_the_grace_period():
+    scheduler, clock = make_scheduler(min_dwell=0, exit_grace=3.0)
+    assert scheduler.delay('Default', is_exit=True) == pytest.approx(3.0)
+    clock.now += 1.0
+    assert scheduler.delay('Default', is_exit=True) == pytest.approx(2.0)
+
+
+def test_a_restarted_program_suppresses_the_pending_switch():
+    scheduler, _ = make_scheduler(exit_grace=3.0)
+    scheduler.delay('Default', is_exit=True)
+    scheduler.cancel()
+    assert scheduler.pending_target is None
+    assert scheduler.stats()['suppressed'] == 1
+    scheduler.cancel()  # Nothing pending, nothing suppressed
+    assert scheduler.stats()['suppressed'] == 1
+
+
+def test_a_replaced_target_counts_as_suppressed():
+    scheduler, _ = make_scheduler()
+    scheduler.delay('Game', is_exit=True)
+    scheduler.delay('Editor')
+    assert scheduler.pending_target == 'Editor'
+    assert scheduler.suppressed == 1
+
+
+def test_switches_per_minute_are_capped():
+    scheduler, clock = make_scheduler(min_dwell=0, max_switches_per_minute=3)
+    for target in ('A', 'B', 'C'):
+        assert scheduler.delay(target) == 0.0
+        scheduler.record_switch()
+        clock.now += 10
+    assert scheduler.delay('D') == pytest.approx(30.0)
+    clock.now += 30.5
+    assert scheduler.delay('D') == 0.0
@@ -0,0 +1,43 @@
+import datetime
+
+from trigger_engine import TimeWindowCondition, TriggerEngine, FakeTriggerBackends
+
+MONDAY = datetime.datetime(2024, 1, 1)
+
+def at(hour, minute, day=0, second=0):
+    return MONDAY + datetime.timedelta(days=day, hours=hour, minutes=minute, seconds=second)
+
+def test_window_within_a_day():
+    condition = TimeWindowCondition({'start': '09:00', 'end': '17:00'})
+    assert not condition.evaluate(at(8, 59))
+    assert condition.evaluate(at(9, 0))
+    assert not condition.evaluate(at(17, 0))
+    assert condition.next_check(at(8, 30)) == 30 * 60
+    assert condition.next_check(at(9, 0)) == 8 * 60 * 60
+
+def test_window_past_midnight_belongs_to_its_start_day():
+    condition = TimeWindowCondition({'start': '22:00', 'end': '02:00', 'days': [4]})  # Friday nights
+    assert condition.evaluate(at(23, 0, day=4))
+    assert condition.evaluate(at(1, 0, day=5))
+    assert not condition.evaluate(at(1, 0, day=4))
+    assert not condition.evaluate(at(3, 0, day=5))
+
+def test_equal_start_and_end_is_the_whole_day():
+    condition = TimeWindowCondition({'days': [5, 6]})
+    assert condition.evaluate(at(0, 0, day=5))
+    assert condition.evaluate(at(23, 59, day=6))
+    assert not condition.evaluate(at(12, 0, day=0))
+    # Only the day boundary can change the result
+    assert condition.next_check(at(12, 0)) == 12 * 60 * 60
+    assert condition.next_check(at(23, 59, second=30)) == 30
+
+def test_set_programs_reports_changes_since_the_last_config():
+    backends = FakeTriggerBackends(battery=False)
+    engine = TriggerEngine(backends)
+    battery = {'name': 'battery', 'path': 'battery', 'match': {'type': 'trigger'}, 'conditions': {'power': 'battery'}, 'settings': {}}
+    assert engine.set_programs([battery]) == ([], [])  # New programs are left to the config diff
+    backends.battery = True
+    other = {'name': 'other', 'path': 'other', 'settings': {}}
+    assert engine.set_programs([battery, other]) == ([battery], [])
+    assert engine.set_programs([battery, other]) == ([], [])
+    assert engine.is_active(battery)
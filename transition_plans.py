@@ -0,0 +1,113 @@
+import time
+import threading
+from collections import OrderedDict, namedtuple
+
+from executable_matcher import config_version
+
+# One setter call of a plan; `after` names the settings whose steps must finish first.
+# `script` is the shell command of a shell-backed setter, so several can be batched.
+PlanStep = namedtuple('PlanStep', ('setting', 'setter', 'state', 'after', 'script'), defaults=(None,))
+
+class ProfilePlan:
+    """The steps that apply one profile from scratch, compiled once per distinct profile."""
+    __slots__ = ('key', 'steps', 'values')
+
+    def __init__(self, key, steps):
+        self.key = key
+        self.steps = tuple(steps)
+        self.values = {step.setting: step.state.get('tile_value') for step in self.steps}
+
+class TransitionPlanner:
+    """
+    Compiled profile plans and the transitions between them, in LRU caches.
+
+    `compile_profile(settings)` turns a profile into its PlanSteps, with the airplane
+    mode interlock and the setter arguments resolved. A profile is identified by a hash
+    of its settings, so it is compiled once per config version and reused by every
+    switch to it. A transition from a profile that was fully applied drops the steps
+    whose value the previous profile already set, except for the radios when airplane
+    mode is switched, since that switches them too.
+    """
+    DEFAULT_CAPACITY = 64
+    # Settings switched by airplane mode itself
+    RADIO_SETTINGS = ('wifi', 'bt', 'hotspot')
+
+    def __init__(self, compile_profile, capacity=DEFAULT_CAPACITY):
+        self.compile_profile = compile_profile
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self._profiles = OrderedDict()     # profile key -> ProfilePlan
+        self._transitions = OrderedDict()  # (from key or None, to key) -> (PlanStep, ...)
+
+        # --- Counters ---
+        self.hits = 0
+        self.misses = 0
+        self.compiled = 0
+        self.compile_seconds = 0.0
+
+    def plan(self, settings, previous=None):
+        """The steps that take the system from the `previous` profile (None: unknown) to `settings`."""
+        key = config_version(settings)
+        from_key = config_version(previous) if previous else None
+        with self.lock:
+            steps = self._transitions.get((from_key, key))
+            if steps is not None:
+                self._transitions.move_to_end((from_key, key))
+                self.hits += 1
+                return steps
+            self.misses += 1
+
+            target = self._profile(key, settings)
+            if from_key is None:
+                steps = target.steps
+            else:
+                steps = self._transition(self._profile(from_key, previous), target)
+            self._store(self._transitions, (from_key, key), steps)
+            return steps
+
+    def clear(self):
+        with self.lock:
+            self._profiles.clear()
+            self._transitions.clear()
+
+    def _profile(self, key, settings):
+        plan = self._profiles.get(key)
+        if plan is not None:
+            self._profiles.move_to_end(key)
+            return plan
+        started_at = time.perf_counter()
+        plan = ProfilePlan(key, self.compile_profile(settings))
+        self.compile_seconds += time.perf_counter() - started_at
+        self.compiled += 1
+        self._store(self._profiles, key, plan)
+        return plan
+
+    def _transition(self, source, target):
+        carried = {setting for setting, value in target.values.items() if setting in source.values and source.values[setting] == value}
+        if 'airplane' in target.values and 'airplane' not in carried:
+            carried.difference_update(self.RADIO_SETTINGS)
+        steps = []
+        for step in target.steps:
+            if step.setting not in carried:
+                # A dependency that is carried over is already satisfied
+                steps.append(step._replace(after=tuple(dep for dep in step.after if dep not in carried)))
+        return tuple(steps)
+
+    def _store(self, cache, key, value):
+        cache[key] = value
+        while len(cache) > self.capacity:
+            cache.popitem(last=False)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def stats(self):
+        hit_rate = self.hit_rate()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': None if hit_rate is None else round(hit_rate, 2),
+            'compiled': self.compiled,
+            'compile_ms': round(self.compile_seconds * 1000, 2),
+        }
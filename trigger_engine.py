@@ -0,0 +1,264 @@
+import sys
+import time
+import datetime
+
+from app_stack import program_key
+from cadence import psutil_on_battery
+
+def windows_idle_seconds():
+    """Seconds since the last keyboard or mouse input of the user, via GetLastInputInfo."""
+    import ctypes
+
+    class LASTINPUTINFO(ctypes.Structure):
+        _fields_ = [('cbSize', ctypes.c_uint), ('dwTime', ctypes.c_uint)]
+
+    info = LASTINPUTINFO()
+    info.cbSize = ctypes.sizeof(info)
+    if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+        return 0.0
+    # Both tick counts are 32 bit and wrap after ~49 days
+    elapsed_ms = (ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF
+    return elapsed_ms / 1000.0
+
+class TriggerBackends:
+    """
+    The system inputs read by trigger conditions.
+    Backends without change notifications are polled by the engine; a backend that
+    can notify calls the callback given to `subscribe` with the input name.
+    """
+    def now(self):
+        return datetime.datetime.now()
+
+    def on_battery(self):
+        return psutil_on_battery()
+
+    def idle_seconds(self):
+        if sys.platform == 'win32':
+            return windows_idle_seconds()
+        return 0.0  # No portable idle source, idle conditions never hold
+
+    def subscribe(self, callback):
+        pass
+
+class FakeTriggerBackends(TriggerBackends):
+    """Settable inputs for running the engine without the real system, e.g. on Linux."""
+    def __init__(self, now=None, battery=False, idle=0.0):
+        self.now_value = now or datetime.datetime(2024, 1, 1, 12, 0)
+        self.battery = battery
+        self.idle = idle
+        self._callback = None
+
+    def now(self):
+        return self.now_value
+
+    def on_battery(self):
+        return self.battery
+
+    def idle_seconds(self):
+        return self.idle
+
+    def subscribe(self, callback):
+        self._callback = callback
+
+    def set(self, input_name, value):
+        """Changes an input ('clock', 'power' or 'idle') and notifies the engine like a real event."""
+        setattr(self, {'clock': 'now_value', 'power': 'battery', 'idle': 'idle'}[input_name], value)
+        if self._callback is not None:
+            self._callback(input_name)
+
+def _minutes_of(text):
+    hours, minutes = text.split(':')
+    return int(hours) * 60 + int(minutes)
+
+class TimeWindowCondition:
+    """
+    Holds between 'start' and 'end' (HH:MM, may wrap past midnight), optionally on some weekdays only (0 = Monday).
+    Equal 'start' and 'end' (the default) mean the whole day.
+    """
+    input = 'clock'
+
+    def __init__(self, options):
+        self.start = _minutes_of(options.get('start', '00:00'))
+        self.end = _minutes_of(options.get('end', '00:00'))
+        self.days = set(options['days']) if options.get('days') is not None else None
+
+    def evaluate(self, now):
+        minute = now.hour * 60 + now.minute
+        if self.start == self.end:
+            inside, day = True, now.weekday()
+        elif self.start <= self.end:
+            inside, day = self.start <= minute < self.end, now.weekday()
+        elif minute >= self.start:
+            inside, day = True, now.weekday()
+        else:
+            # After midnight the window still belongs to the day it started on
+            inside, day = minute < self.end, (now.weekday() - 1) % 7
+        return inside and (self.days is None or day in self.days)
+
+    def next_check(self, now):
+        """Seconds until the next window boundary."""
+        minute = now.hour * 60 + now.minute
+        seconds_into_minute = now.second + now.microsecond / 1e6
+        if self.start == self.end:
+            # A whole-day window only changes when the day does
+            return (1440 - minute) * 60 - seconds_into_minute
+        waits = [(boundary - minute - 1) % 1440 + 1 for boundary in (self.start, self.end)]
+        return min(waits) * 60 - seconds_into_minute
+
+class PowerCondition:
+    """Holds while running on battery ('battery') or plugged in ('ac')."""
+    input = 'power'
+
+    def __init__(self, source):
+        self.on_battery = source == 'battery'
+
+    def evaluate(self, on_battery):
+        return on_battery == self.on_battery
+
+    def next_check(self, on_battery):
+        return None  # Changes only arrive through the power input itself
+
+class IdleCondition:
+    """Holds once the user was idle for at least 'idle_seconds'."""
+    input = 'idle'
+    POLL_INTERVAL = 2.0  # how soon the end of an idle period is noticed
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def evaluate(self, idle):
+        return idle >= self.seconds
+
+    def next_check(self, idle):
+        # Idle time only grows until there is input, so it cannot hold any earlier than this
+        return self.seconds - idle if idle < self.seconds else self.POLL_INTERVAL
+
+def conditions_of(program):
+    """Builds the conditions of a program entry's 'conditions' field."""
+    options = program.get('conditions') or {}
+    conditions = []
+    if options.get('time'):
+        conditions.append(TimeWindowCondition(options['time']))
+    if options.get('power') in ('ac', 'battery'):
+        conditions.append(PowerCondition(options['power']))
+    if options.get('idle_seconds'):
+        conditions.append(IdleCondition(options['idle_seconds']))
+    return conditions
+
+def is_trigger_only(program):
+    """Programs with a 'trigger' rule need no process, their conditions alone activate them."""
+    return (program.get('match') or {}).get('type') == 'trigger'
+
+class TriggerEngine:
+    """
+    Incremental evaluation of the non-process conditions of programs.
+
+    The rule graph links every input (clock, power, idle) to the conditions reading it,
+    and every condition to its program. An update only reads the inputs that are due
+    and re-evaluates the conditions depending on them; a program is re-checked only
+    if one of its conditions flipped. Inputs are due when a condition asked for it
+    (the next time window boundary, the earliest moment an idle threshold can be
+    reached), when the power poll interval elapsed, or when a backend reported a change.
+
+    A program is active while all of its conditions hold. Programs without
+    conditions are always active and never enter the graph.
+    """
+    POLL_INTERVALS = {'power': 30.0}
+
+    def __init__(self, backends=None, clock=time.monotonic):
+        self.backends = backends or TriggerBackends()
+        self.clock = clock
+        self._readers = {
+            'clock': self.backends.now,
+            'power': self.backends.on_battery,
+            'idle': self.backends.idle_seconds,
+        }
+        self._programs = {}    # program key -> program, for programs with conditions
+        self._conditions = {}  # program key -> [condition]
+        self._results = {}     # program key -> [bool per condition]
+        self._active = {}      # program key -> all conditions hold
+        self._dependents = {}  # input -> [(program key, condition index)]
+        self._values = {}      # input -> last value read
+        self._due = {}         # input -> monotonic time it must be read again, None if never
+        self.evaluations = 0
+
+    def set_programs(self, programs):
+        """
+        Rebuilds the graph for a new config and evaluates every condition once.
+        Returns (opened, closed) like `update`, against the activity before the rebuild.
+        """
+        previous = dict(self._active)
+        self._programs.clear()
+        self._conditions.clear()
+        self._results.clear()
+        self._active.clear()
+        self._dependents.clear()
+        for program in programs:
+            if not program.get('is_enabled', True):
+                continue
+            conditions = conditions_of(program)
+            if not conditions:
+                continue
+            key = program_key(program)
+            self._programs[key] = program
+            self._conditions[key] = conditions
+            for index, condition in enumerate(conditions):
+                self._dependents.setdefault(condition.input, []).append((key, index))
+        self._values = {name: value for name, value in self._values.items() if name in self._dependents}
+        self._due = dict.fromkeys(self._dependents, 0.0)
+        opened, closed = self.update()
+        print(f"[TRIGGERS] {len(self._programs)} programs with conditions on {sorted(self._dependents) or 'no inputs'}.")
+        # Every program was reported, since the activity was cleared. New programs are left to the config diff.
+        opened = [program for program in opened if previous.get(program_key(program)) is False]
+        closed = [program for program in closed if previous.get(program_key(program)) is True]
+        return opened, closed
+
+    def is_active(self, program):
+        return self._active.get(program_key(program), True)
+
+    def invalidate(self, input_name):
+        """Marks an input as changed, so the next update reads it."""
+        if input_name in self._dependents:
+            self._due[input_name] = 0.0
+
+    def time_until_update(self):
+        """Seconds until the next input is due, or None if no input needs reading."""
+        deadlines = [due for due in self._due.values() if due is not None]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - self.clock())
+
+    def update(self):
+        """Reads the due inputs and returns (opened, closed): the programs that became active or inactive."""
+        now = self.clock()
+        changed_keys = set()
+        for name in [name for name, due in self._due.items() if due is not None and due <= now]:
+            value = self._readers[name]()
+            self._values[name] = value
+            next_checks = []
+            for key, index in self._dependents[name]:
+                condition = self._conditions[key][index]
+                result = condition.evaluate(value)
+                self.evaluations += 1
+                results = self._results.setdefault(key, [None] * len(self._conditions[key]))
+                if results[index] != result:
+                    results[index] = result
+                    changed_keys.add(key)
+                next_check = condition.next_check(value)
+                if next_check is not None:
+                    next_checks.append(next_check)
+            if name in self.POLL_INTERVALS:
+                next_checks.append(self.POLL_INTERVALS[name])
+            self._due[name] = now + min(next_checks) if next_checks else None
+
+        opened = []
+        closed = []
+        for key in changed_keys:
+            results = self._results[key]
+            if None in results:
+                continue  # Not every input was read yet
+            active = all(results)
+            if active != self._active.get(key):
+                self._active[key] = active
+                (opened if active else closed).append(self._programs[key])
+        return opened, closed
@@ -3,11 +3,12 @@ from PyQt6.QtGui import QIcon, QAction
 from PyQt6.QtCore import Qt
 
 class ProgramItem(QListWidgetItem):
-    def __init__(self, name: str, path: str, icon: QIcon = None, settings=None, parent_list=None, is_enabled=True):
+    def __init__(self, name: str, path: str, icon: QIcon = None, settings=None, parent_list=None, is_enabled=True, options=None):
         super().__init__(name)
         self.name = name
         self.path = path
         self.is_enabled = is_enabled
+        self.options = options or {}  # Extra rule fields kept in programs.json, e.g. 'match', 'include_descendants'
         self._original_icon = icon
         self.setToolTip(name)
         self.settings = settings or {}  # Dict of {setting_key: {tile_value, is_unchanged}}
@@ -30,6 +31,13 @@ class ProgramItem(QListWidgetItem):
         self._update_icon_appearance()
         self._save_state_to_json()
 
+    def set_include_descendants(self, include: bool):
+        if include:
+            self.options['include_descendants'] = True
+        else:
+            self.options.pop('include_descendants', None)
+        self._save_state_to_json()
+
     def set_enabled(self, enabled: bool):
         self.is_enabled = enabled
         self._update_icon_appearance()
@@ -50,6 +58,11 @@ class ProgramItem(QListWidgetItem):
 
         toggle_action.triggered.connect(self.toggle_enabled)
         menu.addAction(toggle_action)
+        # Child process inheritance action
+        descendants_action = QAction("Include Child Processes", menu, checkable=True)
+        descendants_action.setChecked(self.options.get('include_descendants', False))
+        descendants_action.triggered.connect(self.set_include_descendants)
+        menu.addAction(descendants_action)
         # Delete action
         delete_action = QAction("Delete", menu)
         def delete():